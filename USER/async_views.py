@@ -0,0 +1,49 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .authentication import CookieJWTAuthentication, afull_user
+from .serializers import UserSerializer
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json', headers=headers)
+
+
+class AsyncAPIView(View):
+    """Minimal async counterpart of APIView for the read endpoints.
+
+    DRF's APIView cannot run ``async def`` handlers, so under ASGI every
+    request to it is pushed through a thread. These views run on the event
+    loop: handlers receive ``request.query_params`` and ``request.user`` as
+    in DRF, cookie-JWT auth uses the async ORM, and APIExceptions are
+    rendered as DRF would.
+    """
+    authenticated = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request)
+        try:
+            if self.authenticated:
+                auth = CookieJWTAuthentication()
+                result = await auth.aauthenticate(request._request)
+                if result is None:
+                    raise exceptions.NotAuthenticated()
+                request.user, request.auth = result
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as e:
+            headers = None
+            if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                headers = {'WWW-Authenticate': CookieJWTAuthentication().authenticate_header(request)}
+            detail = e.detail if isinstance(e.detail, (list, dict)) else {'detail': e.detail}
+            return json_response(detail, e.status_code, headers)
+
+
+class AsyncUserView(AsyncAPIView):
+    authenticated = True
+
+    async def get(self, request):
+        user = await afull_user(request.user)
+        return json_response(UserSerializer(user).data)
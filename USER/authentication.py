@@ -1,5 +1,40 @@
+from django.conf import settings
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import User
+from .user_cache import LIGHT_FIELDS, is_light, light_user, user_cache
+
+# Claims copied into every token so AUTH_TOKEN_CLAIMS_USER can skip the user query.
+USER_CLAIMS = ('role', 'is_active')
+
+
+def claims_mode():
+    return getattr(settings, 'AUTH_TOKEN_CLAIMS_USER', False)
+
+
+def tokens_for(user):
+    """Refresh token for ``user`` carrying ``USER_CLAIMS``; its access token inherits them."""
+    refresh = RefreshToken.for_user(user)
+    for claim in USER_CLAIMS:
+        refresh[claim] = getattr(user, claim)
+    return refresh
+
+
+def full_user(user):
+    """The complete row for a lightweight ``request.user``, for views that show or edit it."""
+    if is_light(user):
+        return User.objects.get(pk=user.pk)
+    return user
+
+
+async def afull_user(user):
+    if is_light(user):
+        return await User.objects.aget(pk=user.pk)
+    return user
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
@@ -14,4 +49,67 @@ class CookieJWTAuthentication(JWTAuthentication):
             user=self.get_user(validated_token)
             return user, validated_token
         except AuthenticationFailed as e:
-            raise AuthenticationFailed(f'Error retriving user: {str(e)}')
\ No newline at end of file
+            raise AuthenticationFailed(f'Error retriving user: {str(e)}')
+
+    def get_user(self, validated_token):
+        if not claims_mode():
+            return super().get_user(validated_token)
+        # Claims mode: resolve a lightweight user (id, role, is_active) from
+        # the process cache, else from the token's claims, else one narrow
+        # query for tokens issued before the claims existed. Role or active
+        # changes made in another process reach the claims at the next
+        # refresh, so they can lag by up to one access-token lifetime.
+        pk = self.user_pk(validated_token)
+        user = self.cached_or_claimed(pk, validated_token)
+        if user is None:
+            user = self.remember(pk, User.objects.filter(pk=pk).values_list(*LIGHT_FIELDS[1:]).first())
+        return self.check_active(user)
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views, using the async ORM when it must query."""
+        token = request.COOKIES.get('access_token')
+        if not token:
+            return None
+        try:
+            validated_token = self.get_validated_token(token)
+        except AuthenticationFailed as e:
+            raise AuthenticationFailed(f'Token is invalid or expired: {str(e)}')
+        try:
+            return await self.aget_user(validated_token), validated_token
+        except AuthenticationFailed as e:
+            raise AuthenticationFailed(f'Error retriving user: {str(e)}')
+
+    async def aget_user(self, validated_token):
+        pk = self.user_pk(validated_token)
+        if not claims_mode():
+            user = await User.objects.filter(pk=pk).afirst()
+            if user is None:
+                raise AuthenticationFailed('User not found', code='user_not_found')
+            return self.check_active(user)
+        user = self.cached_or_claimed(pk, validated_token)
+        if user is None:
+            user = self.remember(pk, await User.objects.filter(pk=pk).values_list(*LIGHT_FIELDS[1:]).afirst())
+        return self.check_active(user)
+
+    def user_pk(self, validated_token):
+        try:
+            return int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken('Token contained no recognizable user identification')
+
+    def cached_or_claimed(self, pk, validated_token):
+        user = user_cache.get(pk)
+        if user is None and all(claim in validated_token for claim in USER_CLAIMS):
+            user = light_user(pk, validated_token['role'], validated_token['is_active'])
+        return user
+
+    def remember(self, pk, row):
+        if row is None:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+        user_cache.put(pk, *row)
+        return light_user(pk, *row)
+
+    def check_active(self, user):
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
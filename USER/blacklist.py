@@ -0,0 +1,131 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+GENERATION_KEY = 'token-blacklist:generation'
+
+# Backends whose state never leaves the process: a logout on one worker would
+# go unseen by the others, so the filter refuses them.
+LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def shared_cache():
+    """The cache named by TOKEN_BLACKLIST_CACHE, or None if the filter is off."""
+    alias = getattr(settings, 'TOKEN_BLACKLIST_CACHE', None)
+    if not alias or settings.CACHES[alias]['BACKEND'] in LOCAL_BACKENDS:
+        return None
+    return caches[alias]
+
+
+class BlacklistFilter:
+    """In-process set of the jtis that are blacklisted and not yet expired.
+
+    A generation counter in the shared TOKEN_BLACKLIST_CACHE is bumped
+    whenever a token is blacklisted; the set is rebuilt when it no longer
+    matches, so a token blacklisted by any worker is seen on every worker's
+    next check. ``contains`` returns None, meaning "ask the database", when
+    no shared cache is configured or the counter cannot be read.
+    """
+
+    def __init__(self):
+        self._jtis = None
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _current_generation(self, cache):
+        try:
+            generation = cache.get(GENERATION_KEY)
+            if generation is None:
+                cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+                generation = cache.get(GENERATION_KEY)
+        except Exception:
+            return None
+        return generation
+
+    def contains(self, jti):
+        cache = shared_cache()
+        if cache is None:
+            return None
+        generation = self._current_generation(cache)
+        if generation is None:
+            return None
+        jtis = self._jtis
+        if jtis is None or generation != self._generation:
+            with self._lock:
+                if self._jtis is None or generation != self._generation:
+                    # Read the generation before the rows, so a blacklist
+                    # committed meanwhile triggers another rebuild.
+                    self._jtis = frozenset(
+                        BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+                        .values_list('token__jti', flat=True)
+                    )
+                    self._generation = generation
+                jtis = self._jtis
+        return jti in jtis
+
+    def bump(self):
+        cache = shared_cache()
+        if cache is None:
+            return
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+    def token_blacklisted(self, sender, created=False, **kwargs):
+        if created:
+            transaction.on_commit(self.bump)
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """``RefreshToken`` whose blacklist check is served from ``blacklist_filter``
+    when it can be, and from simplejwt's per-token query otherwise."""
+
+    def check_blacklist(self):
+        blacklisted = blacklist_filter.contains(self.payload[api_settings.JTI_CLAIM])
+        if blacklisted is None:
+            return super().check_blacklist()
+        if blacklisted:
+            raise TokenError('Token is blacklisted')
+
+
+def prune_expired_tokens(batch_size=1000, now=None):
+    """Delete expired outstanding tokens (and their blacklist rows) in batches.
+
+    Walks the table in primary-key order, so each batch is an index range
+    scan and no single statement or transaction grows with the table.
+    Returns the number of outstanding tokens deleted.
+    """
+    now = now or aware_utcnow()
+    last_pk = 0
+    deleted = 0
+    while True:
+        rows = list(
+            OutstandingToken.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'expires_at')[:batch_size]
+        )
+        if not rows:
+            return deleted
+        last_pk = rows[-1][0]
+        expired = [pk for pk, expires_at in rows if expires_at <= now]
+        if expired:
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=expired).delete()
+                deleted += OutstandingToken.objects.filter(pk__in=expired).delete()[1].get(
+                    OutstandingToken._meta.label, 0
+                )
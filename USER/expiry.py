@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ActivateAccount, PasswordReset
+
+# Settings holding how long (a timedelta) each kind of token stays usable.
+TTL_SETTINGS = {
+    PasswordReset: 'PASSWORD_RESET_TTL',
+    ActivateAccount: 'ACCOUNT_ACTIVATION_TTL',
+}
+
+
+def cutoff(model, now=None):
+    return (now or timezone.now()) - getattr(settings, TTL_SETTINGS[model])
+
+
+def live(model):
+    """``model`` rows that have not expired; use this for every token lookup."""
+    return model.objects.filter(created_at__gt=cutoff(model))
+
+
+def sweep(model, batch_size=1000, now=None):
+    """Delete expired ``model`` rows, oldest first, ``batch_size`` at a time.
+
+    Each batch is a short range scan on the ``created_at`` index followed by
+    a delete by primary key, so no statement holds locks for long however
+    large the backlog is. Returns ``(rows deleted, seconds taken)``.
+    """
+    started = time.perf_counter()
+    limit = cutoff(model, now)
+    deleted = 0
+    while True:
+        pks = list(
+            model.objects.filter(created_at__lte=limit)
+            .order_by('created_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not pks:
+            return deleted, time.perf_counter() - started
+        deleted += model.objects.filter(pk__in=pks).delete()[0]
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from USER.outbox import drain
+
+
+class Command(BaseCommand):
+    help = "Send queued account emails. Runs one pass, or keeps polling with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Emails claimed per batch.")
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting when idle.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when idle with --loop.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        total_sent = total_failed = 0
+        while True:
+            try:
+                sent, failed = drain(batch_size=options['batch_size'])
+            except Exception as e:
+                # e.g. the database is unreachable; leased rows are retried later.
+                if not options['loop']:
+                    raise CommandError(f"Could not send: {e}")
+                self.stderr.write(f"Could not send: {e}")
+                sent = failed = 0
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed."))
@@ -0,0 +1,45 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from USER.models import UserRole
+from USER.provisioning import CHUNK_SIZE, provision_members
+
+
+class Command(BaseCommand):
+    help = "Register members in bulk from a CSV (email,password) or JSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV with email and password columns, or a JSON list of objects.")
+        parser.add_argument('--role', choices=UserRole.values, default=UserRole.CLIENT)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Users inserted per transaction.")
+        parser.add_argument('--workers', type=int, help="Hashing processes; defaults to the CPU count.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        try:
+            if path.suffix.lower() == '.json':
+                rows = json.loads(path.read_text())
+            else:
+                with path.open(newline='', encoding='utf-8-sig') as f:
+                    rows = list(csv.DictReader(f))
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise CommandError(f"Could not read {path}: expected a list of {{email, password}} objects.")
+
+        report, _ = provision_members(
+            rows, role=options['role'], chunk_size=options['chunk_size'], workers=options['workers']
+        )
+        for error in report['errors']:
+            self.stderr.write(json.dumps(error))
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} users, skipped {report['skipped_existing']} existing, "
+            f"{len(report['errors'])} rejected in {report['seconds']}s ({report['users_per_second']} users/s)."
+        ))
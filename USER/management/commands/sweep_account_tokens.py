@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from USER.expiry import sweep
+from USER.models import ActivateAccount, PasswordReset
+
+
+class Command(BaseCommand):
+    help = "Delete expired password reset and activation tokens in bounded batches. Run it from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        for model in (PasswordReset, ActivateAccount):
+            deleted, seconds = sweep(model, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}: reclaimed {deleted} expired rows in {seconds:.2f}s."
+            ))
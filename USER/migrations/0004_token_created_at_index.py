@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('USER', '0003_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activateaccount',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='passwordreset',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
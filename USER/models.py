@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext as _
 from datetime import date
 import uuid
@@ -57,7 +58,7 @@ class User(AbstractBaseUser, PermissionsMixin):
 class PasswordReset(models.Model):
     email = models.ForeignKey(User, on_delete=models.CASCADE)
     token = models.UUIDField(default=uuid.uuid4, unique=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # expiry checks and sweeping
 
     def __str__(self):
         return self.email
@@ -68,8 +69,27 @@ class PasswordReset(models.Model):
 class ActivateAccount(models.Model):
     email = models.ForeignKey(User, on_delete=models.CASCADE)
     token = models.UUIDField(default=uuid.uuid4, unique=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)  # expiry checks and sweeping
 
     def __str__(self):
         return self.email
-   
\ No newline at end of file
+   
+class OutboxEmail(models.Model):
+    # Written in the same transaction as the row the email is about and sent
+    # later by USER.outbox.drain, so requests never wait on SMTP. Rows are
+    # deleted once sent or out of attempts, so every row here is pending.
+    to = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at'], name='outbox_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to}"
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+# While a batch is being sent its rows are leased to this worker; a worker
+# that dies mid-batch leaves them to be retried once the lease runs out.
+LEASE = timedelta(minutes=5)
+
+
+def _link(path):
+    return f"{settings.ACCOUNT_LINK_BASE_URL.rstrip('/')}{path}"
+
+
+def activation_email(user, activation):
+    return OutboxEmail(
+        to=user.email,
+        subject="Activate your Omnify Fitness account",
+        body=f"Activate your account: {_link(f'/user/activate/{activation.token}')}",
+    )
+
+
+def password_reset_email(user, reset):
+    return OutboxEmail(
+        to=user.email,
+        subject="Reset your Omnify Fitness password",
+        body=f"Reset your password: {_link(f'/user/changeforgetpassword/{user.email}/{reset.token}')}",
+    )
+
+
+def enqueue(*emails):
+    """Queue ``emails``; call inside the transaction that creates their token rows."""
+    return OutboxEmail.objects.bulk_create(emails)
+
+
+def backoff(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+    ceiling = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), ceiling))
+
+
+def _claim(batch_size, max_attempts, now):
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now, attempts__lt=max_attempts)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(next_attempt_at=now + LEASE)
+    return batch
+
+
+def _fail(email, error):
+    email.last_error = str(error)[:1000]
+    email.next_attempt_at = timezone.now() + backoff(email.attempts)
+
+
+def drain(batch_size=100, max_attempts=None):
+    """Send one batch of due emails through the configured email backend.
+
+    Sent rows are deleted, so the activation and reset links in their bodies
+    do not outlive the send; failed ones are retried with exponential
+    backoff, including when the connection to the mail server cannot be
+    opened, and deleted once they reach ``OUTBOX_MAX_ATTEMPTS``. Returns
+    ``(sent, failed)`` for the batch.
+    """
+    max_attempts = max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+    now = timezone.now()
+    batch = _claim(batch_size, max_attempts, now)
+    if not batch:
+        return 0, 0
+    sent, failed = [], []
+    try:
+        with get_connection() as connection:
+            for email in batch:
+                email.attempts += 1
+                try:
+                    EmailMessage(email.subject, email.body, to=[email.to], connection=connection).send()
+                except Exception as e:
+                    _fail(email, e)
+                    failed.append(email)
+                else:
+                    sent.append(email)
+    except Exception as e:
+        # Opening the connection failed: the rest of the batch was never tried.
+        done = {email.pk for email in sent + failed}
+        for email in batch:
+            if email.pk not in done:
+                email.attempts += 1
+                _fail(email, e)
+                failed.append(email)
+    # A row out of attempts is never claimed again; its link goes with it and
+    # the user asks for a new one (/user/activate/resend, forget-password).
+    retry = [email for email in failed if email.attempts < max_attempts]
+    done = sent + [email for email in failed if email.attempts >= max_attempts]
+    OutboxEmail.objects.filter(pk__in=[email.pk for email in done]).delete()
+    OutboxEmail.objects.bulk_update(retry, ['attempts', 'last_error', 'next_attempt_at'])
+    return len(sent), len(failed)
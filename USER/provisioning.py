@@ -0,0 +1,110 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import ActivateAccount, User, UserRole
+from .outbox import activation_email, enqueue
+
+CHUNK_SIZE = 1000
+
+
+def _init_worker(settings_module):
+    # Forked workers inherit a configured Django; spawned ones must set it up.
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+        django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    """``make_password`` for each password, spread over a process pool.
+
+    Hashing is CPU-bound and holds the GIL, so threads would not help; with
+    ``workers=1`` it runs inline.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(passwords) < 2:
+        return [make_password(p) for p in passwords]
+    settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'omnify.settings')
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(settings_module,)) as pool:
+        return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def _insert_chunk(users):
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+        tokens = ActivateAccount.objects.bulk_create(ActivateAccount(email=user) for user in users)
+        enqueue(*(activation_email(token.email, token) for token in tokens))
+        return tokens
+
+
+def provision_members(rows, role=UserRole.CLIENT, chunk_size=CHUNK_SIZE, workers=None):
+    """Create inactive users with activation tokens from ``{email, password}`` rows.
+
+    Existing emails are skipped with one set-based lookup; users and their
+    ActivateAccount rows (and their queued activation emails) are inserted
+    with ``bulk_create`` in chunks, each chunk in its own transaction. Emails
+    registered by someone else meanwhile are reported as per-row errors, like
+    invalid rows. Returns a report with those errors and the throughput.
+    """
+    started = time.perf_counter()
+    errors = []
+    wanted = {}
+    rows_of = {}
+    for index, row in enumerate(rows):
+        email = User.objects.normalize_email(str(row.get('email') or '').strip())
+        password = row.get('password') or ''
+        try:
+            validate_email(email)
+        except ValidationError:
+            errors.append({'row': index, 'email': email, 'error': "Invalid email."})
+            continue
+        if not password:
+            errors.append({'row': index, 'email': email, 'error': "Password is required."})
+        elif email in wanted:
+            errors.append({'row': index, 'email': email, 'error': "Duplicate email in this batch."})
+        else:
+            wanted[email] = password
+            rows_of[email] = index
+
+    existing = set(User.objects.filter(email__in=list(wanted)).values_list('email', flat=True))
+    fresh = [email for email in wanted if email not in existing]
+    hashed = hash_passwords([wanted[email] for email in fresh], workers)
+
+    created = []
+    for start in range(0, len(fresh), chunk_size):
+        users = [
+            User(email=email, password=password, role=role, is_active=False)
+            for email, password in zip(fresh[start:start + chunk_size], hashed[start:start + chunk_size])
+        ]
+        try:
+            tokens = _insert_chunk(users)
+        except IntegrityError:
+            # Someone registered some of these emails since the lookup: retry
+            # the rest once, and if that fails too, give up on the chunk.
+            taken = set(User.objects.filter(email__in=[u.email for u in users]).values_list('email', flat=True))
+            try:
+                tokens = _insert_chunk([u for u in users if u.email not in taken])
+            except IntegrityError:
+                taken, tokens = {u.email for u in users}, []
+            errors.extend(
+                {'row': rows_of[u.email], 'email': u.email, 'error': "Email was registered during provisioning."}
+                for u in users if u.email in taken
+            )
+        created.extend(tokens)
+
+    seconds = time.perf_counter() - started
+    return {
+        'created': len(created),
+        'skipped_existing': len(existing),
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'users_per_second': round(len(created) / seconds, 1) if seconds else None,
+    }, created
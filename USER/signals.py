@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .blacklist import blacklist_filter
+from .models import User
+from .user_cache import user_cache
+
+post_save.connect(user_cache.user_saved, sender=User, dispatch_uid='user_cache_saved')
+post_delete.connect(user_cache.user_deleted, sender=User, dispatch_uid='user_cache_deleted')
+post_save.connect(blacklist_filter.token_blacklisted, sender=BlacklistedToken, dispatch_uid='blacklist_filter_bump')
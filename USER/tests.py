@@ -1,3 +1,616 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from omnify import metrics
+from USER.async_views import AsyncUserView
+from USER.authentication import tokens_for
+from USER.blacklist import FilteredRefreshToken, blacklist_filter
+from USER.provisioning import provision_members
+from USER.serializers import UserSerializer
+from USER.throttling import stats as login_throttle_stats
+from USER.models import ActivateAccount, OutboxEmail, PasswordReset, User, UserRole
+from USER.outbox import drain
+from USER.user_cache import user_cache
+
+FAST_HASHER = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class QueryBudgetMixin:
+    """Pin the number of queries each endpoint may issue.
+
+    ``call`` is run once, ``grow`` then adds rows to the tables the endpoint
+    reads, and ``call`` runs again. Both runs must issue the same number of
+    queries (nothing scales with row count) and stay within ``budget``.
+    ``prepare`` builds per-call fixtures outside the measured window and its
+    result is passed to ``call``; ``status`` is checked on both responses.
+    """
+
+    def assertQueryBudget(self, budget, call, grow, prepare=None, status=None):
+        prepare = prepare or (lambda: None)
+        call(prepare())  # absorbs one-off per-process warm-up work
+        arg = prepare()
+        with CaptureQueriesContext(connection) as before:
+            first = call(arg)
+        grow()
+        arg = prepare()
+        with CaptureQueriesContext(connection) as after:
+            response = call(arg)
+        if status is not None:
+            self.assertEqual(first.status_code, status, getattr(first, 'data', None))
+            self.assertEqual(response.status_code, status, getattr(response, 'data', None))
+        self.assertEqual(
+            len(before), len(after),
+            f"query count grew with row count: {len(before)} -> {len(after)}\n"
+            + "\n".join(q['sql'] for q in after.captured_queries),
+        )
+        self.assertLessEqual(
+            len(after), budget,
+            "\n".join(q['sql'] for q in after.captured_queries),
+        )
+        return response
+
+    def authenticate(self, user):
+        self.client.cookies['access_token'] = str(AccessToken.for_user(user))
+
+
+class QueryPlanMixin:
+    """Fail when a hot query's plan reads a whole table instead of an index.
+
+    PostgreSQL plans with ``enable_seqscan`` off, so a Seq Scan there means
+    no index can serve the query at all; on SQLite every table in ``EXPLAIN
+    QUERY PLAN`` must be a SEARCH, never a SCAN. Seed enough rows and
+    ANALYZE first so the plans are the ones production would get.
+    """
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+            try:
+                plan = queryset.explain()
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute('RESET enable_seqscan')
+            return plan, re.findall(r'Seq Scan on (\S+)', plan)
+        if connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            scans = [table for table in re.findall(r'\bSCAN (\S+)', plan) if table not in ('CONSTANT',) and not table.startswith('(')]
+            return plan, scans
+        self.skipTest(f'no plan checks for {connection.vendor}')
+
+    def assertIndexed(self, queryset, index=None):
+        plan, scans = self.explain(queryset)
+        self.assertEqual(scans, [], f"full table scan in:\n{plan}")
+        if index is not None:
+            self.assertIn(index, plan)
+        return plan
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+
+def make_users(count, prefix='user', **kwargs):
+    kwargs.setdefault('role', UserRole.CLIENT)
+    kwargs.setdefault('is_active', True)
+    start = User.objects.count()
+    User.objects.bulk_create(
+        User(email=f'{prefix}{start + i}@example.com', **kwargs) for i in range(count)
+    )
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class UserEndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='member@example.com', password='pass-1234', role=UserRole.CLIENT, is_active=True
+        )
+        self.counter = 0
+
+    def next_email(self):
+        self.counter += 1
+        return f'new{self.counter}@example.com'
+
+    def anonymous(self):
+        # Responses set an access_token cookie; drop it so each call starts alike.
+        self.client.cookies.pop('access_token', None)
+
+    def grow(self):
+        make_users(50)
+        users = list(User.objects.order_by('-pk')[:50])
+        PasswordReset.objects.bulk_create(PasswordReset(email=u) for u in users)
+        ActivateAccount.objects.bulk_create(ActivateAccount(email=u) for u in users)
+
+    def test_register(self):
+        self.assertQueryBudget(
+            6,
+            lambda _: self.client.post('/user/register', {'email': self.next_email(), 'password': 'pass-1234'}),
+            self.grow,
+            status=201,
+        )
+
+    def test_login(self):
+        caches['throttle'].clear()
+        self.assertQueryBudget(
+            2,
+            lambda _: self.client.post('/user/login', {'email': 'member@example.com', 'password': 'pass-1234'}),
+            self.grow,
+            self.anonymous,
+            status=200,
+        )
+
+    def test_logout(self):
+        def prepare():
+            self.client.cookies['refresh_token'] = str(RefreshToken.for_user(self.user))
+        self.assertQueryBudget(7, lambda _: self.client.post('/user/logout'), self.grow, prepare, status=200)
+
+    def test_profile(self):
+        self.authenticate(self.user)
+        self.assertQueryBudget(1, lambda _: self.client.get('/user/profile'), self.grow, status=200)
+
+    def test_refresh(self):
+        self.client.cookies['refresh_token'] = str(RefreshToken.for_user(self.user))
+        # One indexed blacklist lookup; none with a shared TOKEN_BLACKLIST_CACHE.
+        self.assertQueryBudget(1, lambda _: self.client.post('/user/refresh'), self.grow, self.anonymous, status=200)
+
+    def test_verify(self):
+        self.authenticate(self.user)
+        self.assertQueryBudget(1, lambda _: self.client.get('/user/verify'), self.grow, status=200)
+
+    def test_update(self):
+        self.authenticate(self.user)
+        self.assertQueryBudget(
+            2,
+            lambda _: self.client.put('/user/update', {'email': 'member@example.com', 'first_name': 'M'}),
+            self.grow,
+            status=200,
+        )
+
+    def test_forget_password(self):
+        self.assertQueryBudget(
+            5,
+            lambda _: self.client.post('/user/forget-password', {'email': 'member@example.com'}),
+            self.grow,
+            status=200,
+        )
+
+    def test_change_forget_password(self):
+        def prepare():
+            return PasswordReset.objects.create(email=self.user).token
+
+        def call(token):
+            return self.client.post(
+                f'/user/changeforgetpassword/member@example.com/{token}',
+                {'password': 'pass-5678', 'confirm_password': 'pass-5678'},
+            )
+        self.assertQueryBudget(5, call, self.grow, prepare, status=200)
+
+    def test_activate(self):
+        def prepare():
+            return ActivateAccount.objects.create(email=self.user).token
+        self.assertQueryBudget(
+            7, lambda token: self.client.post(f'/user/activate/{token}'), self.grow, prepare, status=200
+        )
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER, AUTH_TOKEN_CLAIMS_USER=True)
+class ClaimsUserTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='member@example.com', password='pass-1234', role=UserRole.CLIENT, is_active=True
+        )
+        self.client.cookies['access_token'] = str(tokens_for(self.user).access_token)
+
+    def test_verify_needs_no_user_query(self):
+        self.assertQueryBudget(0, lambda _: self.client.get('/user/verify'), lambda: make_users(50), status=200)
+
+    def test_profile_loads_the_full_row(self):
+        response = self.assertQueryBudget(
+            1, lambda _: self.client.get('/user/profile'), lambda: make_users(50), status=200
+        )
+        self.assertEqual(response.data['email'], 'member@example.com')
+
+    def test_saved_user_overrides_stale_claims(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.client.get('/user/verify').status_code, 401)
+
+    def test_refresh_reissues_current_claims(self):
+        self.client.cookies['refresh_token'] = str(tokens_for(self.user))
+        User.objects.filter(pk=self.user.pk).update(role=UserRole.INSTRUCTOR)
+        response = self.client.post('/user/refresh')
+        self.assertEqual(AccessToken(response.cookies['access_token'].value)['role'], UserRole.INSTRUCTOR)
+
+    def test_refresh_follows_the_user_id_claim_setting(self):
+        del self.client.cookies['access_token']  # issued under the old claim name
+        with mock.patch.object(jwt_settings, 'USER_ID_CLAIM', 'uid'):
+            self.client.cookies['refresh_token'] = str(tokens_for(self.user))
+            response = self.client.post('/user/refresh')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(AccessToken(response.cookies['access_token'].value)['uid'], self.user.pk)
+
+
+class TokenBlacklistTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='member@example.com', role=UserRole.CLIENT, is_active=True)
+
+    def shared_cache(self):
+        # A file cache stands in for Redis/Memcached: visible to every process.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        caches_setting = {
+            **settings.CACHES,
+            'blacklist': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory.name},
+        }
+        return self.settings(CACHES=caches_setting, TOKEN_BLACKLIST_CACHE='blacklist')
+
+    def test_database_check_without_a_shared_cache(self):
+        token = str(RefreshToken.for_user(self.user))
+        RefreshToken(token).blacklist()  # no generation bump reaches anyone
+        with self.assertNumQueries(1), self.assertRaises(TokenError):
+            FilteredRefreshToken(token)
+
+    def test_local_cache_is_not_trusted(self):
+        token = str(RefreshToken.for_user(self.user))
+        with self.settings(TOKEN_BLACKLIST_CACHE='default'):
+            RefreshToken(token).blacklist()
+            with self.assertRaises(TokenError):
+                FilteredRefreshToken(token)
+
+    def test_filter_sees_a_new_blacklist_entry(self):
+        token = str(RefreshToken.for_user(self.user))
+        with self.shared_cache():
+            FilteredRefreshToken(token)
+            with self.assertNumQueries(0):
+                FilteredRefreshToken(token)
+            with self.captureOnCommitCallbacks(execute=True):
+                RefreshToken(token).blacklist()
+            with self.assertRaises(TokenError):
+                FilteredRefreshToken(token)
+
+    def test_unreadable_counter_falls_back_to_the_database(self):
+        token = str(RefreshToken.for_user(self.user))
+        with self.shared_cache():
+            FilteredRefreshToken(token)
+            RefreshToken(token).blacklist()
+            with mock.patch.object(blacklist_filter, '_current_generation', return_value=None):
+                with self.assertRaises(TokenError):
+                    FilteredRefreshToken(token)
+
+    def test_prune_deletes_only_expired_tokens(self):
+        now = aware_utcnow()
+        OutstandingToken.objects.bulk_create(
+            OutstandingToken(jti=f'jti-{i}', token='', expires_at=now + timedelta(days=1 if i % 2 else -1))
+            for i in range(10)
+        )
+        BlacklistedToken.objects.bulk_create(BlacklistedToken(token=t) for t in OutstandingToken.objects.all())
+        call_command('prune_tokens', batch_size=3, stdout=StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 5)
+        self.assertEqual(BlacklistedToken.objects.count(), 5)
+        self.assertFalse(OutstandingToken.objects.filter(expires_at__lte=now).exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER, LOGIN_THROTTLE_EMAIL=(3, 1), LOGIN_THROTTLE_IP=(5, 1))
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        caches['throttle'].clear()
+        self.client = APIClient()
+        User.objects.create_user(email='member@example.com', password='pass-1234', is_active=True)
+
+    def login(self, email, password='wrong'):
+        return self.client.post('/user/login', {'email': email, 'password': password})
+
+    def test_email_bucket_rejects_before_hashing(self):
+        statuses = [self.login('member@example.com').status_code for _ in range(4)]
+        self.assertEqual(statuses, [400, 400, 400, 429])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.login('MEMBER@example.com', 'pass-1234')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(login_throttle_stats()['hashes_saved'], 2)
+
+    def test_ip_bucket_spans_emails(self):
+        statuses = [self.login(f'user{i}@example.com').status_code for i in range(6)]
+        self.assertEqual(statuses[-1], 429)
+        self.assertEqual(login_throttle_stats()['rejected_ip'], 1)
+
+    @override_settings(RESEND_ACTIVATION_THROTTLE_EMAIL=(2, 1), RESEND_ACTIVATION_THROTTLE_IP=(4, 1))
+    def test_activation_resends_are_throttled(self):
+        User.objects.create(email='new@example.com', is_active=False)
+        resend = lambda email: self.client.post('/user/activate/resend', {'email': email}).status_code
+        self.assertEqual([resend(email) for email in ('new@example.com', ' new@EXAMPLE.com', 'NEW@example.com')], [200, 200, 429])
+        self.assertEqual(OutboxEmail.objects.filter(to='new@example.com').count(), 2)
+        self.assertEqual([resend(f'user{i}@example.com') for i in range(3)], [200, 200, 429])
+        # Resends have their own buckets; logins are not held up.
+        self.assertEqual(self.login('new@example.com').status_code, 400)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        statuses = [
+            self.client.post(
+                '/user/login', {'email': f'user{i}@example.com', 'password': 'wrong'}, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}'
+            ).status_code
+            for i in range(6)
+        ]
+        self.assertEqual(statuses[-1], 429)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class ProvisioningTests(TestCase):
+    def test_provision_skips_existing_and_invalid_rows(self):
+        make_users(1, prefix='corp')
+        rows = [{'email': f'corp{i}@example.com', 'password': f'pass-{i}'} for i in range(6)]
+        rows += [{'email': 'not-an-email', 'password': 'x'}, {'email': 'corp1@example.com', 'password': 'y'}]
+        report, created = provision_members(rows, chunk_size=2, workers=2)
+        self.assertEqual((report['created'], report['skipped_existing'], len(report['errors'])), (5, 1, 2))
+        self.assertEqual(ActivateAccount.objects.filter(pk__in=[a.pk for a in created]).count(), 5)
+        user = User.objects.get(email='corp3@example.com')
+        self.assertFalse(user.is_active)
+        self.assertTrue(user.check_password('pass-3'))
+
+
+    def test_rows_lost_to_a_concurrent_register_are_conflicts(self):
+        rows = [{'email': f'corp{i}@example.com', 'password': 'pass'} for i in range(3)]
+        with mock.patch('USER.provisioning._insert_chunk', side_effect=IntegrityError):
+            report, created = provision_members(rows, workers=1)
+        self.assertEqual(created, [])
+        self.assertEqual([e['row'] for e in report['errors']], [0, 1, 2])
+        self.assertEqual(report['errors'][0]['error'], "Email was registered during provisioning.")
+
+    def test_endpoint_hashes_small_batches_inline(self):
+        client = APIClient()
+        client.cookies['access_token'] = str(AccessToken.for_user(
+            User.objects.create(email='admin@example.com', role=UserRole.ADMIN, is_active=True)
+        ))
+        rows = [{'email': f'corp{i}@example.com', 'password': 'pass'} for i in range(51)]
+        self.assertEqual(client.post('/user/admin/provision', rows, format='json').status_code, 400)
+        with mock.patch('USER.provisioning.ProcessPoolExecutor') as pool:
+            response = client.post('/user/admin/provision', rows[:5], format='json')
+        self.assertEqual(response.data['created'], 5)
+        pool.assert_not_called()
+
+    def test_command_rejects_json_that_is_not_a_list_of_objects(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'members.json'
+            for content in ('{"email": "corp@example.com"}', '["corp@example.com"]'):
+                path.write_text(content)
+                with self.assertRaisesMessage(CommandError, "expected a list of {email, password} objects"):
+                    call_command('provision_members', str(path), workers=1, stdout=StringIO())
+            path.write_text('[{"email": "corp@example.com", "password": "pass"}]')
+            call_command('provision_members', str(path), workers=1, stdout=StringIO())
+        self.assertTrue(User.objects.filter(email='corp@example.com').exists())
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError("smtp down")
+
+
+class UnreachableEmailBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("smtp unreachable")
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class OutboxTests(TestCase):
+    def register(self, email='new@example.com'):
+        return APIClient().post('/user/register', {'email': email, 'password': 'pass-1234'})
+
+    def test_register_queues_instead_of_sending(self):
+        self.register()
+        self.assertEqual(len(mail.outbox), 0)
+        token = ActivateAccount.objects.get().token
+        self.assertEqual(drain(), (1, 0))
+        self.assertIn(f'/user/activate/{token}', mail.outbox[0].body)
+        self.assertFalse(OutboxEmail.objects.exists())  # the link is not kept once sent
+        self.assertEqual(drain(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='USER.tests.FailingEmailBackend')
+    def test_failed_send_backs_off(self):
+        self.register()
+        self.assertEqual(drain(), (0, 1))
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, aware_utcnow() + timedelta(seconds=20))
+        self.assertEqual(drain(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='USER.tests.FailingEmailBackend', OUTBOX_MAX_ATTEMPTS=2)
+    def test_rows_out_of_attempts_are_dropped(self):
+        self.register()
+        self.assertEqual(drain(), (0, 1))
+        OutboxEmail.objects.update(next_attempt_at=aware_utcnow())
+        self.assertEqual(drain(), (0, 1))
+        self.assertFalse(OutboxEmail.objects.exists())  # nor is the link of a row that will never be sent
+
+    @override_settings(EMAIL_BACKEND='USER.tests.UnreachableEmailBackend')
+    def test_unreachable_server_backs_off(self):
+        self.register()
+        self.register('other@example.com')
+        self.assertEqual(drain(), (0, 2))
+        for email in OutboxEmail.objects.all():
+            self.assertEqual((email.attempts, email.last_error), (1, "smtp unreachable"))
+            self.assertGreater(email.next_attempt_at, aware_utcnow() + timedelta(seconds=20))
+
+    def test_file_backend(self):
+        with tempfile.TemporaryDirectory() as path:
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend', EMAIL_FILE_PATH=path):
+                self.register()
+                User.objects.create(email='member@example.com', is_active=True)
+                APIClient().post('/user/forget-password', {'email': 'member@example.com'})
+                call_command('drain_outbox', stdout=StringIO())
+            written = ''.join(Path(path, name).read_text() for name in os.listdir(path))
+        self.assertIn('/user/activate/', written)
+        self.assertIn('/user/changeforgetpassword/member@example.com/', written)
+        self.assertFalse(OutboxEmail.objects.exists())
+
+
+class TokenExpiryTests(TestCase):
+    def setUp(self):
+        caches['throttle'].clear()
+        self.user = User.objects.create(email='member@example.com', is_active=False)
+
+    def age(self, model, **delta):
+        model.objects.update(created_at=aware_utcnow() - timedelta(**delta))
+
+    def test_expired_activation_is_refused(self):
+        token = ActivateAccount.objects.create(email=self.user).token
+        self.age(ActivateAccount, days=8)
+        self.assertEqual(APIClient().post(f'/user/activate/{token}').status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+    def test_expired_reset_is_refused(self):
+        token = PasswordReset.objects.create(email=self.user).token
+        self.age(PasswordReset, hours=2)
+        response = APIClient().post(
+            f'/user/changeforgetpassword/member@example.com/{token}',
+            {'password': 'pass-5678', 'confirm_password': 'pass-5678'},
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_swept_user_can_get_a_new_link(self):
+        ActivateAccount.objects.create(email=self.user)
+        self.age(ActivateAccount, days=8)
+        call_command('sweep_account_tokens', stdout=StringIO())
+        response = APIClient().post('/user/activate/resend', {'email': 'member@example.com'})
+        self.assertEqual(response.status_code, 200)
+        token = ActivateAccount.objects.get(email=self.user).token
+        self.assertEqual(OutboxEmail.objects.filter(to='member@example.com').count(), 1)
+        self.assertEqual(APIClient().post(f'/user/activate/{token}').status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+    def test_resend_ignores_active_and_unknown_emails(self):
+        User.objects.create(email='active@example.com', is_active=True)
+        for email in ('active@example.com', 'nobody@example.com'):
+            self.assertEqual(APIClient().post('/user/activate/resend', {'email': email}).status_code, 200)
+        self.assertFalse(ActivateAccount.objects.exists())
+
+    def test_sweep_reclaims_only_expired_rows(self):
+        PasswordReset.objects.bulk_create(PasswordReset(email=self.user) for _ in range(7))
+        self.age(PasswordReset, hours=2)
+        PasswordReset.objects.bulk_create(PasswordReset(email=self.user) for _ in range(2))
+        out = StringIO()
+        call_command('sweep_account_tokens', batch_size=3, stdout=out)
+        self.assertEqual(PasswordReset.objects.count(), 2)
+        self.assertIn('PasswordReset: reclaimed 7 expired rows', out.getvalue())
+
+
+class AsyncUserViewTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email='member@example.com', role=UserRole.CLIENT, is_active=True)
+
+    async def test_profile_matches_the_sync_view(self):
+        request = AsyncRequestFactory().get('/user/profile')
+        request.COOKIES['access_token'] = str(AccessToken.for_user(self.user))
+        response = await AsyncUserView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), UserSerializer(self.user).data)
+
+
+class UserQueryPlanTests(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_users(500, prefix='member')
+        make_users(50, prefix='coach', role=UserRole.INSTRUCTOR)
+
+    def setUp(self):
+        self.analyze()
+
+    def test_lookup_by_email(self):
+        self.assertIndexed(User.objects.filter(email='coach3@example.com'))
+
+    def test_lookup_by_email_and_role(self):
+        self.assertIndexed(User.objects.filter(email='coach3@example.com', role=UserRole.INSTRUCTOR))
+        self.assertIndexed(
+            User.objects.filter(email__in=['coach3@example.com', 'member9@example.com']).only('id', 'email', 'role')
+        )
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+        patcher = mock.patch.object(metrics, 'registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(email='member@example.com', role=UserRole.CLIENT, is_active=True)
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(AccessToken.for_user(self.user))
+
+    def test_requests_are_recorded_by_url_name(self):
+        response = self.client.get('/user/profile')
+        self.client.get('/user/profile')
+        self.client.get('/no/such/page')
+        series = self.registry.snapshot()[('profile', 'GET', '200')]
+        self.assertEqual(series[metrics.REQUESTS], 2)
+        self.assertEqual(series[metrics.QUERIES], 2)  # the user row, once per request
+        self.assertEqual(series[metrics.BYTES], 2 * len(response.content))
+        self.assertEqual(sum(series[metrics.FIRST_BUCKET:]), 2)
+        self.assertIn(('unmatched', 'GET', '404'), self.registry.snapshot())
+
+    @override_settings(METRICS_TOKEN='scrape-me')
+    def test_prometheus_text(self):
+        self.client.get('/user/profile')
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        labels = 'route="profile",method="GET",status="200"'
+        self.assertIn(f'omnify_http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1\n', body)
+        self.assertIn(f'omnify_http_request_duration_seconds_count{{{labels}}} 1\n', body)
+        self.assertIn(f'omnify_http_db_queries_total{{{labels}}} ', body)
+        self.assertNotIn('route="metrics"', body)
+
+    def test_metrics_need_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with self.settings(METRICS_TOKEN='scrape-me'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer guess').status_code, 401)
+            for header in ('scrape-me', 'Basic scrape-me', 'Bearerscrape-me'):
+                self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION=header).status_code, 401)
+
+    def test_dead_threads_shards_are_folded_in(self):
+        def record():
+            self.registry.record('profile', 'GET', 200, 0.01, 1, 0.001, 10)
+        for _ in range(3):
+            thread = threading.Thread(target=record)
+            thread.start()
+            thread.join()
+        record()
+        self.assertEqual(len(self.registry._shards), 1)
+        self.assertEqual(self.registry.snapshot()[('profile', 'GET', '200')][metrics.REQUESTS], 4)
+
+    def test_workers_are_added_up(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            self.client.get('/user/profile')
+            other = [['profile', 'GET', '200', [3, 0.5, 3, 0.01, 300] + [3] + [0] * 10]]
+            Path(directory, 'metrics-999999.json').write_text(json.dumps(other))
+            series = self.registry.collect()[('profile', 'GET', '200')]
+            self.assertEqual(series[metrics.REQUESTS], 4)
+            self.assertTrue(Path(directory, f'metrics-{os.getpid()}.json').exists())
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+COUNTERS = ('attempts', 'allowed', 'rejected_email', 'rejected_ip')
+COUNTER_KEY = 'login-throttle:count:{}'
+
+
+class LoginThrottle(BaseThrottle):
+    """Token buckets per email and per client IP in front of ``authenticate()``.
+
+    Each attempt needs a token from both buckets; buckets refill continuously
+    and are kept in the local ``throttle`` cache. A rejected attempt never
+    reaches the password hasher, and ``stats()`` counts how many did not.
+    """
+
+    scope = 'login-throttle'
+    email_rate = 'LOGIN_THROTTLE_EMAIL'
+    ip_rate = 'LOGIN_THROTTLE_IP'
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.cache = caches['throttle']
+        self.wait_seconds = None
+
+    def buckets(self, request):
+        email = str(request.data.get('email') or '').strip().lower()
+        digest = hashlib.sha1(email.encode()).hexdigest()
+        return [
+            ('email', f'{self.scope}:email:{digest}', getattr(settings, self.email_rate)),
+            ('ip', f'{self.scope}:ip:{self.client_ip(request)}', getattr(settings, self.ip_rate)),
+        ]
+
+    def client_ip(self, request):
+        # Without NUM_PROXIES, get_ident() would take X-Forwarded-For as sent
+        # by the client, and a new header value would mean a fresh bucket.
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR')
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        buckets = self.buckets(request)
+        now = time.time()
+        with self.lock:
+            states = self.cache.get_many([key for _, key, _ in buckets])
+            updated = {}
+            for name, key, (burst, per_minute) in buckets:
+                tokens, stamp = states.get(key, (burst, now))
+                tokens = min(burst, tokens + (now - stamp) * per_minute / 60)
+                if tokens < 1:
+                    self.count('attempts', f'rejected_{name}')
+                    self.wait_seconds = (1 - tokens) * 60 / per_minute
+                    return False
+                # Idle for long enough to refill completely, the bucket can expire.
+                updated[key] = ((tokens - 1, now), int(burst * 60 / per_minute) + 1)
+            for key, (state, timeout) in updated.items():
+                self.cache.set(key, state, timeout)
+        self.count('attempts', 'allowed')
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+    def count(self, *names):
+        for name in names:
+            key = f'{self.scope}:count:{name}'
+            if not self.cache.add(key, 1, timeout=None):
+                self.cache.incr(key)
+
+
+class ResendActivationThrottle(LoginThrottle):
+    """The same buckets in front of /user/activate/resend, which sends mail."""
+
+    scope = 'resend-throttle'
+    email_rate = 'RESEND_ACTIVATION_THROTTLE_EMAIL'
+    ip_rate = 'RESEND_ACTIVATION_THROTTLE_IP'
+
+
+def stats():
+    """Throttle counters for this process; ``hashes_saved`` is every rejected attempt."""
+    values = caches['throttle'].get_many([COUNTER_KEY.format(name) for name in COUNTERS])
+    counters = {name: values.get(COUNTER_KEY.format(name), 0) for name in COUNTERS}
+    counters['hashes_saved'] = counters['rejected_email'] + counters['rejected_ip']
+    return counters
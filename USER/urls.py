@@ -1,27 +1,35 @@
+from django.conf import settings
 from django.urls import path
+from USER.async_views import AsyncUserView
 from USER.views import(
     RegisterView,
+    ProvisionMembersView,
     LoginView,
+    LoginThrottleStatsView,
     LogoutView,
     UserView,
     CookieTokenRefreshView,
     VerifyUserView,
     ForgetPasswordView,
     ActivateAccountView,
+    ResendActivationView,
     changeForgetPasswordView,
     UpdateUserView
 )
 
 urlpatterns = [
     path('register', RegisterView.as_view(), name='register'),
+    path('admin/provision', ProvisionMembersView.as_view(), name='provision-members'),
     path('login', LoginView.as_view(), name='login'),
+    path('login/throttle', LoginThrottleStatsView.as_view(), name='login-throttle-stats'),
     path('logout', LogoutView.as_view(), name='logout'),
-    path('profile', UserView.as_view(), name='profile'),
+    path('profile', (AsyncUserView if settings.ASYNC_READ_VIEWS else UserView).as_view(), name='profile'),
     path('refresh', CookieTokenRefreshView.as_view(), name='refresh-token'),
     path('verify', VerifyUserView.as_view(), name='verify-user'),
     path('update', UpdateUserView.as_view(), name='update-user'),
     path('forget-password', ForgetPasswordView.as_view(), name='forget-password'),
     path('changeforgetpassword/<str:email>/<uuid:token>', changeForgetPasswordView.as_view(), name='change-forget-password'),
+    path('activate/resend', ResendActivationView.as_view(), name='resend-activation'),
     path('activate/<token>', ActivateAccountView.as_view(), name='activate-account'),
 ]
 
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import User
+
+# Fields a lightweight user carries; anything else is deferred and loads on access.
+LIGHT_FIELDS = ('id', 'role', 'is_active')
+
+
+def light_user(pk, role, is_active):
+    """A ``User`` holding only ``LIGHT_FIELDS``, built without a query."""
+    # from_db takes values in model field order, not LIGHT_FIELDS order.
+    values = {'id': pk, 'role': role, 'is_active': is_active}
+    names = [f.attname for f in User._meta.concrete_fields if f.attname in values]
+    return User.from_db(None, names, [values[name] for name in names])
+
+
+def is_light(user):
+    return bool(user.get_deferred_fields())
+
+
+class UserCache:
+    """Bounded in-process LRU of ``(role, is_active)`` keyed by user id.
+
+    Entries expire after ``AUTH_USER_CACHE_TTL`` seconds and the least
+    recently used one is dropped past ``AUTH_USER_CACHE_SIZE``. Saves in this
+    process write through (see signals.py); ``QuerySet.update()`` bypasses
+    signals, so code that changes role or is_active in bulk must call
+    ``forget``.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, pk):
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                del self._entries[pk]
+                return None
+            self._entries.move_to_end(pk)
+        return light_user(pk, entry[0], entry[1])
+
+    def put(self, pk, role, is_active):
+        ttl = getattr(settings, 'AUTH_USER_CACHE_TTL', 60)
+        size = getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+        with self._lock:
+            self._entries[pk] = (role, is_active, time.monotonic() + ttl)
+            self._entries.move_to_end(pk)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def forget(self, pk):
+        with self._lock:
+            self._entries.pop(pk, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def user_saved(self, sender, instance, **kwargs):
+        # Drop the entry now and write the new values once they are committed.
+        self.forget(instance.pk)
+        deferred = instance.get_deferred_fields()
+        if 'role' not in deferred and 'is_active' not in deferred:
+            pk, role, is_active = instance.pk, instance.role, instance.is_active
+            transaction.on_commit(lambda: self.put(pk, role, is_active))
+
+    def user_deleted(self, sender, instance, **kwargs):
+        self.forget(instance.pk)
+
+
+user_cache = UserCache()
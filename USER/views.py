@@ -5,6 +5,7 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db import transaction
 
@@ -15,6 +16,12 @@ from .models import (
     PasswordReset,
     UserRole
     )
+from .blacklist import FilteredRefreshToken
+from .expiry import live
+from .outbox import activation_email, enqueue, password_reset_email
+from .provisioning import provision_members
+from .throttling import LoginThrottle, ResendActivationThrottle, stats as login_throttle_stats
+from .authentication import USER_CLAIMS, claims_mode, full_user, tokens_for
 from .serializers import (
     UserSerializer, 
     LoginSerializer
@@ -48,21 +55,45 @@ class RegisterView(APIView):
             with transaction.atomic():
 
                 user = User.objects.create_user(email=email, password=password, role=role)
-                ActivateAccount.objects.create(email=user)
-                print(f'curl -X POST http://127.0.0.1:8000/user/activate/{ActivateAccount.objects.get(email=user).token}')
+                activation = ActivateAccount.objects.create(email=user)
+                enqueue(activation_email(user, activation))
                 response = Response({"message": "Registration successful"}, status=status.HTTP_201_CREATED)
  
         except Exception as e:
             response = Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return response
 
+class ProvisionMembersView(APIView):
+    permission_classes=[IsAuthenticated]
+    # Each password hash takes a noticeable fraction of a second, and this
+    # runs inside the request on a web worker, so only small batches are
+    # hashed here, inline. Bulk imports belong to the provision_members command.
+    MAX_ROWS = 50
+
+    def post(self, request):
+        if request.user.role != UserRole.ADMIN:
+            return Response({"error": "Only admin users can provision members."}, status=status.HTTP_403_FORBIDDEN)
+        rows = request.data.get("members") if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            return Response({"error": "Expected a list of {email, password} objects."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.MAX_ROWS:
+            return Response(
+                {"error": f"At most {self.MAX_ROWS} members per request; use the provision_members command for more."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        report, _ = provision_members(rows, workers=1)
+        return Response(report, status=status.HTTP_201_CREATED)
+
 class LoginView(APIView):
+    # Rejects bursts before LoginSerializer reaches the password hasher.
+    throttle_classes = [LoginThrottle]
+
     def post(self, request):
         try:
             serializer = LoginSerializer(data=request.data)
             if serializer.is_valid():
                 user=serializer.validated_data
-                refresh = RefreshToken.for_user(user)
+                refresh = tokens_for(user)
                 access_token = str(refresh.access_token)
                 response=Response(
                     {"user": {
@@ -95,13 +126,20 @@ class LoginView(APIView):
         except Exception as e:  
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+class LoginThrottleStatsView(APIView):
+    permission_classes=[IsAuthenticated]
+    def get(self, request):
+        if request.user.role != UserRole.ADMIN:
+            return Response({"error": "Only admin users can view login throttle stats."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(login_throttle_stats(), status=status.HTTP_200_OK)
+
 class LogoutView(APIView):
     # permission_class=[IsAuthenticated]
     def post(self, request):
         refresh_token=request.COOKIES.get("refresh_token")
         if refresh_token:
             try:
-                refresh = RefreshToken(refresh_token)
+                refresh = FilteredRefreshToken(refresh_token)
                 refresh.blacklist()
             except Exception as e:
                 return Response({"error": "Error Invalidate token"}, status=status.HTTP_401_UNAUTHORIZED)
@@ -118,7 +156,7 @@ class LogoutView(APIView):
 class UpdateUserView(APIView):
     permission_classes=[IsAuthenticated]
     def put(self, request):
-        user=request.user
+        user=full_user(request.user)
         if user.email != request.data.get("email"):
             return Response({"error": "Email cannot be changed"}, status=status.HTTP_400_BAD_REQUEST)
         if request.data.get("password"):
@@ -137,7 +175,7 @@ class UserView(APIView):
     permission_classes=[IsAuthenticated]
     def get(self, request):
         try:
-            user = request.user
+            user = full_user(request.user)
             serializer=UserSerializer(user)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Exception:
@@ -150,8 +188,17 @@ class CookieTokenRefreshView(APIView):
         if not refresh_token:
             return Response({"error": "Refresh token not found in cookies"}, status=status.HTTP_401_UNAUTHORIZED)
         try:
-            refresh = RefreshToken(refresh_token)
-            access_token = str(refresh.access_token)
+            refresh = FilteredRefreshToken(refresh_token)
+            access = refresh.access_token
+            if claims_mode():
+                # Claims may have gone stale since login; re-read them here.
+                user_id = refresh.get(api_settings.USER_ID_CLAIM)
+                claims = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values(*USER_CLAIMS).first()
+                if not claims or not claims['is_active']:
+                    return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+                for claim, value in claims.items():
+                    access[claim] = value
+            access_token = str(access)
             response=Response({"message": "Token refreshed successfully"}, status=status.HTTP_200_OK)
             response.set_cookie(key="access_token",
                                 value=access_token, 
@@ -181,9 +228,9 @@ class ForgetPasswordView(APIView):
         if not user:
             return Response({"error": "User not exist"}, status=status.HTTP_404_NOT_FOUND)
         try:
-            forget_password = PasswordReset.objects.create(email=user)
-            print()
-
+            with transaction.atomic():
+                forget_password = PasswordReset.objects.create(email=user)
+                enqueue(password_reset_email(user, forget_password))
             return Response({"message": "Password reset link sent successfully"}, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -201,7 +248,7 @@ class changeForgetPasswordView(APIView):
 
         try:
             email=User.objects.get(email=email)
-            forget_password = PasswordReset.objects.filter(email=email, token=token).first()
+            forget_password = live(PasswordReset).filter(email=email, token=token).first()
             if not forget_password:
                 return Response({"error": "Invalid token or expired."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -248,7 +295,7 @@ class ActivateAccountView(APIView):
     def post(self, request, *args, **kwargs):
         token = kwargs.get("token")
         try:
-            activate_account = ActivateAccount.objects.get(token=token)
+            activate_account = live(ActivateAccount).get(token=token)
             if not activate_account:
                 return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
             user = User.objects.get(email=activate_account.email)
@@ -260,4 +307,26 @@ class ActivateAccountView(APIView):
                 activate_account.delete()
                 return Response({"message": f"{user.email} Account activated successfully"}, status=status.HTTP_200_OK)
         except Exception as e:
-            return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
+
+class ResendActivationView(APIView):
+    permission_classes = [AllowAny]
+    throttle_classes = [ResendActivationThrottle]
+
+    def post(self, request):
+        # Activation links expire (ACCOUNT_ACTIVATION_TTL) and are then swept,
+        # so an inactive user asks for a new one here. The answer is the
+        # same whether or not the email needs one.
+        email = request.data.get("email")
+        if not email:
+            return Response({"error": "Email is required"}, status=status.HTTP_400_BAD_REQUEST)
+        user = User.objects.filter(email=User.objects.normalize_email(email), is_active=False).first()
+        if user:
+            with transaction.atomic():
+                ActivateAccount.objects.filter(email=user).delete()
+                activation = ActivateAccount.objects.create(email=user)
+                enqueue(activation_email(user, activation))
+        return Response(
+            {"message": "If the account is waiting for activation, a new link has been sent."},
+            status=status.HTTP_200_OK,
+        )
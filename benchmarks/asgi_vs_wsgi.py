@@ -0,0 +1,150 @@
+"""Requests per second of the read endpoints under WSGI and under ASGI.
+
+Each mode runs in its own process against a fresh test database:
+
+* ``wsgi`` drives Django's WSGI handler (the synchronous APIViews) from a
+  pool of ``--concurrency`` threads, as a threaded WSGI server would;
+* ``asgi`` drives the ASGI handler with the native async views and
+  ``--concurrency`` concurrent tasks on one event loop, as uvicorn would.
+
+No network server is involved, so the numbers compare the two Django
+request paths rather than a particular server. Run from the repository
+root, with DJANGO_SETTINGS_MODULE pointing at a database you can create a
+test database on:
+
+    python benchmarks/asgi_vs_wsgi.py --requests 4000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PATHS = ['/fitness/classTypes', '/fitness/admin/session', '/fitness/instructor/booking', '/user/profile']
+
+
+def setup(mode):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'omnify.settings')
+    os.environ['OMNIFY_ASYNC_VIEWS'] = '1' if mode == 'asgi' else '0'
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = ['*']
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    from datetime import time as clock
+    from rest_framework_simplejwt.tokens import AccessToken
+    from omnifyFitness.models import ClassType, Sessions
+    from USER.models import User, UserRole
+
+    instructor = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+    class_type, _ = ClassType.objects.get_or_create(name='YOGA')
+    Sessions.objects.bulk_create(
+        Sessions(class_type=class_type, day_of_week=day, start_time=clock(hour), end_time=clock(hour, 45),
+                 capacity=20, instructor=instructor)
+        for day in range(7) for hour in range(6, 22)
+    )
+    return old_name, str(AccessToken.for_user(instructor))
+
+
+def summarize(mode, latencies, elapsed):
+    latencies.sort()
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+def run_wsgi(token, requests, concurrency):
+    from django.test import Client
+
+    def worker(count):
+        client = Client()
+        client.cookies['access_token'] = token
+        timings = []
+        for i in range(count):
+            started = time.perf_counter()
+            response = client.get(PATHS[i % len(PATHS)])
+            assert response.status_code == 200, response.status_code
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = [t for timings in pool.map(worker, shares) for t in timings]
+    return summarize('wsgi', latencies, time.perf_counter() - started)
+
+
+def run_asgi(token, requests, concurrency):
+    from django.test import AsyncClient
+
+    async def worker(count):
+        client = AsyncClient()
+        client.cookies['access_token'] = token
+        timings = []
+        for i in range(count):
+            started = time.perf_counter()
+            response = await client.get(PATHS[i % len(PATHS)])
+            assert response.status_code == 200, response.status_code
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    async def main():
+        shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+        results = await asyncio.gather(*(worker(share) for share in shares))
+        return [t for timings in results for t in timings]
+
+    started = time.perf_counter()
+    latencies = asyncio.run(main())
+    return summarize('asgi', latencies, time.perf_counter() - started)
+
+
+def child(mode, requests, concurrency):
+    old_name, token = setup(mode)
+    from django.db import connection
+    try:
+        runner = run_asgi if mode == 'asgi' else run_wsgi
+        runner(token, len(PATHS) * 5, min(concurrency, 5))  # warm caches and connections
+        print(json.dumps(runner(token, requests, concurrency)))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        return child(args.mode, args.requests, args.concurrency)
+
+    results = []
+    for mode in ('wsgi', 'asgi'):
+        out = subprocess.run(
+            [sys.executable, __file__, '--mode', mode,
+             '--requests', str(args.requests), '--concurrency', str(args.concurrency)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    for result in results:
+        print(f"{result['mode']}: {result['rps']} req/s, p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
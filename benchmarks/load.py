@@ -0,0 +1,360 @@
+"""Load benchmarks for the booking and schedule endpoints.
+
+Each scenario runs in its own process against a freshly created test
+database, with the same seeded data every time:
+
+* ``booking_stampede``: ``--clients`` members race to book one session of
+  ``--capacity`` seats; the run also checks the session was not oversold;
+* ``timetable``: the paginated timetable over 10,000 sessions, walking
+  every page plus filtered listings, with the response cache disabled so
+  each request renders from the database;
+* ``login_burst``: distinct members logging in at once, through the real
+  password hasher (``--fast-hash`` swaps in MD5 to measure the rest);
+* ``session_create``: an admin creating sessions across every day and
+  time slot.
+
+Requests go through Django's WSGI handler from ``--concurrency`` threads;
+no network server is involved. Every scenario reports throughput,
+p50/p95/p99 latency and database queries per request (counted by
+omnify.metrics), and the run is saved as JSON named after the current
+commit. ``--compare`` checks a run against an earlier file and exits
+non-zero when a scenario got slower than ``--tolerance`` allows.
+
+Run from the repository root, against SQLite or a local PostgreSQL via
+DJANGO_SETTINGS_MODULE:
+
+    python benchmarks/load.py
+    python benchmarks/load.py --scenario timetable --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / 'benchmarks' / 'results'
+PASSWORD = 'benchmark-password'
+
+
+def setup(options):
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'omnify.settings')
+    os.environ['OMNIFY_ASYNC_VIEWS'] = '0'
+    import django
+    from django.conf import settings
+
+    settings.ALLOWED_HOSTS = ['*']
+    settings.DEBUG = False
+    # Login bursts come from one address; the throttle is not under test.
+    settings.LOGIN_THROTTLE_EMAIL = settings.LOGIN_THROTTLE_IP = (10 ** 9, 10 ** 9)
+    if options.child == 'timetable':
+        # Measure rendering from the database, not the response cache.
+        settings.CACHES = {**settings.CACHES, 'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+    if options.fast_hash:
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+    database = settings.DATABASES['default']
+    if database['ENGINE'].endswith('sqlite3'):
+        # The default in-memory test database cannot take concurrent writers,
+        # deferred transactions fail with "database is locked" instead of
+        # queueing when two of them try to write, and the default 5 s busy
+        # timeout is shorter than the queue of writers can get.
+        if not database.get('TEST', {}).get('NAME'):
+            database.setdefault('TEST', {})['NAME'] = str(Path(tempfile.mkdtemp()) / 'benchmark.sqlite3')
+        database.setdefault('OPTIONS', {}).setdefault('transaction_mode', 'IMMEDIATE')
+        database['OPTIONS'].setdefault('timeout', 60)
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    return connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def measure(calls, concurrency, expected):
+    """Run ``calls`` (each returning a response) from ``concurrency`` threads."""
+    from django.db import connection
+    from omnify import metrics
+
+    metrics.registry = registry = metrics.Registry()
+    pending = queue.SimpleQueue()
+    for call in calls:
+        pending.put(call)
+    latencies, statuses, lock = [], {}, threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                try:
+                    call = pending.get_nowait()
+                except queue.Empty:
+                    return
+                started = time.perf_counter()
+                status = call().status_code
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    totals = registry.snapshot().values()
+    queries = sum(series[metrics.QUERIES] for series in totals)
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'unexpected_statuses': {str(s): n for s, n in statuses.items() if s not in expected},
+        'statuses': {str(s): n for s, n in sorted(statuses.items())},
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queries_per_request': round(queries / len(latencies), 2),
+    }
+
+
+def client_for(user=None):
+    from django.test import Client
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    # Errors (e.g. SQLite "database is locked") count as 500s, not crashes.
+    client = Client(raise_request_exception=False)
+    if user is not None:
+        client.cookies['access_token'] = str(AccessToken.for_user(user))
+    return client
+
+
+def make_users(prefix, count, role):
+    from django.contrib.auth.hashers import make_password
+    from USER.models import User
+
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(email=f'{prefix}{i}@example.com', password=password, role=role, is_active=True) for i in range(count)
+    )
+    return list(User.objects.filter(email__startswith=prefix).order_by('pk'))
+
+
+def booking_stampede(options):
+    from datetime import time as clock
+    from omnifyFitness.models import Booking, ClassType, Sessions
+    from USER.models import UserRole
+
+    class_type = ClassType.objects.get_or_create(name='YOGA')[0]
+    session = Sessions.objects.create(
+        class_type=class_type, day_of_week=1, start_time=clock(9), end_time=clock(10), capacity=options.capacity,
+    )
+    members = make_users('member', options.clients, UserRole.CLIENT)
+    clients = [(client_for(member)) for member in members]
+    calls = [
+        (lambda client=client: client.post('/fitness/client/booking', {'class_session': session.pk}, content_type='application/json'))
+        for client in clients
+    ]
+    result = measure(calls, options.concurrency, expected={201, 400})
+    session.refresh_from_db()
+    booked = Booking.objects.filter(class_session=session).count()
+    result['booked'] = booked
+    result['oversold'] = booked > options.capacity or session.seats_taken != booked
+    return result
+
+
+def timetable(options):
+    from datetime import time as clock
+    from omnifyFitness.models import ClassType, Sessions
+
+    ClassType.objects.bulk_create(ClassType(name=f'CLASS{i:03}') for i in range(100))
+    types = list(ClassType.objects.filter(name__startswith='CLASS').order_by('pk'))
+    Sessions.objects.bulk_create(
+        (
+            Sessions(class_type=class_type, day_of_week=day, start_time=clock(hour), end_time=clock(hour, 45), capacity=20)
+            for class_type in types for day in range(7) for hour in range(6, 21)
+        ),
+        batch_size=1000,
+    )
+    Sessions.objects.filter(pk__in=Sessions.objects.order_by('-pk').values('pk')[:500]).delete()  # 10,000 left
+
+    urls, url = [], '/fitness/admin/session?page_size=50'
+    walker = client_for()
+    while url:
+        urls.append(url)
+        url = walker.get(url).json()['next']
+    urls += ['/fitness/admin/session?day=mon', '/fitness/admin/session?class_type=CLASS007,CLASS042',
+             '/fitness/admin/session?start_from=09:00&start_to=12:00', '/fitness/admin/session?open=true']
+    calls = [(lambda url=urls[i % len(urls)]: client_for().get(url)) for i in range(options.requests)]
+    result = measure(calls, options.concurrency, expected={200})
+    result['sessions'] = Sessions.objects.count()
+    result['pages'] = len(urls) - 4
+    return result
+
+
+def login_burst(options):
+    from USER.models import UserRole
+
+    members = make_users('login', options.logins, UserRole.CLIENT)
+    calls = [
+        (lambda email=member.email: client_for().post(
+            '/user/login', {'email': email, 'password': PASSWORD}, content_type='application/json'))
+        for member in members
+    ]
+    result = measure(calls, options.concurrency, expected={200})
+    result['hasher'] = 'md5' if options.fast_hash else 'default'
+    return result
+
+
+def session_create(options):
+    from omnifyFitness.models import ClassType
+    from USER.models import User, UserRole
+
+    admin = User.objects.create(email='admin@example.com', role=UserRole.ADMIN, is_active=True)
+    coaches = make_users('coach', 10, UserRole.INSTRUCTOR)
+    ClassType.objects.bulk_create(ClassType(name=f'CLASS{i:03}') for i in range(len(coaches)))
+    days = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+    # Half-hour slots from 00:00 to 23:00; a 23:30 start would end at
+    # midnight, which the API rejects.
+    slots = len(days) * 47
+    payloads = []
+    for n in range(min(options.requests, slots * len(coaches))):
+        slot, lane = n % slots, n // slots
+        minutes = slot // len(days) * 30
+        payloads.append({
+            'class_type': f'CLASS{lane:03}',
+            'day_of_week': [days[slot % len(days)]],
+            'start_time': f'{minutes // 60:02}:{minutes % 60:02}',
+            'duration_minutes': 30,
+            'capacity': 20,
+            'instructor_email': coaches[lane].email,
+        })
+    calls = [
+        (lambda payload=payload: client_for(admin).post(
+            '/fitness/admin/session/create', payload, content_type='application/json'))
+        for payload in payloads
+    ]
+    return measure(calls, options.concurrency, expected={201})
+
+
+SCENARIOS = {
+    'booking_stampede': booking_stampede,
+    'timetable': timetable,
+    'login_burst': login_burst,
+    'session_create': session_create,
+}
+
+
+def child(options):
+    old_name = setup(options)
+    from django.db import connection
+    try:
+        result = SCENARIOS[options.child](options)
+        result['vendor'] = connection.vendor
+        print(json.dumps(result))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(run, baseline, tolerance):
+    """Print the change per scenario; return the names that regressed."""
+    regressed = []
+    for name, result in run['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        slower = result['p95_ms'] > before['p95_ms'] * (1 + tolerance)
+        fewer = result['rps'] < before['rps'] * (1 - tolerance)
+        more_queries = result['queries_per_request'] > before['queries_per_request']
+        errors = sum(result['unexpected_statuses'].values()) > sum(before['unexpected_statuses'].values())
+        flag = ' REGRESSION' if slower or fewer or more_queries or errors else ''
+        print(
+            f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms, rps {before['rps']} -> {result['rps']}, "
+            f"queries/request {before['queries_per_request']} -> {result['queries_per_request']}{flag}"
+        )
+        if flag:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='run only this scenario (repeatable); default all')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='requests for timetable and session_create')
+    parser.add_argument('--clients', type=int, default=500, help='members in the booking stampede')
+    parser.add_argument('--capacity', type=int, default=50, help='seats in the booking stampede')
+    parser.add_argument('--logins', type=int, default=100, help='members in the login burst')
+    parser.add_argument('--fast-hash', action='store_true', help='log in through MD5 instead of the default hasher')
+    parser.add_argument('--output', type=Path, help='results file; default benchmarks/results/<commit>-<time>.json')
+    parser.add_argument('--compare', type=Path, help='earlier results file to check this run against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed p95/throughput change, as a fraction')
+    parser.add_argument('--child', choices=sorted(SCENARIOS), help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    if options.child:
+        return child(options)
+
+    passthrough = [
+        '--concurrency', str(options.concurrency), '--requests', str(options.requests),
+        '--clients', str(options.clients), '--capacity', str(options.capacity), '--logins', str(options.logins),
+        *(['--fast-hash'] if options.fast_hash else []),
+    ]
+    run = {
+        'commit': commit(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': vars(options) | {'output': None, 'compare': None},
+        'scenarios': {},
+    }
+    for name in options.scenario or SCENARIOS:
+        out = subprocess.run(
+            [sys.executable, __file__, '--child', name, *passthrough],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = run['scenarios'][name] = json.loads(out.strip().splitlines()[-1])
+        print(
+            f"{name} [{result['vendor']}]: {result['requests']} requests, {result['rps']} req/s, "
+            f"p50 {result['p50_ms']} / p95 {result['p95_ms']} / p99 {result['p99_ms']} ms, "
+            f"{result['queries_per_request']} queries/request"
+            + (f", unexpected statuses {result['unexpected_statuses']}" if result['unexpected_statuses'] else '')
+        )
+
+    output = options.output or RESULTS_DIR / f"{run['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run, indent=2))
+    print(f'saved {output}')
+
+    if options.compare:
+        regressed = compare(run, json.loads(options.compare.read_text()), options.tolerance)
+        if regressed:
+            sys.exit(f"regressed: {', '.join(regressed)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'omnify.settings')
+# Route the read endpoints to their native async views (see ASYNC_READ_VIEWS).
+os.environ.setdefault('OMNIFY_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,292 @@
+"""Per-endpoint request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` records, for every request, the resolved URL name,
+method and status with its latency, database query count and time, and
+response size. Each thread adds to its own shard, so recording takes no
+lock. With ``METRICS_DIR`` set, every worker process writes its totals to
+``metrics-<pid>.json`` there at most every ``METRICS_FLUSH_SECONDS``, and
+``/metrics`` adds up the files of all workers, including ones that have
+exited, so counters never go backwards. Empty the directory when the
+deployment restarts. ``/metrics`` answers only requests bearing
+``METRICS_TOKEN``, and 404s while it is unset.
+"""
+import hmac
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Per-series totals: [requests, seconds, queries, query seconds, bytes, *bucket counts].
+REQUESTS, SECONDS, QUERIES, QUERY_SECONDS, BYTES, FIRST_BUCKET = range(6)
+
+_query_stats = ContextVar('metrics_query_stats', default=None)
+
+
+def buckets():
+    return getattr(settings, 'METRICS_BUCKETS', DEFAULT_BUCKETS)
+
+
+def count_queries(execute, sql, params, many, context):
+    # Installed on every connection; only counts inside a measured request.
+    # The context variable follows the request into sync_to_async threads.
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+def install_query_counter(connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+connection_created.connect(install_query_counter, dispatch_uid='metrics_count_queries')
+
+
+class Registry:
+    def __init__(self):
+        self._shards_guard = threading.Lock()
+        self._flush_guard = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._shards = []  # (thread, shard) pairs
+        self._retired = {}  # totals of shards whose thread has exited
+        self._flushed_at = 0.0
+
+    def _shard(self):
+        if self._pid != os.getpid():
+            self._reset()  # forked after recording; the parent keeps its own totals
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_guard:
+                self._retire_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _retire_dead_shards(self):
+        # Servers that start a thread per request (runserver) would otherwise
+        # grow the list forever. A dead thread can no longer write to its shard.
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                for key, series in shard.items():
+                    _add(self._retired, key, list(series))
+        self._shards = alive
+
+    def record(self, route, method, status, seconds, queries, query_seconds, size):
+        bounds = buckets()
+        shard = self._shard()
+        key = (route, method, str(status))
+        series = shard.get(key)
+        if series is None:
+            series = shard[key] = [0] * (FIRST_BUCKET + len(bounds))
+        series[REQUESTS] += 1
+        series[SECONDS] += seconds
+        series[QUERIES] += queries
+        series[QUERY_SECONDS] += query_seconds
+        series[BYTES] += size
+        for i, bound in enumerate(bounds):
+            if seconds <= bound:
+                series[FIRST_BUCKET + i] += 1
+                break
+        self.maybe_flush()
+
+    def snapshot(self):
+        """This process's totals, merged across threads."""
+        with self._shards_guard:
+            shards = [shard for _, shard in self._shards]
+            totals = {key: list(series) for key, series in self._retired.items()}
+        for shard in shards:
+            # Only the owning thread writes to a shard, so copying it is safe.
+            for key, series in list(shard.items()):
+                _add(totals, key, list(series))
+        return totals
+
+    def path(self, pid=None):
+        directory = getattr(settings, 'METRICS_DIR', None)
+        return Path(directory) / f'metrics-{pid or os.getpid()}.json' if directory else None
+
+    def flush(self):
+        path = self.path()
+        if path is None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows = [[*key, series] for key, series in self.snapshot().items()]
+        tmp = path.with_suffix(f'.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(rows))
+        os.replace(tmp, path)
+
+    def maybe_flush(self):
+        interval = getattr(settings, 'METRICS_FLUSH_SECONDS', 5)
+        now = time.monotonic()
+        if now - self._flushed_at < interval or not self._flush_guard.acquire(blocking=False):
+            return
+        try:
+            self._flushed_at = now
+            self.flush()
+        finally:
+            self._flush_guard.release()
+
+    def collect(self):
+        """Totals across every worker that has written to METRICS_DIR."""
+        path = self.path()
+        if path is None:
+            return self.snapshot()
+        self.flush()
+        totals = {}
+        for other in path.parent.glob('metrics-*.json'):
+            try:
+                rows = json.loads(other.read_text())
+            except (OSError, ValueError):
+                continue  # being replaced right now; picked up next scrape
+            for route, method, status, series in rows:
+                _add(totals, (route, method, status), series)
+        return totals
+
+
+def _add(totals, key, series):
+    current = totals.get(key)
+    if current is None:
+        totals[key] = series
+    else:
+        for i, value in enumerate(series):
+            current[i] += value
+
+
+registry = Registry()
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name if match.url_name else match.route
+
+
+class MetricsMiddleware:
+    """Time each request and record it under its URL name."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token, stats, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        self.finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        token, stats, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_stats.reset(token)
+        self.finish(request, response, stats, started)
+        return response
+
+    def start(self):
+        stats = [0, 0.0]
+        return _query_stats.set(stats), stats, time.perf_counter()
+
+    def finish(self, request, response, stats, started):
+        route = route_of(request)
+        if route == 'metrics':
+            return
+        # A streamed body is still being produced; only its headers are timed.
+        size = 0 if response.streaming else len(response.content)
+        registry.record(
+            route, request.method, response.status_code,
+            time.perf_counter() - started, stats[0], stats[1], size,
+        )
+
+
+def _install_on_open_connections(**kwargs):
+    # Connections opened before this module was imported.
+    for connection in connections.all(initialized_only=True):
+        install_query_counter(connection)
+
+
+request_started.connect(_install_on_open_connections, dispatch_uid='metrics_install_on_open_connections')
+
+
+def _labels(route, method, status, **extra):
+    pairs = {'route': route, 'method': method, 'status': status, **extra}
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs.items())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render(totals):
+    bounds = buckets()
+    lines = [
+        '# HELP omnify_http_request_duration_seconds Time to produce the response, by URL name.',
+        '# TYPE omnify_http_request_duration_seconds histogram',
+    ]
+    rows = sorted(totals.items())
+    for (route, method, status), series in rows:
+        cumulative = 0
+        for i, bound in enumerate(bounds):
+            if FIRST_BUCKET + i < len(series):
+                cumulative += series[FIRST_BUCKET + i]
+            lines.append(
+                f'omnify_http_request_duration_seconds_bucket{{{_labels(route, method, status, le=bound)}}} {cumulative}'
+            )
+        lines.append(
+            f'omnify_http_request_duration_seconds_bucket{{{_labels(route, method, status, le="+Inf")}}} {series[REQUESTS]}'
+        )
+        lines.append(f'omnify_http_request_duration_seconds_sum{{{_labels(route, method, status)}}} {series[SECONDS]}')
+        lines.append(f'omnify_http_request_duration_seconds_count{{{_labels(route, method, status)}}} {series[REQUESTS]}')
+    for name, index, help_text in (
+        ('omnify_http_db_queries_total', QUERIES, 'Database queries issued.'),
+        ('omnify_http_db_query_seconds_total', QUERY_SECONDS, 'Time spent in database queries.'),
+        ('omnify_http_response_bytes_total', BYTES, 'Response body bytes, streamed bodies excluded.'),
+    ):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (route, method, status), series in rows:
+            lines.append(f'{name}{{{_labels(route, method, status)}}} {series[index]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        raise Http404
+    scheme, _, supplied = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(supplied.encode(), token.encode()):
+        return HttpResponse("Invalid metrics token.\n", status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render(registry.collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
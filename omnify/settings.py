@@ -1,3 +1,4 @@
+import os
 from datetime import timedelta
 from pathlib import Path
 # from corsheaders.defaults import default_headers
@@ -23,6 +24,7 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = "USER.User"
 
 MIDDLEWARE = [
+    'omnify.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -93,6 +95,10 @@ REST_FRAMEWORK={
     "DEFAULT_AUTHENTICATION_CLASSES":[
         'USER.authentication.CookieJWTAuthentication'
     ],
+    # Reverse proxies in front of the app. Leave None when clients connect
+    # directly, so X-Forwarded-For (client-controlled) is never trusted for
+    # the login throttle's per-IP buckets.
+    "NUM_PROXIES": None,
 }
 
 SIMPLE_JWT={
@@ -102,6 +108,89 @@ SIMPLE_JWT={
     "BLACKLIST_AFTER_ROTATION": True,
 }
 
+# The schedule response cache and its version counter live here. With more
+# than one worker process this must be a shared backend (Redis/Memcached),
+# otherwise a worker can keep serving a schedule another worker changed.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Login token buckets (USER.throttling). Deliberately local: a check must
+    # cost less than the password hash it saves, so no network round trip.
+    # That makes the limits per worker process. There is one bucket per email
+    # and per IP seen in the last few minutes, and LocMem culls live buckets
+    # past MAX_ENTRIES. Keep MAX_ENTRIES well above the emails a password
+    # spray can cycle through, or point this at Redis/Memcached.
+    "throttle": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "login-throttle",
+        "OPTIONS": {"MAX_ENTRIES": 100_000},
+    },
+}
+SCHEDULE_CACHE_TIMEOUT = 300
+
+# Cache alias holding the refresh token blacklist generation. Unset, every
+# refresh checks the blacklist table; point it at a shared cache
+# (Redis/Memcached) to serve the check from memory instead. Process-local
+# backends are ignored, since a logout must reach every worker.
+TOKEN_BLACKLIST_CACHE = None
+
+# Seconds a worker may serve the ClassType catalog before re-reading it;
+# changes made in the same process invalidate it immediately.
+CLASS_TYPE_CATALOG_TTL = 300
+
+# Account emails go through the USER.outbox table and the drain_outbox
+# worker. The console backend keeps printing the links in development.
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+DEFAULT_FROM_EMAIL = "no-reply@omnify.local"
+ACCOUNT_LINK_BASE_URL = "http://127.0.0.1:8000"
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_RETRY_MAX_SECONDS = 3600
+
+# Serve classTypes, the session list, the instructor's sessions and the
+# profile from native async views. omnify/asgi.py turns this on; under WSGI
+# the synchronous APIViews are cheaper.
+ASYNC_READ_VIEWS = os.environ.get('OMNIFY_ASYNC_VIEWS') == '1'
+
+# Live seat counts (/fitness/seats/stream, ASGI only). The in-process broker
+# only reaches clients connected to the worker that handled the booking;
+# with several workers, point this at a shared broker with the same
+# publish()/subscribe()/listening() interface. Idle streams get a comment
+# line this often.
+SEAT_EVENTS_BROKER = 'omnifyFitness.live.InProcessBroker'
+SEAT_EVENTS_HEARTBEAT = 15
+
+# Request metrics served at /metrics (omnify.metrics). Each worker process
+# writes its totals here so any worker can report all of them; unset, a
+# scrape only sees the worker that answered it.
+METRICS_DIR = os.environ.get('OMNIFY_METRICS_DIR')
+# The route names, traffic and timings are not public: scrapers send
+# "Authorization: Bearer <token>". Unset, /metrics is not served at all.
+METRICS_TOKEN = os.environ.get('OMNIFY_METRICS_TOKEN')
+METRICS_FLUSH_SECONDS = 5
+
+# Password reset and activation tokens are refused after these and removed
+# by the sweep_account_tokens command. A user who missed the activation window
+# asks for a new link at /user/activate/resend.
+PASSWORD_RESET_TTL = timedelta(hours=1)
+ACCOUNT_ACTIVATION_TTL = timedelta(days=7)
+
+# Login token buckets as (burst size, attempts refilled per minute).
+LOGIN_THROTTLE_EMAIL = (5, 5)
+LOGIN_THROTTLE_IP = (30, 30)
+# Activation link resends: a few per address, then one every ten minutes.
+RESEND_ACTIVATION_THROTTLE_EMAIL = (3, 0.1)
+RESEND_ACTIVATION_THROTTLE_IP = (20, 5)
+
+# Opt-in: resolve request.user from the access token's role/is_active claims
+# and a per-process cache instead of loading the user row on every request.
+# Role or active changes made in another worker then take effect at the next
+# token refresh (at most ACCESS_TOKEN_LIFETIME).
+AUTH_TOKEN_CLAIMS_USER = False
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_CACHE_TTL = 60
+
 CSRF_TRUSTED_ORIGINS = [
     "https://localhost:3000",
     "https://127.0.0.1:3000",
@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.urls import path
 from django.conf.urls import include
 from rest_framework_simplejwt.views import TokenRefreshView
+from omnify.metrics import metrics_view
 
 
 urlpatterns = [
@@ -10,4 +11,5 @@ urlpatterns = [
     path('user/', include('USER.urls')),
     path('fitness/', include('omnifyFitness.urls')),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,6 +1,33 @@
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import post_migrate
 
 
 class OmnifyfitnessConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'omnifyFitness'
\ No newline at end of file
+    name = 'omnifyFitness'
+
+    def ready(self):
+        from omnifyFitness import signals  # noqa: F401
+
+        post_migrate.connect(reinstall_overlap_guard, sender=self)
+        # Django warns against querying inside ready() itself (and the table
+        # may not exist yet during migrate), so the catalog is loaded as the
+        # first request starts instead of lazily inside a view.
+        request_started.connect(warm_class_type_catalog, dispatch_uid='warm_class_type_catalog')
+
+
+def reinstall_overlap_guard(sender, using, **kwargs):
+    from omnifyFitness.constraints import install_overlap_guard
+
+    connection = connections[using]
+    if connection.vendor == 'sqlite':
+        install_overlap_guard(connection, sender.get_model('Sessions')._meta.db_table)
+
+
+def warm_class_type_catalog(**kwargs):
+    from omnifyFitness.catalog import catalog
+
+    request_started.disconnect(dispatch_uid='warm_class_type_catalog')
+    catalog.warm()
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+
+from omnifyFitness import schedule_cache
+from omnifyFitness.catalog import catalog
+from omnifyFitness.conditional import etag_matches
+from omnifyFitness.filters import filter_sessions
+from omnifyFitness.live import get_broker
+from omnifyFitness.models import Sessions
+from omnifyFitness.pagination import SessionPagination
+from omnifyFitness.serializers import RecurringSessionsSerializer
+from USER.async_views import AsyncAPIView, json_response
+from USER.models import UserRole
+
+# Async versions of the read endpoints in views.py, routed instead of them
+# when ASYNC_READ_VIEWS is on (the ASGI entry point turns it on).
+
+
+def not_modified(etag):
+    return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+async def session_page(request, sessions):
+    paginator = SessionPagination()
+    page = await paginator.apaginate_queryset(sessions, request)
+    return paginator.get_paginated_data(RecurringSessionsSerializer(page, many=True).data)
+
+
+class AsyncClassTypesView(AsyncAPIView):
+    async def get(self, request):
+        state = await catalog.astate()
+        if etag_matches(request, state.etag):
+            return not_modified(state.etag)
+        return json_response(state.rows, headers={'ETag': state.etag})
+
+
+class AsyncSessionListView(AsyncAPIView):
+    async def get(self, request):
+        schedule_cache.normalize_query(request)
+        etag, key = schedule_cache.etag_and_key(request)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        async def build():
+            sessions = filter_sessions(Sessions.objects.select_related('class_type'), request.query_params)
+            return JSONRenderer().render(await session_page(request, sessions))
+
+        body = await schedule_cache.aget_or_build(key, build)
+        return HttpResponse(body, content_type='application/json', headers={'ETag': etag})
+
+
+class AsyncInstructorSessionsView(AsyncAPIView):
+    authenticated = True
+
+    async def get(self, request):
+        if request.user.role != UserRole.INSTRUCTOR:
+            return json_response({"error": "Only instructor access this view."}, status.HTTP_403_FORBIDDEN)
+        sessions = filter_sessions(
+            Sessions.objects.filter(instructor=request.user).select_related('class_type'), request.query_params
+        )
+        return json_response(await session_page(request, sessions))
+
+
+class SeatStreamView(AsyncAPIView):
+    """Server-Sent Events stream of seat counts as bookings change.
+
+    Each event carries one session's (or one dated occurrence's) capacity,
+    taken and remaining seats; ``?session=<id>`` (repeatable) narrows the
+    stream to those sessions. Clients load the timetable once and keep this
+    connection open instead of polling it.
+    """
+
+    async def get(self, request):
+        try:
+            wanted = {int(pk) for pk in request.query_params.getlist('session')}
+        except ValueError:
+            raise serializers.ValidationError({'session': ["Must be session ids."]})
+        response = StreamingHttpResponse(self.events(wanted), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def events(self, wanted):
+        async with get_broker().subscribe(wanted) as queue:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.SEAT_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield f'event: seats\ndata: {json.dumps(event)}\n\n'
@@ -0,0 +1,238 @@
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_save
+from rest_framework import serializers
+
+from omnifyFitness.models import Booking, Sessions, WaitlistEntry
+from USER.models import OutboxEmail
+from USER.outbox import enqueue
+
+
+def _session_full(session):
+    return serializers.ValidationError(f"Session is full. Max capacity of {session.capacity} reached.")
+
+
+def _claim_standing_seat(session):
+    claimed = Sessions.objects.filter(
+        pk=session.pk,
+        seats_taken__lt=F('capacity'),
+    ).update(seats_taken=F('seats_taken') + 1)
+    if not claimed:
+        raise _session_full(session)
+    # A standing booking holds a seat on every upcoming date, so it must also
+    # fit on the busiest one. The UPDATE above holds the session row lock that
+    # dated claims take too, so this read cannot race one of them.
+    peak = (
+        Booking.objects.filter(class_session=session, session_date__gte=date.today())
+        .order_by()
+        .values('session_date')
+        .annotate(n=Count('id'))
+        .order_by('-n')
+        .values_list('n', flat=True)
+        .first()
+    )
+    if peak:
+        seats_taken = Sessions.objects.values_list('seats_taken', flat=True).get(pk=session.pk)
+        if seats_taken + peak > session.capacity:
+            raise _session_full(session)
+
+
+def _claim_dated_seat(user, session, session_date):
+    locked = Sessions.objects.select_for_update().only('capacity', 'seats_taken').get(pk=session.pk)
+    load = Booking.objects.filter(class_session=session).aggregate(
+        dated=Count('id', filter=Q(session_date=session_date)),
+        standing=Count('id', filter=Q(session_date__isnull=True, user=user)),
+    )
+    if load['standing']:
+        raise serializers.ValidationError("You already have a standing booking for this session.")
+    if locked.seats_taken + load['dated'] >= locked.capacity:
+        raise _session_full(locked)
+
+
+def book_session(user, session, session_date=None):
+    """Claim a seat on ``session`` for ``user`` and create the booking.
+
+    Without ``session_date`` the booking is standing: it holds a seat every
+    week and is counted on the session's ``seats_taken``, claimed with a
+    single conditional UPDATE so concurrent requests can never push it past
+    capacity. With ``session_date`` it is for that one occurrence and is
+    checked against the occurrence's load under the session row lock. The
+    insert runs in the same transaction, so a failed insert (e.g. a duplicate
+    booking) gives the seat back.
+    """
+    try:
+        with transaction.atomic():
+            if session_date is None:
+                _claim_standing_seat(session)
+            else:
+                _claim_dated_seat(user, session, session_date)
+            return Booking.objects.create(user=user, class_session=session, session_date=session_date)
+    except IntegrityError:
+        raise serializers.ValidationError("You have already booked this session.")
+
+
+def cancel_booking(booking):
+    """Delete ``booking``, release its seat and hand it to the waitlist, all in one transaction."""
+    if booking.pk is None:
+        return False
+    with transaction.atomic():
+        deleted, _ = booking.delete()
+        if deleted and booking.session_date is None:
+            Sessions.objects.filter(
+                pk=booking.class_session_id,
+                seats_taken__gt=0,
+            ).update(seats_taken=F('seats_taken') - 1)
+        if deleted:
+            # A dated booking frees no standing seat, but it may have been on
+            # the busiest date, which a standing seat must also fit on.
+            promote_waitlist(booking.class_session_id)
+    return bool(deleted)
+
+
+def join_waitlist(user, session):
+    """Queue ``user`` for a standing seat on the full ``session``."""
+    try:
+        with transaction.atomic():
+            # Issue the ticket first: the UPDATE takes the session row lock,
+            # so tickets are handed out one at a time.
+            Sessions.objects.filter(pk=session.pk).update(waitlist_tickets=F('waitlist_tickets') + 1)
+            ticket, seats_taken, capacity = Sessions.objects.values_list(
+                'waitlist_tickets', 'seats_taken', 'capacity'
+            ).get(pk=session.pk)
+            if seats_taken < capacity:
+                raise serializers.ValidationError("Session has free seats; book it instead.")
+            if Booking.objects.filter(user=user, class_session=session, session_date__isnull=True).exists():
+                raise serializers.ValidationError("You have already booked this session.")
+            return WaitlistEntry.objects.create(user=user, class_session=session, ticket=ticket)
+    except IntegrityError:
+        raise serializers.ValidationError("You are already on the waitlist for this session.")
+
+
+def waitlist_position(entry):
+    """1-based place in the queue: an index-only count of the tickets ahead."""
+    return WaitlistEntry.objects.filter(class_session_id=entry.class_session_id, ticket__lt=entry.ticket).count() + 1
+
+
+def promote_waitlist(session_id):
+    """Fill free standing seats on a session from the head of its waitlist.
+
+    Call inside the transaction that freed the seats. Each step is one
+    lookup of the lowest ticket on the (class_session, ticket) index, so the
+    cost does not depend on the queue length. Promoted clients are emailed
+    through the outbox. Returns the promoted bookings.
+    """
+    promoted = []
+    session = None
+    while True:
+        head = (
+            WaitlistEntry.objects.filter(class_session_id=session_id)
+            .select_related('user')
+            .order_by('ticket')
+            .first()
+        )
+        if head is None:
+            break
+        if session is None:
+            session = Sessions.objects.select_related('class_type').get(pk=session_id)
+        try:
+            with transaction.atomic():
+                _claim_standing_seat(session)
+                promoted.append(Booking.objects.create(user=head.user, class_session=session))
+        except serializers.ValidationError:
+            break
+        except IntegrityError:
+            pass  # already holds a standing booking; just leave the queue
+        head.delete()
+    if promoted:
+        enqueue(*(
+            OutboxEmail(
+                to=booking.user.email,
+                subject="You have a seat",
+                body=f"A seat opened up and you are now booked on {session}.",
+            )
+            for booking in promoted
+        ))
+    return promoted
+
+
+BATCH_BOOKED = 'booked'
+BATCH_NOT_BOOKED = 'not_booked'  # could have been booked, but the batch was all-or-nothing
+BATCH_ALREADY_BOOKED = 'already_booked'
+BATCH_FULL = 'full'
+BATCH_NOT_FOUND = 'not_found'
+
+
+def book_sessions(user, session_ids, atomic=True):
+    """Book standing seats on several sessions in one transaction.
+
+    The sessions are locked in primary-key order (so two batches cannot
+    deadlock), then checked with one query for the caller's existing
+    bookings and one for the busiest upcoming date of each; the bookings
+    are inserted with one ``bulk_create`` and the seats claimed with one
+    UPDATE. With ``atomic`` nothing is booked unless everything can be.
+    Returns ``(results, bookings)``, a result per distinct session id in
+    request order.
+    """
+    session_ids = list(dict.fromkeys(session_ids))
+    try:
+        with transaction.atomic():
+            sessions = {
+                s.pk: s
+                for s in Sessions.objects.select_for_update().filter(pk__in=session_ids).order_by('pk')
+                .only('capacity', 'seats_taken')
+            }
+            booked = set(
+                Booking.objects.filter(user=user, class_session_id__in=list(sessions), session_date__isnull=True)
+                .values_list('class_session_id', flat=True)
+            )
+            peaks = {}
+            dated = (
+                Booking.objects.filter(class_session_id__in=list(sessions), session_date__gte=date.today())
+                .order_by()
+                .values_list('class_session_id', 'session_date')
+                .annotate(n=Count('id'))
+            )
+            for session_id, _, n in dated:
+                peaks[session_id] = max(peaks.get(session_id, 0), n)
+
+            results = []
+            for session_id in session_ids:
+                session = sessions.get(session_id)
+                if session is None:
+                    outcome = BATCH_NOT_FOUND
+                elif session_id in booked:
+                    outcome = BATCH_ALREADY_BOOKED
+                elif session.seats_taken + peaks.get(session_id, 0) >= session.capacity:
+                    outcome = BATCH_FULL
+                else:
+                    outcome = BATCH_BOOKED
+                results.append({'class_session': session_id, 'status': outcome})
+
+            claim = [r['class_session'] for r in results if r['status'] == BATCH_BOOKED]
+            if atomic and len(claim) < len(results):
+                for result in results:
+                    if result['status'] == BATCH_BOOKED:
+                        result['status'] = BATCH_NOT_BOOKED
+                return results, []
+            if not claim:
+                return results, []
+
+            bookings = Booking.objects.bulk_create(Booking(user=user, class_session_id=pk) for pk in claim)
+            Sessions.objects.filter(pk__in=claim).update(seats_taken=F('seats_taken') + 1)
+            # bulk_create sends no signals; the schedule, calendar and live seat
+            # receivers still need to hear about each booking.
+            for booking in bookings:
+                post_save.send(
+                    sender=Booking, instance=booking, created=True, update_fields=None, raw=False,
+                    using=booking._state.db,
+                )
+    except IntegrityError:
+        # A concurrent request of the same client booked one of them first.
+        raise serializers.ValidationError("You have already booked one of these sessions.")
+    ids = {booking.class_session_id: booking.pk for booking in bookings}
+    for result in results:
+        if result['status'] == BATCH_BOOKED:
+            result['booking'] = ids[result['class_session']]
+    return results, bookings
@@ -0,0 +1,73 @@
+import hashlib
+import time
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from omnifyFitness.models import ClassType
+
+CatalogState = namedtuple('CatalogState', ['rows', 'etag', 'by_name', 'by_id', 'loaded_at'])
+
+
+class ClassTypeCatalog:
+    """In-process copy of the ClassType table.
+
+    The catalog is a handful of rows that almost never change, so it is
+    loaded once and served from memory. ``invalidate`` is wired to the
+    ClassType save/delete signals (see signals.py); the TTL
+    (``CLASS_TYPE_CATALOG_TTL`` seconds) only bounds how long another worker
+    process can serve a catalog changed elsewhere. The whole catalog is
+    swapped as one immutable state object, so readers never need a lock.
+    """
+
+    def __init__(self):
+        self._state = None
+
+    def warm(self):
+        from omnifyFitness.serializers import ClassTypeSerializer
+
+        class_types = list(ClassType.objects.order_by('id'))
+        rows = [dict(row) for row in ClassTypeSerializer(class_types, many=True).data]
+        digest = hashlib.sha1(repr(rows).encode()).hexdigest()
+        self._state = CatalogState(
+            rows=rows,
+            etag=f'"classtypes-{digest}"',
+            by_name={c.name: c for c in class_types},
+            by_id={c.id: c for c in class_types},
+            loaded_at=time.monotonic(),
+        )
+        return self._state
+
+    def invalidate(self, **kwargs):
+        self._state = None
+
+    def state(self):
+        state = self.fresh_state()
+        return state if state is not None else self.warm()
+
+    async def astate(self):
+        state = self.fresh_state()
+        return state if state is not None else await sync_to_async(self.warm)()
+
+    def fresh_state(self):
+        state = self._state
+        ttl = getattr(settings, 'CLASS_TYPE_CATALOG_TTL', 300)
+        if state is None or time.monotonic() - state.loaded_at >= ttl:
+            return None
+        return state
+
+    def rows(self):
+        return self.state().rows
+
+    def etag(self):
+        return self.state().etag
+
+    def get_by_name(self, name):
+        return self.state().by_name.get(name)
+
+    def get_by_id(self, pk):
+        return self.state().by_id.get(pk)
+
+
+catalog = ClassTypeCatalog()
@@ -0,0 +1,126 @@
+"""Database-side guard against an instructor teaching two overlapping sessions.
+
+PostgreSQL gets an exclusion constraint over (instructor, day_of_week, time
+range); SQLite gets BEFORE INSERT/UPDATE triggers that probe the
+``sessions_instructor_slot_idx`` index. Either way a conflicting write fails
+in the statement that makes it, with ``INSTRUCTOR_OVERLAP_CONSTRAINT`` in the
+error message. Other backends fall back to ``check_instructor_overlap``.
+
+The PostgreSQL constraint needs the btree_gist extension, and creating an
+extension takes superuser rights the application role should not have. It
+is therefore an ops step, run once per database before migrating:
+
+    CREATE EXTENSION IF NOT EXISTS btree_gist;
+"""
+from django.db import IntegrityError
+from django.db.models import F
+
+INSTRUCTOR_OVERLAP_CONSTRAINT = 'sessions_instructor_no_overlap'
+GUARDED_VENDORS = ('postgresql', 'sqlite')
+
+# Times are anchored on a fixed date so they can form a tsrange; the default
+# '[)' bounds let back-to-back sessions touch without overlapping.
+POSTGRES_SQL = """
+ALTER TABLE {table} ADD CONSTRAINT {name} EXCLUDE USING gist (
+    instructor_id WITH =,
+    day_of_week WITH =,
+    tsrange(DATE '2000-01-01' + start_time, DATE '2000-01-01' + end_time) WITH &&
+) WHERE (instructor_id IS NOT NULL);
+"""
+POSTGRES_REVERSE_SQL = "ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name};"
+
+SQLITE_TRIGGER_SQL = """
+CREATE TRIGGER IF NOT EXISTS {name}_{event} BEFORE {event_sql} ON {table}
+WHEN NEW.instructor_id IS NOT NULL AND EXISTS (
+    SELECT 1 FROM {table} s
+    WHERE s.instructor_id = NEW.instructor_id
+      AND s.day_of_week = NEW.day_of_week
+      AND s.start_time < NEW.end_time
+      AND s.end_time > NEW.start_time
+      AND s.id IS NOT NEW.id
+)
+BEGIN
+    SELECT RAISE(ABORT, '{name}');
+END;
+"""
+SQLITE_EVENTS = {
+    'insert': 'INSERT',
+    'update': 'UPDATE OF instructor_id, day_of_week, start_time, end_time',
+}
+
+
+def has_btree_gist(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'btree_gist'")
+        return cursor.fetchone() is not None
+
+
+def install_overlap_guard(connection, table):
+    table = connection.ops.quote_name(table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_SQL.format(table=table, name=INSTRUCTOR_OVERLAP_CONSTRAINT))
+        elif connection.vendor == 'sqlite':
+            # SQLite drops triggers whenever a migration rebuilds the table,
+            # so this also runs after every migrate (see apps.py).
+            for event, event_sql in SQLITE_EVENTS.items():
+                cursor.execute(SQLITE_TRIGGER_SQL.format(
+                    table=table, name=INSTRUCTOR_OVERLAP_CONSTRAINT, event=event, event_sql=event_sql,
+                ))
+
+
+def remove_overlap_guard(connection, table):
+    table = connection.ops.quote_name(table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_REVERSE_SQL.format(table=table, name=INSTRUCTOR_OVERLAP_CONSTRAINT))
+        elif connection.vendor == 'sqlite':
+            for event in SQLITE_EVENTS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {INSTRUCTOR_OVERLAP_CONSTRAINT}_{event};")
+
+
+def schedule_conflicts(sessions):
+    """Rows of ``sessions`` the guards would reject.
+
+    Returns the ids of sessions that do not end after they start (e.g. ones
+    crossing midnight), and ``(earlier_id, later_id)`` pairs of one
+    instructor's overlapping sessions, found in a single ordered scan.
+    """
+    inverted = list(sessions.filter(end_time__lte=F('start_time')).order_by('pk').values_list('pk', flat=True))
+    overlaps = []
+    slot, latest = None, None
+    rows = (
+        sessions.filter(instructor__isnull=False, end_time__gt=F('start_time'))
+        .order_by('instructor', 'day_of_week', 'start_time', 'pk')
+        .values_list('pk', 'instructor', 'day_of_week', 'start_time', 'end_time')
+    )
+    for pk, instructor_id, day, start, end in rows.iterator():
+        if (instructor_id, day) != slot:
+            slot, latest = (instructor_id, day), None
+        elif start < latest[0]:
+            overlaps.append((latest[1], pk))
+        if latest is None or end > latest[0]:
+            latest = (end, pk)
+    return inverted, overlaps
+
+
+def is_overlap_violation(error):
+    return INSTRUCTOR_OVERLAP_CONSTRAINT in str(error)
+
+
+def overlapping_sessions(session):
+    """The instructor's other sessions that overlap ``session``, a probe of sessions_instructor_slot_idx."""
+    return type(session).objects.filter(
+        instructor_id=session.instructor_id,
+        day_of_week=session.day_of_week,
+        start_time__lt=session.end_time,
+        end_time__gt=session.start_time,
+    ).exclude(pk=session.pk)
+
+
+def check_instructor_overlap(session, connection):
+    """Indexed overlap probe for backends without a database-side guard."""
+    if connection.vendor in GUARDED_VENDORS or session.instructor_id is None:
+        return
+    if overlapping_sessions(session).exists():
+        raise IntegrityError(INSTRUCTOR_OVERLAP_CONSTRAINT)
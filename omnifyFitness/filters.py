@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from django.db.models import F
+from rest_framework import serializers
+
+from omnifyFitness.models import DAY_LOOKUP, DAYS_OF_WEEK
+
+DAY_NUMBERS = dict(DAYS_OF_WEEK)
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def parse_time(value):
+    """``HH:MM`` or ``HH:MM:SS`` as a time; ValueError otherwise."""
+    value = str(value).strip()
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid time: {value}")
+
+
+def _parse_time(value, param):
+    try:
+        return parse_time(value)
+    except ValueError as e:
+        raise serializers.ValidationError({param: str(e)})
+
+
+def parse_flag(value, param):
+    key = value.lower()
+    if key in ('1', 'true', 'yes'):
+        return True
+    if key in ('0', 'false', 'no'):
+        return False
+    raise serializers.ValidationError({param: f"Invalid flag: {value}"})
+
+
+def _parse_days(value):
+    days = []
+    for part in _split(value):
+        key = part.lower()
+        if key.isdigit() and int(key) in DAY_NUMBERS:
+            days.append(int(key))
+        elif key in DAY_LOOKUP:
+            days.append(DAY_LOOKUP[key])
+        else:
+            raise serializers.ValidationError({'day': f"Invalid day: {part}"})
+    return days
+
+
+def canonical_filters(params):
+    """The ``filter_sessions`` parameters in ``params``, as sorted ``(name, value)`` pairs.
+
+    Values are parsed and written back in one spelling (day numbers, full
+    times, sorted lists), so equivalent queries come out equal; parameters
+    that filter nothing are dropped.
+    """
+    canonical = []
+    for name in ('class_type', 'instructor'):
+        if params.get(name):
+            canonical.append((name, ','.join(sorted(set(_split(params[name]))))))
+    if params.get('day'):
+        canonical.append(('day', ','.join(str(day) for day in sorted(set(_parse_days(params['day']))))))
+    for name in ('start_from', 'start_to'):
+        if params.get(name):
+            canonical.append((name, _parse_time(params[name], name).isoformat()))
+    if params.get('open') and parse_flag(params['open'], 'open'):
+        canonical.append(('open', 'true'))
+    return sorted(canonical)
+
+
+def filter_sessions(queryset, params):
+    """Apply the timetable query-parameter filters to a Sessions queryset.
+
+    ``class_type`` (names), ``day`` (names or 0-6), ``instructor`` (email or
+    id) accept comma-separated lists; ``start_from``/``start_to`` bound the
+    start time, end exclusive. ``open=true`` keeps only sessions with free
+    standing seats, compared on the row's own counter.
+
+    ``day``, ``instructor`` and ``class_type`` each lead an index on Sessions
+    (sessions_timetable_idx, sessions_instructor_slot_idx and the unique
+    class slot); the time bounds narrow within a day on the timetable index.
+    The time bounds alone and ``open`` have no index of their own: they are
+    checked row by row as the page walks the timetable order.
+    """
+    if params.get('class_type'):
+        queryset = queryset.filter(class_type__name__in=_split(params['class_type']))
+
+    if params.get('day'):
+        queryset = queryset.filter(day_of_week__in=_parse_days(params['day']))
+
+    if params.get('start_from'):
+        queryset = queryset.filter(start_time__gte=_parse_time(params['start_from'], 'start_from'))
+    if params.get('start_to'):
+        queryset = queryset.filter(start_time__lt=_parse_time(params['start_to'], 'start_to'))
+
+    if params.get('instructor'):
+        values = _split(params['instructor'])
+        ids = [int(value) for value in values if value.isdigit()]
+        emails = [value for value in values if not value.isdigit()]
+        if ids and emails:
+            raise serializers.ValidationError({'instructor': "Use either instructor ids or emails, not both."})
+        if ids:
+            queryset = queryset.filter(instructor_id__in=ids)
+        else:
+            queryset = queryset.filter(instructor__email__in=emails)
+
+    if params.get('open') and parse_flag(params['open'], 'open'):
+        queryset = queryset.filter(seats_taken__lt=F('capacity'))
+
+    return queryset
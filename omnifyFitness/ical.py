@@ -0,0 +1,193 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete
+
+from omnifyFitness.models import Booking, Sessions
+from omnifyFitness.occurrences import first_on_or_after
+
+FEED_SALT = 'omnifyFitness.ical.feed'
+STAMP_KEY = 'ical:stamp:{}'
+CHUNK_SIZE = 500
+
+
+def feed_token(user):
+    """Unguessable feed token for ``user``; calendar apps cannot send our cookies."""
+    return signing.Signer(salt=FEED_SALT).sign(str(user.pk))
+
+
+def user_id_from_token(token):
+    try:
+        return int(signing.Signer(salt=FEED_SALT).unsign(token))
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def _now_ms():
+    return time.time_ns() // 1_000_000
+
+
+def feed_stamp(user_id):
+    """Millisecond stamp of the last change to ``user_id``'s feed.
+
+    Kept in the cache and seeded from the clock, so a cache restart only
+    costs calendar clients one full download.
+    """
+    key = STAMP_KEY.format(user_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, _now_ms(), timeout=None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def feed_etag(user_id, stamp):
+    return f'"ical-{user_id}-{stamp}"'
+
+
+def touch_feeds(user_ids):
+    user_ids = {pk for pk in user_ids if pk is not None}
+    if user_ids:
+        now = _now_ms()
+        cache.set_many({STAMP_KEY.format(pk): now for pk in user_ids}, timeout=None)
+
+
+def booking_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: touch_feeds([instance.user_id]))
+
+
+def session_changed(sender, instance, **kwargs):
+    # The booked members' feeds embed the session too. Their ids are read
+    # after commit so the write itself pays nothing; deleting a session
+    # cascades to its bookings, which touch their own feeds.
+    instructors = {instance.instructor_id, instance.__dict__.pop('_ical_instructor_id', None)}
+    deleted = kwargs.get('signal') is post_delete
+
+    def touch():
+        members = []
+        if not deleted:
+            members = Booking.objects.filter(class_session_id=instance.pk).values_list('user_id', flat=True)
+        touch_feeds([*instructors, *members])
+    transaction.on_commit(touch)
+
+
+def remember_instructor(session):
+    """Note ``session``'s current instructor before changing it.
+
+    Lets session_changed also refresh the previous instructor's feed. Code
+    that edits a loaded session calls this; any other save pays for one
+    lookup in ``capture_instructor``.
+    """
+    session._ical_instructor_id = session.instructor_id
+
+
+def capture_instructor(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance._state.adding or '_ical_instructor_id' in instance.__dict__:
+        return
+    if update_fields is not None and 'instructor' not in update_fields:
+        return
+    instance._ical_instructor_id = (
+        sender.objects.filter(pk=instance.pk).values_list('instructor_id', flat=True).first()
+    )
+
+
+def _escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def _fold(line):
+    # RFC 5545 3.1: lines are at most 75 octets, continued with CRLF + space.
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    parts.append(data.decode())
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(day, at):
+    return datetime.combine(day, at, tzinfo=timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(uid, dtstamp, summary, day, session, weekly):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{dtstamp}',
+        f'DTSTART:{_utc(day, session.start_time)}',
+        f'DTEND:{_utc(day, session.end_time)}',
+        f'SUMMARY:{_escape(summary)}',
+    ]
+    if weekly:
+        lines.append('RRULE:FREQ=WEEKLY')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _calendar(name, events):
+    yield f'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Omnify Fitness//Schedule//EN\r\n{_fold("X-WR-CALNAME:" + _escape(name))}'
+    yield from events
+    yield 'END:VCALENDAR\r\n'
+
+
+def member_feed(user, stamp):
+    """Stream ``user``'s bookings: standing ones weekly, dated ones once."""
+    dtstamp = datetime.fromtimestamp(stamp / 1000, tz=timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    bookings = (
+        Booking.objects.filter(user=user)
+        .select_related('class_session__class_type')
+        .order_by('id')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    events = (
+        _event(
+            f'booking-{b.id}@omnify-fitness',
+            dtstamp,
+            b.class_session.class_type.name,
+            b.session_date or first_on_or_after(b.booked_at.date(), b.class_session.day_of_week),
+            b.class_session,
+            weekly=b.session_date is None,
+        )
+        for b in bookings
+    )
+    return _calendar('My classes', events)
+
+
+def instructor_feed(user, stamp):
+    """Stream the weekly sessions ``user`` teaches.
+
+    Sessions carry no creation date, so each series starts from the week the
+    feed last changed; the bytes then depend only on what the ETag covers.
+    """
+    changed = datetime.fromtimestamp(stamp / 1000, tz=timezone.utc)
+    dtstamp = changed.strftime('%Y%m%dT%H%M%SZ')
+    week = changed.date() - timedelta(days=6)
+    sessions = (
+        Sessions.objects.filter(instructor=user)
+        .select_related('class_type')
+        .order_by('id')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    events = (
+        _event(
+            f'session-{s.id}@omnify-fitness',
+            dtstamp,
+            s.class_type.name,
+            first_on_or_after(week, s.day_of_week),
+            s,
+            weekly=True,
+        )
+        for s in sessions
+    )
+    return _calendar('Classes I teach', events)
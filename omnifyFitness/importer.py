@@ -0,0 +1,208 @@
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+
+from omnifyFitness import ical
+from omnifyFitness.catalog import catalog
+from omnifyFitness.filters import parse_time
+from omnifyFitness.models import DAY_LOOKUP, DAYS_OF_WEEK, Sessions
+from omnifyFitness.schedule_cache import schedule_changed
+from USER.models import User, UserRole
+
+IMPORT_FIELDS = [
+    'class_type',
+    'day_of_week',
+    'start_time',
+    'duration_minutes',
+    'capacity',
+    'instructor_email',
+]
+DAY_NAMES = dict(DAYS_OF_WEEK)
+
+
+def rows_from_json(content):
+    data = json.loads(content) if isinstance(content, (str, bytes)) else content
+    if isinstance(data, dict):
+        data = data.get('sessions', [])
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of sessions.")
+    if not all(isinstance(row, dict) for row in data):
+        raise ValueError("Expected a list of session objects.")
+    return data
+
+
+def rows_from_csv(content):
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')
+    return list(csv.DictReader(io.StringIO(content)))
+
+
+def _parse_day(value):
+    key = str(value).lower().strip()
+    if key.isdigit() and int(key) in DAY_NAMES:
+        return int(key)
+    if key not in DAY_LOOKUP:
+        raise ValueError(f"Invalid day: {value}")
+    return DAY_LOOKUP[key]
+
+
+def _parse_positive_int(value, field):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a whole number.")
+    if number <= 0:
+        raise ValueError(f"{field} must be greater than zero.")
+    return number
+
+
+def _overlaps(start, end, ranges):
+    return [(s, e) for s, e in ranges if s < end and e > start]
+
+
+def _fmt(start, end):
+    return f"{start.strftime('%H:%M')} - {end.strftime('%H:%M')}"
+
+
+def import_sessions(rows, dry_run=False):
+    """Validate and create a batch of weekly sessions.
+
+    Class types come from the catalog; instructors, existing duplicates and
+    existing instructor sessions are each loaded with one query for the
+    whole batch, and rows are then checked against those and against each
+    other in memory. Nothing is written unless every row is clean, and then
+    all rows go in with a single ``bulk_create``. Returns ``(report, created)`` where ``report`` has one
+    entry per input row.
+    """
+    report = [{'row': index, 'status': 'ok', 'errors': []} for index in range(1, len(rows) + 1)]
+
+    names = {str(row.get('class_type', '')).strip() for row in rows}
+    emails = {str(row.get('instructor_email', '')).strip() for row in rows}
+    class_types = {name: catalog.get_by_name(name) for name in names}
+    instructors = {
+        u.email: u
+        for u in User.objects.filter(email__in=emails).only('id', 'email', 'role')
+    }
+
+    parsed = []
+    for entry, row in zip(report, rows):
+        errors = entry['errors']
+        missing = [field for field in IMPORT_FIELDS if row.get(field) in (None, '')]
+        if missing:
+            errors.append(f"Missing fields: {', '.join(missing)}.")
+            parsed.append(None)
+            continue
+        values = {}
+        try:
+            values['day_of_week'] = _parse_day(row['day_of_week'])
+        except ValueError as e:
+            errors.append(str(e))
+        try:
+            values['start_time'] = parse_time(row['start_time'])
+        except ValueError:
+            errors.append(f"Invalid start_time: {row['start_time']}")
+        for field in ('duration_minutes', 'capacity'):
+            try:
+                values[field] = _parse_positive_int(row[field], field)
+            except ValueError as e:
+                errors.append(str(e))
+
+        class_type = class_types.get(str(row['class_type']).strip())
+        if class_type is None:
+            errors.append(f"Class type '{row['class_type']}' does not exist.")
+        instructor = instructors.get(str(row['instructor_email']).strip())
+        if instructor is None:
+            errors.append("Instructor with this email does not exist.")
+        elif instructor.role != UserRole.INSTRUCTOR:
+            errors.append("User is not an instructor.")
+
+        if 'start_time' in values and 'duration_minutes' in values:
+            start_dt = datetime.combine(datetime.today(), values['start_time'])
+            end_dt = start_dt + timedelta(minutes=values['duration_minutes'])
+            if end_dt.date() != start_dt.date():
+                errors.append("Session must end before midnight.")
+            values['end_time'] = end_dt.time()
+
+        if errors:
+            parsed.append(None)
+            continue
+        parsed.append(Sessions(
+            class_type=class_type,
+            day_of_week=values['day_of_week'],
+            start_time=values['start_time'],
+            end_time=values['end_time'],
+            capacity=values['capacity'],
+            instructor=instructor,
+        ))
+
+    candidates = [session for session in parsed if session is not None]
+    existing_slots = set()
+    busy = defaultdict(list)
+    if candidates:
+        existing_slots = set(Sessions.objects.filter(
+            class_type_id__in={s.class_type_id for s in candidates},
+            day_of_week__in={s.day_of_week for s in candidates},
+            start_time__in={s.start_time for s in candidates},
+        ).values_list('class_type_id', 'day_of_week', 'start_time'))
+        for instructor_id, day, start, end in Sessions.objects.filter(
+            instructor_id__in={s.instructor_id for s in candidates},
+            day_of_week__in={s.day_of_week for s in candidates},
+        ).values_list('instructor_id', 'day_of_week', 'start_time', 'end_time'):
+            busy[(instructor_id, day)].append((start, end))
+
+    batch_slots = {}
+    batch_busy = defaultdict(list)
+    for entry, session in zip(report, parsed):
+        if session is None:
+            continue
+        day_name = DAY_NAMES[session.day_of_week]
+        slot = (session.class_type_id, session.day_of_week, session.start_time)
+        if slot in existing_slots:
+            entry['errors'].append(
+                f"A session with class '{session.class_type.name}' already exists on {day_name} at {session.start_time.strftime('%H:%M')}."
+            )
+        elif slot in batch_slots:
+            entry['errors'].append(f"Duplicate of row {batch_slots[slot]}.")
+        else:
+            batch_slots[slot] = entry['row']
+
+        key = (session.instructor_id, session.day_of_week)
+        clashes = _overlaps(session.start_time, session.end_time, busy[key])
+        if clashes:
+            times_str = "; ".join(_fmt(s, e) for s, e in clashes)
+            entry['errors'].append(
+                f"Instructor '{session.instructor.email}' is already scheduled on {day_name} during: {times_str}."
+            )
+        clashes = [row for s, e, row in batch_busy[key] if s < session.end_time and e > session.start_time]
+        if clashes:
+            entry['errors'].append(
+                f"Instructor '{session.instructor.email}' overlaps rows {', '.join(map(str, clashes))} in this import."
+            )
+        batch_busy[key].append((session.start_time, session.end_time, entry['row']))
+
+    for entry in report:
+        if entry['errors']:
+            entry['status'] = 'error'
+    if any(entry['errors'] for entry in report) or dry_run:
+        return report, 0
+
+    try:
+        with transaction.atomic():
+            Sessions.objects.bulk_create(candidates)
+            # bulk_create sends no post_save, so bump the schedule and the
+            # instructors' calendar feeds here.
+            schedule_changed()
+            instructors = {s.instructor_id for s in candidates}
+            transaction.on_commit(lambda: ical.touch_feeds(instructors))
+    except IntegrityError as e:
+        for entry in report:
+            entry['status'] = 'error'
+            entry['errors'].append(f"Import aborted, the timetable changed while importing: {e}")
+        return report, 0
+    for entry in report:
+        entry['status'] = 'created'
+    return report, len(candidates)
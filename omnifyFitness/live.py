@@ -0,0 +1,116 @@
+import asyncio
+import contextlib
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils.module_loading import import_string
+
+from omnifyFitness.models import Sessions
+
+
+def _offer(queue, event):
+    # A subscriber that stops reading loses its oldest events, never the
+    # publisher's time.
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class InProcessBroker:
+    """Pub/sub between the threads and event loops of this process.
+
+    Events published by one worker only reach streams served by that
+    worker, so a multi-process deployment points SEAT_EVENTS_BROKER at a
+    class with the same ``publish``/``subscribe``/``listening`` interface
+    backed by a shared broker. ``publish`` may be called from any thread.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            loop, queue, sessions = subscriber
+            if sessions is not None and event['session'] not in sessions:
+                continue
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:  # its event loop has closed
+                with self._lock:
+                    self._subscribers.discard(subscriber)
+
+    @contextlib.asynccontextmanager
+    async def subscribe(self, sessions=None):
+        """Yield an asyncio.Queue receiving every event published while open,
+        or only those of ``sessions`` (ids) if given."""
+        sessions = frozenset(sessions) if sessions else None
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.maxsize), sessions)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+    def listening(self, session_id):
+        """Whether any open stream would receive an event for ``session_id``."""
+        with self._lock:
+            return any(sessions is None or session_id in sessions for _, _, sessions in self._subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+_broker = None
+_broker_guard = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_guard:
+            if _broker is None:
+                _broker = import_string(settings.SEAT_EVENTS_BROKER)()
+    return _broker
+
+
+def seat_event(session_id, session_date=None):
+    """Current seat counts for a session, or for one dated occurrence of it."""
+    sessions = Sessions.objects.filter(pk=session_id)
+    if session_date is not None:
+        sessions = sessions.annotate(dated=Count('bookings', filter=Q(bookings__session_date=session_date)))
+    row = sessions.values('capacity', 'seats_taken', *(['dated'] if session_date else [])).first()
+    if row is None:
+        return None
+    taken = row['seats_taken'] + row.get('dated', 0)
+    return {
+        'session': session_id,
+        'session_date': session_date.isoformat() if session_date else None,
+        'capacity': row['capacity'],
+        'taken': taken,
+        'remaining': max(row['capacity'] - taken, 0),
+    }
+
+
+def publish_seats(session_id, session_date=None):
+    # Streams are usually idle; skip the seat count query when nobody listens.
+    if not get_broker().listening(session_id):
+        return
+    event = seat_event(session_id, session_date)
+    if event is not None:
+        get_broker().publish(event)
+
+
+def booking_changed(sender, instance, **kwargs):
+    """Signal receiver: push the session's new seat counts once the write commits."""
+    if kwargs.get('created') is False:
+        return
+    transaction.on_commit(lambda: publish_seats(instance.class_session_id, instance.session_date))
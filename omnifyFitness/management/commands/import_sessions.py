@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from omnifyFitness.importer import import_sessions, rows_from_csv, rows_from_json
+
+
+class Command(BaseCommand):
+    help = "Bulk import weekly sessions from a JSON or CSV timetable."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON list or CSV file with one session per row.")
+        parser.add_argument('--format', choices=['json', 'csv'], help="Defaults to the file extension.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report conflicts, write nothing.")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"{path} does not exist.")
+        fmt = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'json')
+        try:
+            content = path.read_bytes()
+            rows = rows_from_csv(content) if fmt == 'csv' else rows_from_json(content)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        report, created = import_sessions(rows, dry_run=options['dry_run'])
+        failed = [entry for entry in report if entry['errors']]
+        for entry in failed:
+            self.stderr.write(json.dumps(entry))
+        if failed:
+            raise CommandError(f"{len(failed)} of {len(report)} rows have conflicts; nothing was imported.")
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"{len(report)} rows are valid."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported {created} sessions."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:03
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_seats_taken(apps, schema_editor):
+    Sessions = apps.get_model('omnifyFitness', 'Sessions')
+    Booking = apps.get_model('omnifyFitness', 'Booking')
+    booked = (
+        Booking.objects.filter(class_session=OuterRef('pk'))
+        .order_by()
+        .values('class_session')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    Sessions.objects.update(seats_taken=Coalesce(Subquery(booked), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('omnifyFitness', '3082029_rename_default_capacity_sessions_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessions',
+            name='seats_taken',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_seats_taken, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:06
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import migrations, models
+
+from omnifyFitness.constraints import has_btree_gist, install_overlap_guard, remove_overlap_guard, schedule_conflicts
+
+
+def check_existing_sessions(apps, schema_editor):
+    # Which of two overlapping sessions is wrong is a scheduling decision,
+    # so offending rows are reported for an admin to fix, not rewritten.
+    connection = schema_editor.connection
+    Sessions = apps.get_model('omnifyFitness', 'Sessions')
+    inverted, overlaps = schedule_conflicts(Sessions.objects.using(connection.alias))
+    problems = []
+    if inverted:
+        problems.append(
+            "Sessions that do not end after they start (ids): " + ', '.join(map(str, inverted))
+        )
+    if overlaps:
+        problems.append(
+            "Overlapping sessions of one instructor (id pairs): " + ', '.join(f'{a}/{b}' for a, b in overlaps)
+        )
+    if connection.vendor == 'postgresql' and not has_btree_gist(connection):
+        problems.append(
+            "The btree_gist extension is missing; a superuser must run CREATE EXTENSION btree_gist; first."
+        )
+    if problems:
+        raise CommandError("Cannot add the session schedule constraints.\n" + '\n'.join(problems))
+
+
+def add_overlap_guard(apps, schema_editor):
+    Sessions = apps.get_model('omnifyFitness', 'Sessions')
+    install_overlap_guard(schema_editor.connection, Sessions._meta.db_table)
+
+
+def drop_overlap_guard(apps, schema_editor):
+    Sessions = apps.get_model('omnifyFitness', 'Sessions')
+    remove_overlap_guard(schema_editor.connection, Sessions._meta.db_table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('omnifyFitness', '3082030_sessions_seats_taken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_existing_sessions, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='sessions',
+            index=models.Index(fields=['instructor', 'day_of_week', 'start_time', 'end_time'], name='sessions_instructor_slot_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='sessions',
+            constraint=models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='sessions_end_after_start'),
+        ),
+        migrations.RunPython(add_overlap_guard, drop_overlap_guard),
+    ]
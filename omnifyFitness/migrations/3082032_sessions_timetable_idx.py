@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('omnifyFitness', '3082031_sessions_instructor_overlap_guard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sessions',
+            index=models.Index(fields=['day_of_week', 'start_time', 'id'], name='sessions_timetable_idx'),
+        ),
+    ]
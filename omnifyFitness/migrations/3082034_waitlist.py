@@ -0,0 +1,34 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('omnifyFitness', '3082033_booking_session_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessions',
+            name='waitlist_tickets',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket', models.PositiveBigIntegerField()),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('class_session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='omnifyFitness.sessions')),
+                ('user', models.ForeignKey(limit_choices_to={'role': 'CLIENT'}, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'class_session'), name='waitlist_unique_user'), models.UniqueConstraint(fields=('class_session', 'ticket'), name='waitlist_unique_ticket')],
+            },
+        ),
+    ]
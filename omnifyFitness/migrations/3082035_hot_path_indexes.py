@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('omnifyFitness', '3082034_waitlist'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='sessions',
+            name='sessions_instructor_slot_idx',
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='class_session',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='omnifyFitness.sessions'),
+        ),
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='class_session',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='omnifyFitness.sessions'),
+        ),
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='user',
+            field=models.ForeignKey(db_index=False, limit_choices_to={'role': 'CLIENT'}, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('session_date__isnull', False)), fields=['session_date', 'class_session'], name='booking_dated_window_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessions',
+            index=models.Index(condition=models.Q(('instructor__isnull', False)), fields=['instructor', 'day_of_week', 'start_time', 'end_time'], name='sessions_instructor_slot_idx'),
+        ),
+    ]
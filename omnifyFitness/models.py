@@ -16,27 +16,95 @@ DAYS_OF_WEEK = [
     (6, 'Saturday'),
 ]
 
+DAY_LOOKUP = {
+    'sunday': 0, 'sun': 0,
+    'monday': 1, 'mon': 1,
+    'tuesday': 2, 'tue': 2,
+    'wednesday': 3, 'wed': 3,
+    'thursday': 4, 'thu': 4,
+    'friday': 5, 'fri': 5,
+    'saturday': 6, 'sat': 6,
+}
+
 class Sessions(models.Model):
     class_type = models.ForeignKey(ClassType, on_delete=models.CASCADE)
     day_of_week = models.IntegerField(choices=DAYS_OF_WEEK)
     start_time = models.TimeField()  
     end_time = models.TimeField()
     capacity = models.PositiveIntegerField()
+    seats_taken = models.PositiveIntegerField(default=0)  # standing (undated) bookings, kept by omnifyFitness.booking
     instructor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, limit_choices_to={'role': 'INSTRUCTOR'})
+    waitlist_tickets = models.PositiveBigIntegerField(default=0)  # last waitlist ticket issued for this session
 
     class Meta:
         unique_together = ('class_type', 'day_of_week', 'start_time')
-        
+        indexes = [
+            # Serves the instructor overlap guard in omnifyFitness.constraints,
+            # which only ever probes sessions that have an instructor.
+            models.Index(
+                fields=['instructor', 'day_of_week', 'start_time', 'end_time'],
+                condition=models.Q(instructor__isnull=False),
+                name='sessions_instructor_slot_idx',
+            ),
+            # Keyset order of the timetable (omnifyFitness.pagination.SessionPagination).
+            models.Index(fields=['day_of_week', 'start_time', 'id'], name='sessions_timetable_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='sessions_end_after_start'),
+        ]
+
     
     def __str__(self):
         return f"{self.class_type.name} on {self.get_day_of_week_display()} at {self.start_time} to {self.end_time}"
 
     
 class Booking(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'CLIENT'})
-    class_session = models.ForeignKey(Sessions, on_delete=models.CASCADE, related_name='bookings')
+    # Indexed as the prefix of booking_user_booked_at_idx.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'CLIENT'}, db_index=False)
+    # Indexed as the prefix of booking_session_date_idx.
+    class_session = models.ForeignKey(Sessions, on_delete=models.CASCADE, related_name='bookings', db_index=False)
     booked_at = models.DateTimeField(auto_now_add=True)
+    # Null for a standing booking that holds a seat every week; otherwise the
+    # single dated occurrence this booking is for (see omnifyFitness.occurrences).
+    session_date = models.DateField(null=True, blank=True)
 
     class Meta:
-        unique_together = ('user', 'class_session')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'class_session'],
+                condition=models.Q(session_date__isnull=True),
+                name='booking_unique_standing',
+            ),
+            models.UniqueConstraint(fields=['user', 'class_session', 'session_date'], name='booking_unique_dated'),
+        ]
+        indexes = [
+            # Seat counts for a session: its standing bookings and per-date loads.
+            models.Index(fields=['class_session', 'session_date'], name='booking_session_date_idx'),
+            # Dated bookings in a date window across sessions; standing
+            # bookings, usually most of the table, are left out.
+            models.Index(
+                fields=['session_date', 'class_session'],
+                condition=models.Q(session_date__isnull=False),
+                name='booking_dated_window_idx',
+            ),
+            # A client's bookings, newest first (omnifyFitness.pagination.BookingPagination).
+            models.Index(fields=['user', 'booked_at', 'id'], name='booking_user_booked_at_idx'),
+        ]
+
 
+
+class WaitlistEntry(models.Model):
+    # A client queued for a standing seat on a full session, served in
+    # ticket order by omnifyFitness.booking.promote_waitlist.
+    # Both foreign keys are indexed as prefixes of the unique constraints.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'CLIENT'}, db_index=False)
+    class_session = models.ForeignKey(Sessions, on_delete=models.CASCADE, related_name='waitlist', db_index=False)
+    ticket = models.PositiveBigIntegerField()
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'class_session'], name='waitlist_unique_user'),
+            # Its index serves the head-of-queue lookup and position counts.
+            models.UniqueConstraint(fields=['class_session', 'ticket'], name='waitlist_unique_ticket'),
+        ]
@@ -0,0 +1,72 @@
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from django.db.models import Count
+
+from omnifyFitness.models import Booking
+
+Occurrence = namedtuple('Occurrence', ['session', 'date', 'starts_at', 'ends_at'])
+
+
+def day_of_week(date):
+    """``DAYS_OF_WEEK`` number (Sunday=0) for a calendar date."""
+    return (date.weekday() + 1) % 7
+
+
+def first_on_or_after(start, day):
+    return start + timedelta(days=(day - day_of_week(start)) % 7)
+
+
+def iter_occurrences(sessions, start, end):
+    """Lazily expand weekly ``Sessions`` templates into dated occurrences.
+
+    Yields an ``Occurrence`` for every template on every matching date in
+    ``[start, end]``, ordered by date then start time. Only the templates are
+    held in memory, so a year-long window costs no more memory than a week;
+    nothing is stored. Times are UTC, as everywhere else in the schedule.
+    """
+    by_day = defaultdict(list)
+    for session in sessions:
+        by_day[session.day_of_week].append(session)
+    for templates in by_day.values():
+        templates.sort(key=lambda s: (s.start_time, s.id))
+
+    date = start
+    while date <= end:
+        for session in by_day.get(day_of_week(date), ()):
+            yield Occurrence(
+                session=session,
+                date=date,
+                starts_at=datetime.combine(date, session.start_time, tzinfo=timezone.utc),
+                ends_at=datetime.combine(date, session.end_time, tzinfo=timezone.utc),
+            )
+        date += timedelta(days=1)
+
+
+def dated_booking_counts(start, end, session_ids=None):
+    """``{(session_id, date): bookings}`` for dated bookings in the window.
+
+    One grouped query over the (class_session, session_date) index; standing
+    bookings are not included, they are on ``Sessions.seats_taken``.
+    """
+    bookings = Booking.objects.filter(session_date__range=(start, end))
+    if session_ids is not None:
+        bookings = bookings.filter(class_session_id__in=session_ids)
+    rows = (
+        bookings.order_by()
+        .values_list('class_session_id', 'session_date')
+        .annotate(n=Count('id'))
+    )
+    return {(session_id, date): n for session_id, date, n in rows}
+
+
+def with_seat_counts(occurrences, counts):
+    """Pair each occurrence with ``(booked, remaining)`` seats.
+
+    A standing booking holds a seat on every date, so an occurrence's load is
+    the template's ``seats_taken`` plus that date's dated bookings.
+    """
+    for occurrence in occurrences:
+        session = occurrence.session
+        booked = session.seats_taken + counts.get((session.id, occurrence.date), 0)
+        yield occurrence, booked, max(session.capacity - booked, 0)
@@ -0,0 +1,118 @@
+import base64
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over a unique, indexed ordering.
+
+    The cursor carries the ordering values of the last row on the page and
+    the next page is fetched with ``WHERE (ordering) > (cursor)``, so every
+    page is an index range scan of ``page_size`` rows however deep it is.
+    The last field of ``ordering`` must be unique (normally the pk).
+    """
+    ordering = ('id',)
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.page_from(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.page_from([obj async for obj in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.model = queryset.model
+        self.limit = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        return queryset[:self.limit + 1]
+
+    def page_from(self, rows):
+        self.has_next = len(rows) > self.limit
+        page = rows[:self.limit]
+        self.next_position = self.position_of(page[-1]) if self.has_next else None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {'next': self.get_next_link(), 'results': data}
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(self.next_position)
+        )
+
+    def fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def position_of(self, obj):
+        return [getattr(obj, name) for name, _ in self.fields()]
+
+    def after(self, position):
+        # Nested form a >= x AND (a > x OR (a = x AND (b > y OR ...))) keeps
+        # the leading column as an index bound on every backend.
+        condition = None
+        for (name, descending), value in reversed(list(zip(self.fields(), position))):
+            lookup = 'lt' if descending else 'gt'
+            strict = Q(**{f'{name}__{lookup}': value})
+            condition = strict if condition is None else strict | (Q(**{name: value}) & condition)
+        name, descending = self.fields()[0]
+        bound = Q(**{f"{name}__{'lte' if descending else 'gte'}": position[0]})
+        return bound & condition
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            fields = self.fields()
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [
+                self.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(fields, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+
+class SessionPagination(KeysetPagination):
+    ordering = ('day_of_week', 'start_time', 'id')
+
+
+class BookingPagination(KeysetPagination):
+    # Newest first, on the (user, booked_at, id) index.
+    ordering = ('-booked_at', '-id')
@@ -0,0 +1,65 @@
+from datetime import date
+
+from django.db.models import Q
+
+from omnifyFitness.models import Booking
+
+CHUNK_SIZE = 500
+
+
+def upcoming_bookings(sessions):
+    """Standing bookings and dated ones from today on, for the ``sessions`` queryset."""
+    return Booking.objects.filter(
+        Q(session_date__isnull=True) | Q(session_date__gte=date.today()),
+        class_session__in=sessions.values('pk'),
+    )
+
+
+def iter_roster(sessions):
+    """Yield each of ``sessions`` with the clients booked on it.
+
+    Two queries however many sessions and attendees there are: the sessions
+    in id order, and their bookings (with the users joined) in session id
+    order, both streamed in chunks and merged as they arrive, so only one
+    session's attendees are held at a time.
+    """
+    session_rows = (
+        sessions.select_related('class_type')
+        .order_by('id')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    booking_rows = (
+        upcoming_bookings(sessions)
+        .order_by('class_session_id', 'session_date', 'id')
+        .values_list(
+            'class_session_id', 'id', 'session_date', 'user_id', 'user__email', 'user__first_name', 'user__last_name'
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    pending = next(booking_rows, None)
+    for session in session_rows:
+        attendees = []
+        # Bookings of sessions that appeared after the sessions query ran are skipped.
+        while pending is not None and pending[0] <= session.id:
+            if pending[0] == session.id:
+                _, booking_id, session_date, user_id, email, first_name, last_name = pending
+                attendees.append({
+                    'booking': booking_id,
+                    'session_date': session_date,
+                    'user': user_id,
+                    'email': email,
+                    'first_name': first_name,
+                    'last_name': last_name,
+                })
+            pending = next(booking_rows, None)
+        yield {
+            'id': session.id,
+            'class_type': session.class_type.name,
+            'day_of_week': session.day_of_week,
+            'day_of_week_display': session.get_day_of_week_display(),
+            'start_time': session.start_time,
+            'end_time': session.end_time,
+            'capacity': session.capacity,
+            'booked_count': session.seats_taken,
+            'attendees': attendees,
+        }
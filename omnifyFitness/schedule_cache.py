@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import QueryDict
+
+from omnifyFitness.filters import canonical_filters
+from omnifyFitness.pagination import SessionPagination
+
+VERSION_KEY = 'schedule:version'
+LEASE_SECONDS = 10
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a cache restart never reuses an old version.
+        cache.add(VERSION_KEY, time.time_ns() // 1_000_000, timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns() // 1_000_000, timeout=None)
+
+
+def schedule_changed(**kwargs):
+    """Signal receiver: publish a new schedule version once the write commits."""
+    transaction.on_commit(bump_version)
+
+
+def normalize_query(request):
+    """Rewrite ``request``'s query string to the parameters the timetable reads.
+
+    Only the filters and the cursor/page size survive, in canonical form, so
+    equivalent URLs share a cache entry and made-up parameters cannot mint
+    new ones. The page is rendered from the rewritten request, so its
+    ``next`` link matches the key as well.
+    """
+    pagination = SessionPagination()
+    params = request.query_params
+    canonical = canonical_filters(params)
+    if params.get(pagination.cursor_query_param):
+        canonical.append((pagination.cursor_query_param, params[pagination.cursor_query_param]))
+    page_size = pagination.get_page_size(request)
+    if page_size != pagination.page_size:
+        canonical.append((pagination.page_size_query_param, str(page_size)))
+    query = urlencode(canonical)
+    django_request = getattr(request, '_request', request)
+    django_request.GET = QueryDict(query)
+    django_request.META['QUERY_STRING'] = query
+
+
+def etag_and_key(request):
+    """Strong ETag and cache key for ``request``, computed without the database.
+
+    Both are derived from the schedule version and the full request URI (the
+    page's ``next`` link embeds the host), so equal ETags mean equal bytes.
+    Call ``normalize_query`` first.
+    """
+    version = get_version()
+    digest = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f'"schedule-{version}-{digest}"', f'schedule:{version}:{digest}'
+
+
+_flights = {}
+_flights_guard = threading.Lock()
+
+
+def get_or_build(key, build):
+    """Return the cached bytes for ``key``, building them at most once.
+
+    Threads in this process queue on a per-key lock; other processes wait on
+    a short cache lease held by whichever worker is rebuilding. If the lease
+    holder dies, waiters fall back to building for themselves.
+    """
+    body = cache.get(key)
+    if body is not None:
+        return body
+    with _flights_guard:
+        flight = _flights.setdefault(key, threading.Lock())
+    try:
+        with flight:
+            body = cache.get(key)
+            if body is None:
+                body = _build_once(key, build)
+    finally:
+        with _flights_guard:
+            _flights.pop(key, None)
+    return body
+
+
+def _build_once(key, build):
+    lease = f'{key}:building'
+    timeout = getattr(settings, 'SCHEDULE_CACHE_TIMEOUT', 300)
+    if cache.add(lease, 1, LEASE_SECONDS):
+        try:
+            body = build()
+            cache.set(key, body, timeout)
+            return body
+        finally:
+            cache.delete(lease)
+    deadline = time.monotonic() + LEASE_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        body = cache.get(key)
+        if body is not None:
+            return body
+    return build()
+
+
+async def aget_or_build(key, build):
+    """``get_or_build`` for async views; ``build`` is a coroutine function.
+
+    The cache lease alone serialises builders here: waiters poll it with
+    ``asyncio.sleep`` instead of blocking the event loop on a thread lock.
+    """
+    body = cache.get(key)
+    if body is not None:
+        return body
+    lease = f'{key}:building'
+    if cache.add(lease, 1, LEASE_SECONDS):
+        try:
+            body = await build()
+            cache.set(key, body, getattr(settings, 'SCHEDULE_CACHE_TIMEOUT', 300))
+            return body
+        finally:
+            cache.delete(lease)
+    deadline = time.monotonic() + LEASE_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        body = cache.get(key)
+        if body is not None:
+            return body
+    return await build()
@@ -1,5 +1,11 @@
 from rest_framework.serializers import ModelSerializer, Serializer
 from .models import *
+from .booking import book_session, book_sessions, join_waitlist, waitlist_position
+from .occurrences import day_of_week
+from .catalog import catalog
+from . import ical
+from .constraints import check_instructor_overlap, is_overlap_violation
+from django.db import IntegrityError, connection, transaction
 from rest_framework import serializers
 from datetime import datetime, timedelta
 
@@ -7,8 +13,17 @@ class ClassTypeSerializer(ModelSerializer):
     class Meta:
         model = ClassType
         fields = '__all__'
+class CatalogSlugRelatedField(serializers.SlugRelatedField):
+    # Resolves class type names from the in-process catalog, not the database.
+    def to_internal_value(self, data):
+        class_type = catalog.get_by_name(str(data))
+        if class_type is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=str(data))
+        return class_type
+
+
 class RecurringSessionsSerializer(serializers.ModelSerializer):
-    class_type = serializers.SlugRelatedField(
+    class_type = CatalogSlugRelatedField(
         slug_field='name',
         queryset=ClassType.objects.all()
     )
@@ -21,6 +36,9 @@ class RecurringSessionsSerializer(serializers.ModelSerializer):
     day_of_week_display = serializers.SerializerMethodField(read_only=True)
     time_utc = serializers.SerializerMethodField(read_only=True)
     instructor_email = serializers.EmailField(write_only=True)
+    # Standing bookings, from the counter the booking engine keeps on the row.
+    booked_count = serializers.IntegerField(source='seats_taken', read_only=True)
+    remaining_seats = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Sessions
@@ -32,6 +50,8 @@ class RecurringSessionsSerializer(serializers.ModelSerializer):
             'duration_minutes',
             'time_utc',
             'capacity',
+            'booked_count',
+            'remaining_seats',
             'instructor_email',
             'instructor',
             'end_time',
@@ -41,32 +61,27 @@ class RecurringSessionsSerializer(serializers.ModelSerializer):
     def get_day_of_week_display(self, obj):
         return obj.get_day_of_week_display()
 
+    def get_remaining_seats(self, obj):
+        return max(obj.capacity - obj.seats_taken, 0)
+
     def validate_day_of_week(self, values):
-        day_map = {
-            'sunday': 0, 'sun': 0,
-            'monday': 1, 'mon': 1,
-            'tuesday': 2, 'tue': 2,
-            'wednesday': 3, 'wed': 3,
-            'thursday': 4, 'thu': 4,
-            'friday': 5, 'fri': 5,
-            'saturday': 6, 'sat': 6,
-        }
         result = []
         for value in values:
             key = value.lower().strip()
-            if key not in day_map:
+            if key not in DAY_LOOKUP:
                 raise serializers.ValidationError(f"Invalid day: {value}")
-            result.append(day_map[key])
+            result.append(DAY_LOOKUP[key])
         return result
 
     def validate_instructor_email(self, email):
+        # Returns the instructor itself so create/update don't look it up again.
         try:
             instructor = User.objects.get(email=email)
             if instructor.role != 'INSTRUCTOR':
                 raise serializers.ValidationError("User is not an instructor.")
         except User.DoesNotExist:
             raise serializers.ValidationError("Instructor with this email does not exist.")
-        return email
+        return instructor
 
     def get_time_utc(self, obj):
         return obj.start_time.strftime('%H:%M:%S') + ' UTC'
@@ -83,59 +98,60 @@ class RecurringSessionsSerializer(serializers.ModelSerializer):
         5: "Friday",
         6: "Saturday",
     }
+
+    def _end_time(self, start_time, duration):
+        start_dt = datetime.combine(datetime.today(), start_time)
+        end_dt = start_dt + timedelta(minutes=duration)
+        if end_dt.date() != start_dt.date() or end_dt == start_dt:
+            raise serializers.ValidationError("Session must end after it starts and before midnight.")
+        return end_dt.time()
+
+    SCHEDULE_FIELDS = ['class_type', 'day_of_week', 'start_time', 'end_time', 'capacity', 'instructor']
+
+    def _save_session(self, session):
+        # The database rejects duplicate slots and instructor overlaps
+        # (see omnifyFitness.constraints), so there is no check-then-insert.
+        day = self.DAY_NAME_MAP.get(session.day_of_week)
+        try:
+            with transaction.atomic():
+                check_instructor_overlap(session, connection)
+                # seats_taken and waitlist_tickets are counters kept with F()
+                # updates; an edit must not write back a stale copy of them.
+                session.save(update_fields=None if session._state.adding else self.SCHEDULE_FIELDS)
+        except IntegrityError as e:
+            if is_overlap_violation(e):
+                clashes = Sessions.objects.filter(
+                    instructor_id=session.instructor_id,
+                    day_of_week=session.day_of_week,
+                    start_time__lt=session.end_time,
+                    end_time__gt=session.start_time,
+                ).exclude(pk=session.pk)
+                times_str = "; ".join(
+                    f"{s.start_time.strftime('%H:%M')} - {s.end_time.strftime('%H:%M')}" for s in clashes
+                )
+                raise serializers.ValidationError(
+                    f"Instructor '{session.instructor.email}' is already scheduled on {day} during: {times_str}."
+                )
+            if 'sessions_end_after_start' in str(e):
+                raise serializers.ValidationError("Session must end after it starts and before midnight.")
+            raise serializers.ValidationError(
+                f"A session with class '{session.class_type.name}' already exists on {day} at {session.start_time.strftime('%H:%M')}."
+            )
+        return session
+
     def create(self, validated_data):
         day_of_weeks = validated_data.pop('day_of_week')
         duration = validated_data.pop('duration_minutes')
-        instructor_email = validated_data.pop('instructor_email')
-
-        try:
-            instructor = User.objects.get(email=instructor_email)
-            if instructor.role != 'INSTRUCTOR':
-                raise serializers.ValidationError("User is not an instructor.")
-        except User.DoesNotExist:
-            raise serializers.ValidationError("Instructor with this email does not exist.")
+        instructor = validated_data.pop('instructor_email')
 
         validated_data['instructor'] = instructor
-        start_time = validated_data['start_time']
-        start_dt = datetime.combine(datetime.today(), start_time)
-        end_dt = start_dt + timedelta(minutes=duration)
-        validated_data['end_time'] = end_dt.time()
+        validated_data['end_time'] = self._end_time(validated_data['start_time'], duration)
 
-        conflict_errors = []
+        created_instances = []
         for day in day_of_weeks:
-            if Sessions.objects.filter(
-                class_type=validated_data['class_type'],
-                day_of_week=day,
-                start_time=start_time
-            ).exists():
-                raise serializers.ValidationError({
-                    f"A session with class '{validated_data['class_type'].name}' already exists on {self.DAY_NAME_MAP.get(day)} at {start_time.strftime('%H:%M')}."
-                })
-            overlapping_sessions = Sessions.objects.filter(
-                instructor=instructor,
-                day_of_week=day
-            ).filter(
-                start_time__lt=validated_data['end_time'],
-                end_time__gt=start_time
-            )
-            if overlapping_sessions.exists():
-                time_ranges = [
-                    f"{s.start_time.strftime('%H:%M')} - {s.end_time.strftime('%H:%M')}"
-                    for s in overlapping_sessions
-                ]
-                times_str = "; ".join(time_ranges)
-                conflict_errors.append(
-                    f"Instructor '{instructor.email}' is already scheduled on {self.DAY_NAME_MAP.get(day)} during: {times_str}."
-                )
-        
-            
-            created_instances = []
             sessions_data = validated_data.copy()
             sessions_data['day_of_week'] = day
-            instance = Sessions.objects.create(**sessions_data)
-            created_instances.append(instance)
-        if conflict_errors:
-            raise serializers.ValidationError(conflict_errors)
+            created_instances.append(self._save_session(Sessions(**sessions_data)))
         return created_instances[0]
     
     def update(self, instance, validated_data):
@@ -146,19 +162,9 @@ class RecurringSessionsSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Only admin users can update schedules.")
 
         duration = validated_data.pop('duration_minutes', None)
-        instructor_email = validated_data.pop('instructor_email', None)
+        instructor = validated_data.pop('instructor_email', None) or instance.instructor
         day_of_weeks = validated_data.pop('day_of_week', [instance.day_of_week])
 
-        if instructor_email:
-            try:
-                instructor = User.objects.get(email=instructor_email)
-                if instructor.role != 'INSTRUCTOR':
-                    raise serializers.ValidationError("User is not an instructor.")
-            except User.DoesNotExist:
-                raise serializers.ValidationError("Instructor with this email does not exist.")
-        else:
-            instructor = instance.instructor
-
         validated_data['instructor'] = instructor
 
         # Update start_time or keep old
@@ -166,56 +172,88 @@ class RecurringSessionsSerializer(serializers.ModelSerializer):
 
         # Duration fallback
         if duration is not None:
-            start_dt = datetime.combine(datetime.today(), start_time)
-            end_dt = start_dt + timedelta(minutes=duration)
-            end_time = end_dt.time()
+            end_time = self._end_time(start_time, duration)
         else:
             end_time = instance.end_time
 
         validated_data['end_time'] = end_time
 
-        # Perform conflict check
-        conflict_errors = []
-        for day in day_of_weeks:
-            overlapping_sessions = Sessions.objects.filter(
-                instructor=instructor,
-                day_of_week=day
-            ).exclude(pk=instance.pk).filter(
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            )
-            if overlapping_sessions.exists():
-                time_ranges = [
-                    f"{s.start_time.strftime('%H:%M')} - {s.end_time.strftime('%H:%M')}"
-                    for s in overlapping_sessions
-                ]
-                times_str = "; ".join(time_ranges)
-                conflict_errors.append(
-                    f"Instructor '{instructor.email}' is already scheduled on {self.DAY_NAME_MAP.get(day)} during: {times_str}."
-                )
-
-        if conflict_errors:
-            raise serializers.ValidationError({"errors": conflict_errors})
-
         # Apply updates
+        ical.remember_instructor(instance)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.day_of_week = day_of_weeks[0]  # Use only the first day for update
-        instance.save()
-
-        return instance
+        return self._save_session(instance)
     
 
 class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
-        fields = ['class_session']
-    
-    def validate(self, attrs):
-        session = attrs['class_session']
-        current_bookings = Booking.objects.filter(class_session=session).count()
+        fields = ['class_session', 'session_date']
+
+    def validate(self, data):
+        session_date = data.get('session_date')
+        if session_date is not None:
+            if session_date < timezone.now().date():
+                raise serializers.ValidationError({'session_date': "Cannot book a past occurrence."})
+            if day_of_week(session_date) != data['class_session'].day_of_week:
+                raise serializers.ValidationError({'session_date': "The session does not run on this date."})
+        return data
+
+    # Capacity is enforced when the seat is claimed in omnifyFitness.booking,
+    # not here, so the check and the insert cannot race each other.
+    def create(self, validated_data):
+        return book_session(
+            validated_data['user'], validated_data['class_session'], validated_data.get('session_date')
+        )
+
+class BatchBookingSerializer(Serializer):
+    class_sessions = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=20)
+    atomic = serializers.BooleanField(default=True)
+
+    # Per-session outcomes are decided under the session row locks in
+    # omnifyFitness.booking; unknown ids come back as not_found.
+    def create(self, validated_data):
+        results, _ = book_sessions(
+            validated_data['user'], validated_data['class_sessions'], atomic=validated_data['atomic']
+        )
+        return results
+
+class BookedInstructorSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'email', 'first_name', 'last_name']
+
 
-        if current_bookings >= session.capacity:
-            raise serializers.ValidationError(f"Session is full. Max capacity of {session.capacity} reached.")
+class BookedSessionSerializer(serializers.ModelSerializer):
+    class_type = serializers.CharField(source='class_type.name')
+    day_of_week_display = serializers.CharField(source='get_day_of_week_display')
+    instructor = BookedInstructorSerializer()
 
-        return attrs
\ No newline at end of file
+    class Meta:
+        model = Sessions
+        fields = ['id', 'class_type', 'day_of_week', 'day_of_week_display', 'start_time', 'end_time', 'instructor']
+
+
+class MyBookingSerializer(serializers.ModelSerializer):
+    # Expects class_session, its class_type and instructor select_related.
+    class_session = BookedSessionSerializer()
+
+    class Meta:
+        model = Booking
+        fields = ['id', 'class_session', 'session_date', 'booked_at']
+
+
+class WaitlistSerializer(serializers.ModelSerializer):
+    position = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'class_session', 'ticket', 'position', 'joined_at']
+        read_only_fields = ['ticket', 'joined_at']
+
+    # Fullness is checked under the session row lock in omnifyFitness.booking.
+    def create(self, validated_data):
+        entry = join_waitlist(validated_data['user'], validated_data['class_session'])
+        entry.position = waitlist_position(entry)
+        return entry
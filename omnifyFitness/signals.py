@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from omnifyFitness import ical, live
+from omnifyFitness.catalog import catalog
+from omnifyFitness.models import Booking, ClassType, Sessions
+from omnifyFitness.schedule_cache import schedule_changed
+
+
+@receiver(post_save, sender=ClassType)
+@receiver(post_delete, sender=ClassType)
+def invalidate_class_type_catalog(sender, **kwargs):
+    # Drop it now so this transaction sees its own change, and again after
+    # commit in case another thread reloaded the old rows in between.
+    catalog.invalidate()
+    transaction.on_commit(catalog.invalidate)
+
+
+for model in (Sessions, Booking):
+    post_save.connect(schedule_changed, sender=model, dispatch_uid=f'schedule_changed_save_{model.__name__}')
+    post_delete.connect(schedule_changed, sender=model, dispatch_uid=f'schedule_changed_delete_{model.__name__}')
+
+post_save.connect(ical.booking_changed, sender=Booking, dispatch_uid='ical_booking_save')
+post_delete.connect(ical.booking_changed, sender=Booking, dispatch_uid='ical_booking_delete')
+pre_save.connect(ical.capture_instructor, sender=Sessions, dispatch_uid='ical_capture_instructor')
+post_save.connect(ical.session_changed, sender=Sessions, dispatch_uid='ical_session_save')
+post_delete.connect(ical.session_changed, sender=Sessions, dispatch_uid='ical_session_delete')
+
+post_save.connect(live.booking_changed, sender=Booking, dispatch_uid='live_booking_save')
+post_delete.connect(live.booking_changed, sender=Booking, dispatch_uid='live_booking_delete')
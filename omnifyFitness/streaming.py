@@ -0,0 +1,22 @@
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def json_array_stream(items, batch_size=200):
+    """Encode an iterable as a JSON array, yielding it in chunks.
+
+    Meant for ``StreamingHttpResponse``: only ``batch_size`` encoded items
+    are held at a time, however long ``items`` is.
+    """
+    encoder = DjangoJSONEncoder()
+    yield '['
+    batch = []
+    first = True
+    for item in items:
+        batch.append(encoder.encode(item))
+        if len(batch) >= batch_size:
+            yield ('' if first else ',') + ','.join(batch)
+            first = False
+            batch = []
+    if batch:
+        yield ('' if first else ',') + ','.join(batch)
+    yield ']'
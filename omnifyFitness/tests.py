@@ -1,3 +1,1211 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from omnifyFitness.booking import book_session, book_sessions, cancel_booking, join_waitlist, waitlist_position
+from omnifyFitness import ical
+from omnifyFitness.async_views import AsyncClassTypesView, AsyncInstructorSessionsView, AsyncSessionListView, SeatStreamView
+from omnifyFitness.catalog import catalog
+from omnifyFitness.constraints import INSTRUCTOR_OVERLAP_CONSTRAINT, overlapping_sessions, remove_overlap_guard, schedule_conflicts
+from omnifyFitness.importer import import_sessions
+from omnifyFitness.live import InProcessBroker, get_broker, publish_seats
+from omnifyFitness.models import Booking, ClassType, Sessions, WaitlistEntry
+from omnifyFitness.occurrences import dated_booking_counts, first_on_or_after, iter_occurrences
+from USER.models import OutboxEmail, User, UserRole
+from USER.tests import FAST_HASHER, QueryBudgetMixin, QueryPlanMixin, make_users
+
+
+def make_session(capacity, **kwargs):
+    class_type, _ = ClassType.objects.get_or_create(name='YOGA')
+    kwargs.setdefault('day_of_week', 1)
+    kwargs.setdefault('start_time', time(9, 0))
+    kwargs.setdefault('end_time', time(10, 0))
+    return Sessions.objects.create(class_type=class_type, capacity=capacity, **kwargs)
+
+
+def make_clients(count, prefix='client'):
+    User.objects.bulk_create(
+        User(email=f'{prefix}{i}@example.com', role=UserRole.CLIENT, is_active=True)
+        for i in range(count)
+    )
+    return list(User.objects.filter(email__startswith=prefix).order_by('pk'))
+
+
+class BookingEngineTests(TestCase):
+    def setUp(self):
+        self.session = make_session(capacity=2)
+        self.clients = make_clients(3)
+
+    def test_booking_claims_a_seat(self):
+        book_session(self.clients[0], self.session)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seats_taken, 1)
+
+    def test_full_session_is_rejected(self):
+        book_session(self.clients[0], self.session)
+        book_session(self.clients[1], self.session)
+        with self.assertRaises(serializers.ValidationError):
+            book_session(self.clients[2], self.session)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seats_taken, 2)
+
+    def test_duplicate_booking_gives_the_seat_back(self):
+        book_session(self.clients[0], self.session)
+        with self.assertRaises(serializers.ValidationError):
+            book_session(self.clients[0], self.session)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seats_taken, 1)
+
+    def test_cancel_releases_the_seat(self):
+        booking = book_session(self.clients[0], self.session)
+        self.assertTrue(cancel_booking(booking))
+        self.assertFalse(cancel_booking(booking))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seats_taken, 0)
+
+
+class OccurrenceEngineTests(TestCase):
+    def setUp(self):
+        self.session = make_session(capacity=2)
+        self.clients = make_clients(3)
+        self.monday = first_on_or_after(date.today() + timedelta(days=1), 1)
+
+    def test_year_window_yields_one_occurrence_per_week(self):
+        start = date(2026, 1, 1)
+        dates = [o.date for o in iter_occurrences([self.session], start, start + timedelta(days=365))]
+        self.assertEqual(len(dates), 52)
+        self.assertTrue(all(d.weekday() == 0 for d in dates))
+
+    def test_dated_bookings_are_counted_per_date(self):
+        book_session(self.clients[0], self.session, self.monday)
+        book_session(self.clients[1], self.session, self.monday + timedelta(days=7))
+        counts = dated_booking_counts(self.monday, self.monday + timedelta(days=13))
+        self.assertEqual(counts, {(self.session.id, self.monday): 1, (self.session.id, self.monday + timedelta(days=7)): 1})
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seats_taken, 0)
+
+    def test_standing_and_dated_bookings_share_capacity(self):
+        book_session(self.clients[0], self.session)
+        book_session(self.clients[1], self.session, self.monday)
+        with self.assertRaises(serializers.ValidationError):
+            book_session(self.clients[2], self.session, self.monday)
+        with self.assertRaises(serializers.ValidationError):
+            book_session(self.clients[2], self.session)
+        book_session(self.clients[2], self.session, self.monday + timedelta(days=7))
+
+
+class BookingConcurrencyTests(TransactionTestCase):
+    CLIENTS = 200
+    CAPACITY = 25
+
+    def setUp(self):
+        # Shared-cache in-memory SQLite raises "table is locked" instead of
+        # waiting for the writer, so run this against PostgreSQL or a file DB.
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('needs a database that serialises concurrent writers')
+
+    def test_parallel_bookings_never_exceed_capacity(self):
+        session = make_session(capacity=self.CAPACITY)
+        clients = make_clients(self.CLIENTS)
+
+        def attempt(user):
+            try:
+                book_session(user, session)
+                return True
+            except serializers.ValidationError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(attempt, clients))
+
+        session.refresh_from_db()
+        booked = Booking.objects.filter(class_session=session).count()
+        self.assertEqual(results.count(True), self.CAPACITY)
+        self.assertEqual(booked, self.CAPACITY)
+        self.assertEqual(session.seats_taken, self.CAPACITY)
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.session = make_session(capacity=1)
+        self.clients = make_clients(4)
+        self.booking = book_session(self.clients[0], self.session)
+
+    def test_only_full_sessions_can_be_joined(self):
+        cancel_booking(self.booking)
+        with self.assertRaises(serializers.ValidationError):
+            join_waitlist(self.clients[1], self.session)
+
+    def test_joining_twice_is_rejected(self):
+        join_waitlist(self.clients[1], self.session)
+        with self.assertRaises(serializers.ValidationError):
+            join_waitlist(self.clients[1], self.session)
+        with self.assertRaises(serializers.ValidationError):
+            join_waitlist(self.clients[0], self.session)
+
+    def test_positions_follow_join_order(self):
+        entries = [join_waitlist(client, self.session) for client in self.clients[1:]]
+        self.assertEqual([waitlist_position(e) for e in entries], [1, 2, 3])
+        entries[0].delete()
+        self.assertEqual(waitlist_position(entries[2]), 2)
+
+    def test_cancellation_promotes_the_head_of_the_queue(self):
+        join_waitlist(self.clients[1], self.session)
+        join_waitlist(self.clients[2], self.session)
+        cancel_booking(self.booking)
+        self.assertTrue(Booking.objects.filter(user=self.clients[1], class_session=self.session).exists())
+        self.assertEqual(list(WaitlistEntry.objects.values_list('user', flat=True)), [self.clients[2].pk])
+        self.assertTrue(OutboxEmail.objects.filter(to=self.clients[1].email).exists())
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seats_taken, 1)
+
+    def test_dated_cancellation_promotes_the_head_of_the_queue(self):
+        join_waitlist(self.clients[1], self.session)
+        # Booked before a capacity cut, so the standing seat freed below does not fit on that date.
+        dated = Booking.objects.create(
+            user=self.clients[3], class_session=self.session,
+            session_date=first_on_or_after(date.today() + timedelta(days=1), 1),
+        )
+        cancel_booking(self.booking)
+        self.assertFalse(Booking.objects.filter(user=self.clients[1]).exists())
+        cancel_booking(dated)
+        self.assertTrue(Booking.objects.filter(user=self.clients[1], class_session=self.session, session_date=None).exists())
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class WaitlistEndpointTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create(email='admin@example.com', role=UserRole.ADMIN, is_active=True)
+        coach = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.session = make_session(capacity=1, instructor=coach)
+        self.clients = make_clients(3)
+        book_session(self.clients[0], self.session)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.cookies['access_token'] = str(AccessToken.for_user(user))
+        return client
+
+    def test_join_list_and_leave(self):
+        self.client_for(self.clients[1]).post('/fitness/client/waitlist', {'class_session': self.session.pk}, format='json')
+        client = self.client_for(self.clients[2])
+        response = client.post('/fitness/client/waitlist', {'class_session': self.session.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['position'], 2)
+        self.assertEqual([e['position'] for e in client.get('/fitness/client/waitlist').json()], [2])
+        response = client.delete(f"/fitness/client/waitlist/{response.json()['id']}")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.get('/fitness/client/waitlist').json(), [])
+
+    def test_capacity_increase_promotes_and_keeps_counters(self):
+        for client in self.clients[1:]:
+            join_waitlist(client, self.session)
+        payload = {
+            'class_type': 'YOGA', 'day_of_week': ['mon'], 'start_time': '09:00', 'duration_minutes': 60,
+            'capacity': 2, 'instructor_email': 'coach@example.com',
+        }
+        response = self.client_for(self.admin).put(
+            f'/fitness/admin/session/update/{self.session.pk}', payload, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.seats_taken, 2)
+        self.assertEqual(self.session.waitlist_tickets, 2)
+        self.assertEqual(list(WaitlistEntry.objects.values_list('user', flat=True)), [self.clients[2].pk])
+
+
+class MyBookingsTests(TestCase):
+    def setUp(self):
+        coach = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.member = make_clients(1)[0]
+        self.sessions = [
+            make_session(capacity=5, start_time=time(hour), end_time=time(hour, 45), instructor=coach)
+            for hour in range(8, 13)
+        ]
+        self.bookings = [book_session(self.member, session) for session in self.sessions]
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(AccessToken.for_user(self.member))
+
+    def test_newest_first_with_a_cursor(self):
+        seen, url = [], '/fitness/client/booking?page_size=2'
+        while url:
+            body = self.client.get(url).json()
+            seen += [row['id'] for row in body['results']]
+            url = body['next']
+        self.assertEqual(seen, [b.pk for b in reversed(self.bookings)])
+
+    def test_booking_carries_its_session(self):
+        row = self.client.get('/fitness/client/booking', {'page_size': 1}).json()['results'][0]
+        self.assertEqual(row['class_session']['class_type'], 'YOGA')
+        self.assertEqual(row['class_session']['day_of_week_display'], 'Monday')
+        self.assertEqual(row['class_session']['instructor']['email'], 'coach@example.com')
+
+    def test_upcoming_filter(self):
+        past = Booking.objects.create(
+            user=self.member, class_session=self.sessions[0], session_date=date.today() - timedelta(days=7)
+        )
+        ids = [row['id'] for row in self.client.get('/fitness/client/booking', {'upcoming': 'true'}).json()['results']]
+        self.assertEqual(len(ids), len(self.bookings))
+        self.assertNotIn(past.pk, ids)
+        ids = [row['id'] for row in self.client.get('/fitness/client/booking').json()['results']]
+        self.assertIn(past.pk, ids)
+
+    def test_only_clients_have_bookings(self):
+        client = APIClient()
+        client.cookies['access_token'] = str(AccessToken.for_user(User.objects.get(email='coach@example.com')))
+        self.assertEqual(client.get('/fitness/client/booking').status_code, 403)
+
+
+class BatchBookingTests(TestCase):
+    def setUp(self):
+        self.member, self.other = make_clients(2)
+        self.sessions = [
+            make_session(capacity=1 if hour == 12 else 5, start_time=time(hour), end_time=time(hour, 45))
+            for hour in range(8, 13)
+        ]
+        self.full = self.sessions[-1]
+        book_session(self.other, self.full)
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(AccessToken.for_user(self.member))
+
+    def post(self, ids, **extra):
+        return self.client.post('/fitness/client/booking/batch', {'class_sessions': ids, **extra}, format='json')
+
+    def test_books_every_session(self):
+        ids = [s.pk for s in self.sessions[:4]]
+        response = self.post(ids)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['class_session'] for r in response.json()['results']], ids)
+        self.assertEqual(
+            set(Booking.objects.filter(user=self.member).values_list('class_session_id', flat=True)), set(ids)
+        )
+        self.assertEqual(list(Sessions.objects.filter(pk__in=ids).values_list('seats_taken', flat=True)), [1] * 4)
+
+    def test_all_or_nothing(self):
+        book_session(self.member, self.sessions[1])
+        ids = [s.pk for s in self.sessions]
+        response = self.post(ids)
+        self.assertEqual(response.status_code, 400)
+        statuses = [r['status'] for r in response.json()['results']]
+        self.assertEqual(statuses, ['not_booked', 'already_booked', 'not_booked', 'not_booked', 'full'])
+        self.assertEqual(Booking.objects.filter(user=self.member).count(), 1)
+        self.assertEqual(Sessions.objects.get(pk=self.sessions[0].pk).seats_taken, 0)
+
+    def test_best_effort(self):
+        response = self.post([self.sessions[0].pk, self.full.pk, 999999], atomic=False)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['booked', 'full', 'not_found'])
+        self.assertEqual(results[0]['booking'], Booking.objects.get(user=self.member).pk)
+
+    def test_busiest_upcoming_date_counts(self):
+        session = self.sessions[0]
+        session.capacity = 1
+        session.save()
+        Booking.objects.create(user=self.other, class_session=session, session_date=first_on_or_after(date.today(), 1))
+        results, bookings = book_sessions(self.member, [session.pk])
+        self.assertEqual(results, [{'class_session': session.pk, 'status': 'full'}])
+        self.assertEqual(bookings, [])
+
+    def test_duplicate_ids_book_once(self):
+        results, bookings = book_sessions(self.member, [self.sessions[0].pk] * 3)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(len(bookings), 1)
+
+    def test_receivers_hear_each_booking(self):
+        ids = [s.pk for s in self.sessions[:3]]
+        with mock.patch('omnifyFitness.live.publish_seats') as publish, self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.post(ids).status_code, 201)
+        self.assertEqual(sorted(call.args[0] for call in publish.call_args_list), ids)
+
+    def test_validation(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post(list(range(1, 22))).status_code, 400)
+        coach = APIClient()
+        coach.cookies['access_token'] = str(AccessToken.for_user(
+            User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        ))
+        response = coach.post('/fitness/client/booking/batch', {'class_sessions': [self.sessions[0].pk]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class RosterTests(TestCase):
+    def setUp(self):
+        self.coach = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        other = User.objects.create(email='other@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.sessions = [
+            make_session(capacity=5, day_of_week=day, instructor=self.coach) for day in (1, 2, 3)
+        ]
+        self.others = make_session(capacity=5, day_of_week=4, instructor=other)
+        self.clients = make_clients(4)
+        for client in self.clients[:3]:
+            book_session(client, self.sessions[0])
+        book_session(self.clients[3], self.sessions[2])
+        book_session(self.clients[3], self.others)
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(AccessToken.for_user(self.coach))
+
+    def roster(self, **params):
+        response = self.client.get('/fitness/instructor/roster', params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_sessions_come_with_their_attendees(self):
+        roster = self.roster()
+        self.assertEqual([s['id'] for s in roster], [s.pk for s in self.sessions])
+        self.assertEqual(
+            [[a['email'] for a in s['attendees']] for s in roster],
+            [[c.email for c in self.clients[:3]], [], [self.clients[3].email]],
+        )
+        self.assertEqual(roster[0]['booked_count'], 3)
+
+    def test_past_dated_bookings_are_left_out(self):
+        Booking.objects.create(
+            user=self.clients[3], class_session=self.sessions[1], session_date=date.today() - timedelta(days=7)
+        )
+        upcoming = first_on_or_after(date.today(), 2)
+        book_session(self.clients[2], self.sessions[1], upcoming)
+        attendees = self.roster()[1]['attendees']
+        self.assertEqual([(a['email'], a['session_date']) for a in attendees], [(self.clients[2].email, upcoming.isoformat())])
+
+    def test_filters_apply(self):
+        self.assertEqual([s['id'] for s in self.roster(day='wed')], [self.sessions[2].pk])
+        self.assertEqual(self.client.get('/fitness/instructor/roster', {'day': 'someday'}).status_code, 400)
+
+    def test_only_instructors(self):
+        client = APIClient()
+        client.cookies['access_token'] = str(AccessToken.for_user(self.clients[0]))
+        self.assertEqual(client.get('/fitness/instructor/roster').status_code, 403)
+
+
+class SeatAvailabilityTests(TestCase):
+    def setUp(self):
+        self.full = make_session(capacity=1)
+        self.open = make_session(capacity=3, start_time=time(11), end_time=time(12))
+        clients = make_clients(2)
+        book_session(clients[0], self.full)
+        book_session(clients[1], self.open)
+        cache.clear()
+
+    def test_sessions_report_booked_and_remaining_seats(self):
+        rows = self.client.get('/fitness/admin/session').json()['results']
+        self.assertEqual(
+            [(row['capacity'], row['booked_count'], row['remaining_seats']) for row in rows],
+            [(1, 1, 0), (3, 1, 2)],
+        )
+
+    def test_open_filter(self):
+        rows = self.client.get('/fitness/admin/session', {'open': 'true'}).json()['results']
+        self.assertEqual([row['capacity'] for row in rows], [3])
+        self.assertEqual(len(self.client.get('/fitness/admin/session', {'open': 'no'}).json()['results']), 2)
+        self.assertEqual(self.client.get('/fitness/admin/session', {'open': 'maybe'}).status_code, 400)
+
+    def test_open_filter_on_occurrences(self):
+        monday = first_on_or_after(date.today() + timedelta(days=1), 1)
+        for client in make_clients(2, prefix='dated'):
+            book_session(client, self.open, monday)
+        response = self.client.get(
+            '/fitness/occurrences', {'start': monday.isoformat(), 'end': (monday + timedelta(days=7)).isoformat(), 'open': '1'}
+        )
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([(row['session'], row['date']) for row in rows], [(self.open.pk, (monday + timedelta(days=7)).isoformat())])
+
+
+class TimetableQueryTests(TestCase):
+    def setUp(self):
+        self.coach = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.other = User.objects.create(email='other@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.sunday = make_session(capacity=5, day_of_week=0, instructor=self.coach)
+        self.monday = make_session(capacity=5, instructor=self.coach)
+        self.monday_late = make_session(capacity=5, start_time=time(11), end_time=time(12), instructor=self.other)
+        self.tuesday = make_session(capacity=5, day_of_week=2, start_time=time(18), end_time=time(19))
+        hiit = ClassType.objects.get(name='HIIT')
+        self.hiit = Sessions.objects.create(
+            class_type=hiit, day_of_week=1, start_time=time(10), end_time=time(11), capacity=5, instructor=self.other
+        )
+        cache.clear()
+
+    def pks(self, rows):
+        # Rows carry no id; (class, day, start) is unique.
+        slots = {
+            (s.class_type.name, s.get_day_of_week_display(), s.start_time.isoformat()): s.pk
+            for s in Sessions.objects.select_related('class_type')
+        }
+        return [slots[row['class_type'], row['day_of_week_display'], row['start_time']] for row in rows]
+
+    def ids(self, **params):
+        response = self.client.get('/fitness/admin/session', params)
+        self.assertEqual(response.status_code, 200)
+        return self.pks(response.json()['results'])
+
+    def test_next_cursor_walks_the_timetable(self):
+        seen, url, params = [], '/fitness/admin/session', {'page_size': 2}
+        while url:
+            body = self.client.get(url, params).json()
+            self.assertLessEqual(len(body['results']), 2)
+            seen += self.pks(body['results'])
+            url, params = body['next'], None
+        self.assertEqual(seen, [self.sunday.pk, self.monday.pk, self.hiit.pk, self.monday_late.pk, self.tuesday.pk])
+
+    def test_invalid_cursor_is_not_found(self):
+        forged = base64.urlsafe_b64encode(json.dumps([1, '25:99', 1]).encode()).decode()
+        short = base64.urlsafe_b64encode(json.dumps([1]).encode()).decode()
+        for cursor in ('garbage', forged, short):
+            self.assertEqual(self.client.get('/fitness/admin/session', {'cursor': cursor}).status_code, 404)
+
+    def test_page_size_is_clamped(self):
+        yoga = ClassType.objects.get(name='YOGA')
+        Sessions.objects.bulk_create(
+            Sessions(class_type=yoga, day_of_week=day, start_time=time(hour, minute), end_time=time(hour, minute + 10), capacity=5)
+            for day in range(3, 7) for hour in range(6, 19) for minute in (0, 15, 30, 45)
+        )
+        self.assertEqual(len(self.ids(page_size=500)), 200)
+        self.assertEqual(len(self.ids(page_size=0)), 1)
+        self.assertEqual(len(self.ids(page_size='many')), 50)
+
+    def test_day_filter(self):
+        self.assertEqual(self.ids(day='monday'), [self.monday.pk, self.hiit.pk, self.monday_late.pk])
+        self.assertEqual(self.ids(day='Sun,2'), [self.sunday.pk, self.tuesday.pk])
+        self.assertEqual(self.client.get('/fitness/admin/session', {'day': 'someday'}).status_code, 400)
+        self.assertEqual(self.client.get('/fitness/admin/session', {'day': '7'}).status_code, 400)
+
+    def test_instructor_filter(self):
+        self.assertEqual(self.ids(instructor='other@example.com'), [self.hiit.pk, self.monday_late.pk])
+        self.assertEqual(self.ids(instructor=f'{self.coach.pk},{self.other.pk}'), [
+            self.sunday.pk, self.monday.pk, self.hiit.pk, self.monday_late.pk,
+        ])
+        mixed = self.client.get('/fitness/admin/session', {'instructor': f'{self.coach.pk},other@example.com'})
+        self.assertEqual(mixed.status_code, 400)
+
+    def test_class_type_filter(self):
+        self.assertEqual(self.ids(class_type='HIIT'), [self.hiit.pk])
+        self.assertEqual(len(self.ids(class_type='HIIT,YOGA')), 5)
+        self.assertEqual(self.ids(class_type='PILATES'), [])
+
+    def test_start_time_bounds(self):
+        self.assertEqual(self.ids(start_from='10:00'), [self.hiit.pk, self.monday_late.pk, self.tuesday.pk])
+        self.assertEqual(self.ids(start_to='10:00:00'), [self.sunday.pk, self.monday.pk])
+        self.assertEqual(self.ids(day='1', start_from='09:30', start_to='11:00'), [self.hiit.pk])
+        self.assertEqual(self.client.get('/fitness/admin/session', {'start_from': 'noon'}).status_code, 400)
+        self.assertEqual(self.client.get('/fitness/admin/session', {'start_to': '24:00'}).status_code, 400)
+
+
+class InstructorFeedTests(TestCase):
+    def setUp(self):
+        self.old, self.new = (
+            User.objects.create(email=f'{name}@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+            for name in ('old', 'new')
+        )
+        self.session = make_session(capacity=5, instructor=self.old)
+
+    def reassign(self, session):
+        stamp = ical.feed_stamp(self.old.pk)
+        session.instructor = self.new
+        with mock.patch.object(ical, '_now_ms', return_value=stamp + 1), self.captureOnCommitCallbacks(execute=True):
+            session.save()
+        return ical.feed_stamp(self.old.pk) > stamp
+
+    def test_loading_sessions_runs_no_receiver(self):
+        self.assertNotIn('_ical_instructor_id', Sessions.objects.get(pk=self.session.pk).__dict__)
+
+    def test_previous_instructor_feed_is_touched(self):
+        session = Sessions.objects.get(pk=self.session.pk)
+        with self.assertNumQueries(1):
+            ical.capture_instructor(Sessions, session)
+        self.assertTrue(self.reassign(Sessions.objects.get(pk=self.session.pk)))
+
+    def test_remembered_instructor_needs_no_lookup(self):
+        session = Sessions.objects.get(pk=self.session.pk)
+        ical.remember_instructor(session)
+        with self.assertNumQueries(0):
+            ical.capture_instructor(Sessions, session)
+        self.assertTrue(self.reassign(session))
+
+
+    def test_import_refreshes_the_instructor_feed(self):
+        client = APIClient()
+        url = f'/fitness/calendar/{ical.feed_token(self.new)}.ics'
+        etag = client.get(url)['ETag']
+        row = {
+            'class_type': 'YOGA', 'day_of_week': 'tuesday', 'start_time': '11:00',
+            'duration_minutes': 30, 'capacity': 5, 'instructor_email': self.new.email,
+        }
+        stamp = ical.feed_stamp(self.new.pk)
+        with mock.patch.object(ical, '_now_ms', return_value=stamp + 1), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(import_sessions([row])[1], 1)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class SessionImportTests(TestCase):
+    def setUp(self):
+        self.coach = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.other_coach = User.objects.create(email='other@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.admin = User.objects.create(email='admin@example.com', role=UserRole.ADMIN, is_active=True)
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(AccessToken.for_user(self.admin))
+        make_session(capacity=5, instructor=self.coach, start_time=time(9), end_time=time(10))  # YOGA, Monday
+
+    def row(self, **overrides):
+        row = {
+            'class_type': 'HIIT', 'day_of_week': 'monday', 'start_time': '10:00',
+            'duration_minutes': 60, 'capacity': 10, 'instructor_email': 'coach@example.com',
+        }
+        return {**row, **overrides}
+
+    def errors(self, rows):
+        report, created = import_sessions(rows)
+        self.assertEqual(created, 0)
+        return [entry['errors'] for entry in report]
+
+    def test_clean_rows_are_created_together(self):
+        report, created = import_sessions([self.row(), self.row(day_of_week='2', start_time='09:00:00')])
+        self.assertEqual(created, 2)
+        self.assertEqual([entry['status'] for entry in report], ['created', 'created'])
+        self.assertEqual(Sessions.objects.filter(class_type__name='HIIT').count(), 2)
+
+    def test_duplicate_slots(self):
+        errors = self.errors([
+            self.row(class_type='YOGA', start_time='09:00', instructor_email='other@example.com'),
+            self.row(instructor_email='other@example.com', start_time='12:00'),
+            self.row(start_time='12:00'),
+        ])
+        self.assertEqual(errors[0], ["A session with class 'YOGA' already exists on Monday at 09:00."])
+        self.assertEqual(errors[1], [])
+        self.assertIn("Duplicate of row 2.", errors[2])
+        self.assertFalse(Sessions.objects.filter(class_type__name='HIIT').exists())
+
+    def test_instructor_overlaps(self):
+        errors = self.errors([
+            self.row(start_time='09:30'),
+            self.row(start_time='11:00', class_type='YOGA'),
+            self.row(start_time='11:30'),
+        ])
+        self.assertEqual(
+            errors[0], ["Instructor 'coach@example.com' is already scheduled on Monday during: 09:00 - 10:00."]
+        )
+        self.assertEqual(errors[1], [])
+        self.assertEqual(errors[2], ["Instructor 'coach@example.com' overlaps rows 2 in this import."])
+
+    def test_invalid_rows(self):
+        User.objects.create(email='member@example.com', role=UserRole.CLIENT, is_active=True)
+        errors = self.errors([
+            {'class_type': 'HIIT'},
+            self.row(day_of_week='someday', start_time='noon', capacity=0, duration_minutes='x'),
+            self.row(class_type='POLO', instructor_email='nobody@example.com'),
+            self.row(instructor_email='member@example.com'),
+            self.row(start_time='23:30'),
+        ])
+        self.assertTrue(errors[0][0].startswith("Missing fields: day_of_week, start_time"))
+        self.assertEqual(errors[1], [
+            "Invalid day: someday", "Invalid start_time: noon",
+            "duration_minutes must be a whole number.", "capacity must be greater than zero.",
+        ])
+        self.assertEqual(errors[2], ["Class type 'POLO' does not exist.", "Instructor with this email does not exist."])
+        self.assertEqual(errors[3], ["User is not an instructor."])
+        self.assertEqual(errors[4], ["Session must end before midnight."])
+
+    def test_csv_upload(self):
+        content = (
+            'class_type,day_of_week,start_time,duration_minutes,capacity,instructor_email\n'
+            'HIIT,tue,07:00,45,12,coach@example.com\n'
+            'HIIT,wed,07:00,45,12,coach@example.com\n'
+        )
+        upload = SimpleUploadedFile('timetable.csv', content.encode('utf-8-sig'), content_type='text/csv')
+        response = self.client.post('/fitness/admin/session/import', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            sorted(Sessions.objects.filter(class_type__name='HIIT').values_list('day_of_week', flat=True)), [2, 3]
+        )
+
+    def test_dry_run_writes_nothing(self):
+        response = self.client.post('/fitness/admin/session/import?dry_run=true', [self.row()], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['rows'][0]['status'], 'ok')
+        self.assertFalse(Sessions.objects.filter(class_type__name='HIIT').exists())
+
+    def test_rows_must_be_objects(self):
+        response = self.client.post('/fitness/admin/session/import', [1, 'x'], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Expected a list of session objects.", response.data['error'])
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, 'timetable.json')
+            path.write_text(json.dumps([self.row(), self.row(start_time='09:30', class_type='YOGA')]))
+            err = StringIO()
+            with self.assertRaisesMessage(CommandError, "1 of 2 rows have conflicts; nothing was imported."):
+                call_command('import_sessions', str(path), stdout=StringIO(), stderr=err)
+            self.assertEqual(json.loads(err.getvalue())['row'], 2)
+
+            path.write_text(json.dumps([self.row()]))
+            out = StringIO()
+            call_command('import_sessions', str(path), dry_run=True, stdout=out)
+            self.assertIn("1 rows are valid.", out.getvalue())
+            self.assertFalse(Sessions.objects.filter(class_type__name='HIIT').exists())
+            call_command('import_sessions', str(path), stdout=out)
+            self.assertIn("Imported 1 sessions.", out.getvalue())
+            self.assertTrue(Sessions.objects.filter(class_type__name='HIIT').exists())
+
+            path.write_text('{"sessions": "none"}')
+            with self.assertRaisesMessage(CommandError, "Could not read"):
+                call_command('import_sessions', str(path), stdout=StringIO())
+
+
+class ScheduleGuardTests(TestCase):
+    def setUp(self):
+        self.coach = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.admin = User.objects.create(email='admin@example.com', role=UserRole.ADMIN, is_active=True)
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(AccessToken.for_user(self.admin))
+        make_session(capacity=5, instructor=self.coach, start_time=time(9), end_time=time(10))  # YOGA, Monday
+
+    def create(self, start_time):
+        return self.client.post('/fitness/admin/session/create', {
+            'class_type': 'HIIT', 'day_of_week': ['monday'], 'start_time': start_time,
+            'duration_minutes': 60, 'capacity': 10, 'instructor_email': 'coach@example.com',
+        }, format='json')
+
+    def test_database_rejects_an_overlap(self):
+        with self.assertRaisesMessage(IntegrityError, INSTRUCTOR_OVERLAP_CONSTRAINT), transaction.atomic():
+            make_session(capacity=5, instructor=self.coach, start_time=time(9, 30), end_time=time(10, 30))
+        self.assertEqual(Sessions.objects.count(), 1)
+
+    def test_overlapping_create_is_rejected(self):
+        response = self.create('09:30')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data['errors'],
+            ["Instructor 'coach@example.com' is already scheduled on Monday during: 09:00 - 10:00."],
+        )
+        self.assertEqual(Sessions.objects.count(), 1)
+
+    def test_adjacent_sessions_do_not_overlap(self):
+        self.assertEqual(self.create('10:00').status_code, 201)
+        make_session(capacity=5, instructor=self.coach, start_time=time(8), end_time=time(9))
+        self.assertEqual(Sessions.objects.filter(instructor=self.coach).count(), 3)
+
+
+class ScheduleGuardMigrationTests(TestCase):
+    def setUp(self):
+        self.coach = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.migration = import_module('omnifyFitness.migrations.3082031_sessions_instructor_overlap_guard')
+
+    def check(self):
+        # The check only reads, so it needs no schema editor of its own.
+        self.migration.check_existing_sessions(apps, SimpleNamespace(connection=connection))
+
+    def test_clean_schedule_passes(self):
+        make_session(capacity=5, instructor=self.coach, start_time=time(9), end_time=time(10))
+        make_session(capacity=5, instructor=self.coach, start_time=time(10), end_time=time(11))
+        self.check()
+
+    def test_overlaps_abort_with_their_ids(self):
+        # Rows written before the guard existed.
+        remove_overlap_guard(connection, Sessions._meta.db_table)
+        first = make_session(capacity=5, instructor=self.coach, start_time=time(9), end_time=time(12))
+        second = make_session(capacity=5, instructor=self.coach, start_time=time(10), end_time=time(11))
+        third = make_session(capacity=5, instructor=self.coach, start_time=time(11, 30), end_time=time(13))
+        make_session(capacity=5, instructor=self.coach, start_time=time(13), end_time=time(14))
+        self.assertEqual(schedule_conflicts(Sessions.objects.all()), ([], [(first.pk, second.pk), (first.pk, third.pk)]))
+        with self.assertRaisesMessage(CommandError, f'{first.pk}/{second.pk}, {first.pk}/{third.pk}'):
+            self.check()
+
+
+class HotQueryPlanTests(QueryPlanMixin, TestCase):
+    """The scheduling and booking hot paths must stay on their indexes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        make_users(40, prefix='coach', role=UserRole.INSTRUCTOR)
+        coaches = list(User.objects.filter(role=UserRole.INSTRUCTOR))
+        class_type, _ = ClassType.objects.get_or_create(name='YOGA')
+        Sessions.objects.bulk_create(
+            Sessions(
+                class_type=class_type, day_of_week=day, start_time=time(hour), end_time=time(hour, 45),
+                capacity=40, instructor=coaches[(day * 12 + hour) % len(coaches)] if hour % 4 else None,
+            )
+            for day in range(7) for hour in range(6, 22)
+        )
+        cls.sessions = list(Sessions.objects.order_by('pk'))
+        members = make_clients(300, prefix='member')
+        monday = first_on_or_after(date.today(), 1)
+        Booking.objects.bulk_create(
+            Booking(
+                user=member, class_session=cls.sessions[(i * 7 + n) % len(cls.sessions)],
+                session_date=None if n % 3 else monday + timedelta(days=7 * n),
+            )
+            for i, member in enumerate(members) for n in range(8)
+        )
+        WaitlistEntry.objects.bulk_create(
+            WaitlistEntry(user=member, class_session=session, ticket=i)
+            for session in cls.sessions[:20] for i, member in enumerate(members[:30])
+        )
+        cls.session = next(s for s in cls.sessions if s.instructor_id)
+
+    def setUp(self):
+        self.analyze()
+
+    def test_instructor_overlap_probe(self):
+        self.assertIndexed(overlapping_sessions(self.session), 'sessions_instructor_slot_idx')
+
+    def test_session_seat_counts(self):
+        bookings = Booking.objects.filter(class_session=self.session)
+        self.assertIndexed(bookings.filter(session_date__gte=date.today()).values('session_date').annotate(n=Count('id')))
+        self.assertIndexed(bookings.filter(session_date__isnull=True, user_id=1))
+        self.assertIndexed(bookings.values_list('user_id', flat=True))
+
+    def test_dated_window_counts(self):
+        start = date.today()
+        window = Booking.objects.filter(session_date__range=(start, start + timedelta(days=30))).order_by()
+        self.assertIndexed(window.values_list('class_session_id', 'session_date').annotate(n=Count('id')), 'booking_dated_window_idx')
+        self.assertIndexed(
+            window.filter(class_session_id__in=[s.pk for s in self.sessions[:10]])
+            .values_list('class_session_id', 'session_date').annotate(n=Count('id'))
+        )
+
+    def test_client_bookings_newest_first(self):
+        member = Booking.objects.values_list('user_id', flat=True).first()
+        plan = self.assertIndexed(
+            Booking.objects.filter(user_id=member).order_by('-booked_at', '-id')[:20], 'booking_user_booked_at_idx'
+        )
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_waitlist_head_and_position(self):
+        head = WaitlistEntry.objects.filter(class_session=self.sessions[0]).order_by('ticket')[:1]
+        self.assertIndexed(head)
+        self.assertIndexed(WaitlistEntry.objects.filter(class_session=self.sessions[0], ticket__lt=10))
+        self.assertIndexed(WaitlistEntry.objects.filter(user_id=1))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class FitnessEndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create(email='admin@example.com', role=UserRole.ADMIN, is_active=True)
+        self.instructor = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.member = User.objects.create(email='member@example.com', role=UserRole.CLIENT, is_active=True)
+        self.session = make_session(capacity=100, instructor=self.instructor)
+        self.slots = iter(range(84))
+        self.grown = 0
+        catalog.warm()
+
+    def free_slot(self):
+        # Distinct (day, hour) pairs from 11:00, clear of setUp's session.
+        n = next(self.slots)
+        return n % 7, time(11 + n // 7)
+
+    def new_session(self):
+        day, start = self.free_slot()
+        return make_session(capacity=5, day_of_week=day, start_time=start, end_time=time(start.hour, 30))
+
+    def grow(self):
+        self.grown += 1
+        prefix = f'grow{self.grown}-'
+        make_users(30, prefix=f'{prefix}coach', role=UserRole.INSTRUCTOR)
+        make_users(30, prefix=f'{prefix}member')
+        coaches = User.objects.filter(email__startswith=f'{prefix}coach')
+        members = list(User.objects.filter(email__startswith=f'{prefix}member'))
+        class_type = ClassType.objects.get(name='HIIT')
+        sessions = []
+        for i, coach in enumerate(coaches):
+            for owner in (coach, self.instructor):
+                day, start = self.free_slot()
+                sessions.append(Sessions(
+                    class_type=class_type, day_of_week=day, start_time=start,
+                    end_time=time(start.hour, 30), capacity=50, instructor=owner,
+                ))
+        sessions = Sessions.objects.bulk_create(sessions)
+        Booking.objects.bulk_create(
+            Booking(user=member, class_session=session) for member in members for session in sessions[:5]
+        )
+
+    def session_payload(self, **overrides):
+        day, start = self.free_slot()
+        payload = {
+            'class_type': 'YOGA',
+            'day_of_week': [['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'][day]],
+            'start_time': start.strftime('%H:%M'),
+            'duration_minutes': 30,
+            'capacity': 10,
+            'instructor_email': 'coach@example.com',
+        }
+        payload.update(overrides)
+        return payload
+
+    def test_class_types(self):
+        self.assertQueryBudget(0, lambda _: self.client.get('/fitness/classTypes'), self.grow, status=200)
+
+    def test_session_create(self):
+        self.authenticate(self.admin)
+        self.assertQueryBudget(
+            7,
+            lambda payload: self.client.post('/fitness/admin/session/create', payload, format='json'),
+            self.grow,
+            self.session_payload,
+            status=201,
+        )
+
+    def test_session_import(self):
+        self.authenticate(self.admin)
+
+        def prepare():
+            rows = []
+            for _ in range(3):
+                payload = self.session_payload()
+                payload['day_of_week'] = payload['day_of_week'][0]
+                rows.append(payload)
+            return rows
+        self.assertQueryBudget(
+            7,
+            lambda rows: self.client.post('/fitness/admin/session/import', rows, format='json'),
+            self.grow,
+            prepare,
+            status=201,
+        )
+
+    def test_session_update(self):
+        self.authenticate(self.admin)
+        self.assertQueryBudget(
+            10,
+            lambda payload: self.client.put(f'/fitness/admin/session/update/{self.session.pk}', payload, format='json'),
+            self.grow,
+            self.session_payload,
+            status=200,
+        )
+
+    def test_session_delete(self):
+        self.authenticate(self.admin)
+        self.assertQueryBudget(
+            5,
+            lambda pk: self.client.delete(f'/fitness/admin/session/delete/{pk}'),
+            self.grow,
+            lambda: self.new_session().pk,
+            status=204,
+        )
+
+    def test_session_list(self):
+        # Clear the response cache so every measured call renders from the database.
+        self.assertQueryBudget(
+            1, lambda _: self.client.get('/fitness/admin/session'), self.grow, cache.clear, status=200
+        )
+
+    def test_session_list_not_modified(self):
+        etag = self.client.get('/fitness/admin/session')['ETag']
+        self.assertQueryBudget(
+            0, lambda _: self.client.get('/fitness/admin/session', HTTP_IF_NONE_MATCH=etag), self.grow, status=304
+        )
+
+    def test_session_list_key_ignores_unknown_params(self):
+        self.grow()
+        first = self.client.get('/fitness/admin/session', {'day': 'Monday,sun', 'page_size': 5})
+        with self.assertNumQueries(0):
+            again = self.client.get('/fitness/admin/session', {'day': '0,1', 'page_size': 5, 'x': 'junk'})
+        self.assertEqual(again['ETag'], first['ETag'])
+        self.assertEqual(again.content, first.content)
+        self.assertNotIn('x=', again.json()['next'])
+        self.assertEqual(self.client.get('/fitness/admin/session', {'day': 'someday'}).status_code, 400)
+
+    def test_booking_create(self):
+        self.authenticate(self.member)
+        self.assertQueryBudget(
+            7,
+            lambda pk: self.client.post('/fitness/client/booking', {'class_session': pk}, format='json'),
+            self.grow,
+            lambda: self.new_session().pk,
+            status=201,
+        )
+
+    def test_booking_batch(self):
+        self.authenticate(self.member)
+        self.assertQueryBudget(
+            8,
+            lambda ids: self.client.post('/fitness/client/booking/batch', {'class_sessions': ids}, format='json'),
+            self.grow,
+            lambda: [self.new_session().pk for _ in range(5)],
+            status=201,
+        )
+
+    def test_booking_list(self):
+        self.authenticate(self.member)
+        self.assertQueryBudget(
+            2,
+            lambda _: self.client.get('/fitness/client/booking', {'page_size': 3}),
+            self.grow,
+            lambda: book_session(self.member, self.new_session()),
+            status=200,
+        )
+
+    def test_occurrences(self):
+        self.assertQueryBudget(
+            2,
+            lambda _: self.client.get('/fitness/occurrences', {'start': '2026-01-01', 'end': '2026-12-31'}),
+            self.grow,
+            status=200,
+        )
+
+    def test_booking_delete(self):
+        self.authenticate(self.member)
+        self.assertQueryBudget(
+            7,
+            lambda pk: self.client.delete(f'/fitness/client/booking/{pk}'),
+            self.grow,
+            lambda: book_session(self.member, self.session).pk,
+            status=204,
+        )
+
+    def full_session(self, waiting=0):
+        session = self.new_session()
+        Sessions.objects.filter(pk=session.pk).update(seats_taken=F('capacity'))
+        for client in make_clients(waiting, prefix=f'wait{session.pk}-'):
+            join_waitlist(client, session)
+        return session
+
+    def test_waitlist_join(self):
+        self.authenticate(self.member)
+        self.assertQueryBudget(
+            9,
+            lambda pk: self.client.post('/fitness/client/waitlist', {'class_session': pk}, format='json'),
+            self.grow,
+            lambda: self.full_session(waiting=3).pk,
+            status=201,
+        )
+
+    def test_waitlist_list(self):
+        self.authenticate(self.member)
+
+        def grow():
+            # More entries for the member, each behind a queue of its own.
+            self.grow()
+            for _ in range(10):
+                join_waitlist(self.member, self.full_session(waiting=5))
+        join_waitlist(self.member, self.full_session(waiting=2))
+        response = self.assertQueryBudget(2, lambda _: self.client.get('/fitness/client/waitlist'), grow, status=200)
+        self.assertEqual(len(response.json()), 11)
+        self.assertEqual([entry['position'] for entry in response.json()], [3] + [6] * 10)
+
+    def test_waitlist_leave(self):
+        self.authenticate(self.member)
+        self.assertQueryBudget(
+            3,
+            lambda pk: self.client.delete(f'/fitness/client/waitlist/{pk}'),
+            self.grow,
+            lambda: join_waitlist(self.member, self.full_session(waiting=3)).pk,
+            status=204,
+        )
+
+    def test_instructor_session_delete(self):
+        self.authenticate(self.instructor)
+        self.assertQueryBudget(
+            5,
+            lambda pk: self.client.delete(f'/fitness/instructor/booking/delete/{pk}'),
+            self.grow,
+            lambda: self.new_session().pk,
+            status=204,
+        )
+
+    def test_instructor_sessions(self):
+        self.authenticate(self.instructor)
+        self.assertQueryBudget(2, lambda _: self.client.get('/fitness/instructor/booking'), self.grow, status=200)
+
+    def test_instructor_roster(self):
+        self.authenticate(self.instructor)
+
+        def call(_):
+            response = self.client.get('/fitness/instructor/roster')
+            response.body = b''.join(response.streaming_content)
+            return response
+        response = self.assertQueryBudget(3, call, self.grow, status=200)
+        roster = json.loads(response.body)
+        self.assertEqual(len(roster), 1 + 30)
+        self.assertEqual(sum(len(s['attendees']) for s in roster), 2 * 30)
+
+    def get_feed(self, user, **headers):
+        response = self.client.get(f'/fitness/calendar/{ical.feed_token(user)}.ics', **headers)
+        response.body = b''.join(response.streaming_content) if response.streaming else b''
+        return response
+
+    def test_calendar_feed(self):
+        response = self.assertQueryBudget(2, lambda _: self.get_feed(self.instructor), self.grow, status=200)
+        self.assertEqual(response.body.count(b'BEGIN:VEVENT'), 1 + 30)
+        self.assertIn(b'RRULE:FREQ=WEEKLY', response.body)
+
+    def test_calendar_feed_not_modified(self):
+        etag = self.get_feed(self.member)['ETag']
+        self.assertQueryBudget(
+            0, lambda _: self.get_feed(self.member, HTTP_IF_NONE_MATCH=etag), self.grow, status=304
+        )
+
+    def test_calendar_feed_rejects_forged_token(self):
+        self.assertEqual(self.client.get(f'/fitness/calendar/{self.member.pk}:forged.ics').status_code, 404)
+
+
+class AsyncReadViewTests(TestCase):
+    """The async read views must answer exactly like the APIViews they replace under ASGI."""
+
+    def setUp(self):
+        self.instructor = User.objects.create(email='coach@example.com', role=UserRole.INSTRUCTOR, is_active=True)
+        self.token = str(AccessToken.for_user(self.instructor))
+        for hour in range(9, 12):
+            make_session(capacity=10, start_time=time(hour), end_time=time(hour, 45), instructor=self.instructor)
+        catalog.invalidate()
+        cache.clear()
+
+    async def call(self, view, path, **extra):
+        request = AsyncRequestFactory().get(path, **extra)
+        request.COOKIES['access_token'] = self.token
+        return await view.as_view()(request)
+
+    def sync_call(self, path, **extra):
+        client = APIClient()
+        client.cookies['access_token'] = self.token
+        return client.get(path, **extra)
+
+    async def test_responses_match_the_sync_views(self):
+        cases = [
+            (AsyncClassTypesView, '/fitness/classTypes'),
+            (AsyncSessionListView, '/fitness/admin/session?page_size=2'),
+            (AsyncInstructorSessionsView, '/fitness/instructor/booking?page_size=2'),
+        ]
+        for view, path in cases:
+            expected = await sync_to_async(self.sync_call)(path)
+            response = await self.call(view, path)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(json.loads(response.content), expected.json(), path)
+
+    async def test_not_modified(self):
+        first = await self.call(AsyncSessionListView, '/fitness/admin/session')
+        response = await self.call(AsyncSessionListView, '/fitness/admin/session', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_authentication_is_required(self):
+        request = AsyncRequestFactory().get('/fitness/instructor/booking')
+        response = await AsyncInstructorSessionsView.as_view()(request)
+        self.assertEqual(response.status_code, 401)
+
+
+class SeatStreamTests(TestCase):
+    def setUp(self):
+        self.session = make_session(capacity=3)
+        self.other = make_session(capacity=3, start_time=time(11), end_time=time(12))
+        self.member = make_clients(1)[0]
+
+    def book(self, session, session_date=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return book_session(self.member, session, session_date)
+
+    def cancel(self, booking):
+        with self.captureOnCommitCallbacks(execute=True):
+            cancel_booking(booking)
+
+    async def open_stream(self, query=''):
+        request = AsyncRequestFactory().get(f'/fitness/seats/stream{query}')
+        response = await SeatStreamView.as_view()(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+        return stream
+
+    async def next_event(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        event, data = chunk.decode().strip().split('\n')
+        self.assertEqual(event, 'event: seats')
+        return json.loads(data.removeprefix('data: '))
+
+    async def disconnect(self, stream):
+        # Under ASGI a client disconnect cancels the task reading the stream.
+        reader = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+
+    async def test_bookings_and_cancellations_are_pushed(self):
+        stream = await self.open_stream()
+        booking = await sync_to_async(self.book)(self.session)
+        self.assertEqual(
+            await self.next_event(stream),
+            {'session': self.session.pk, 'session_date': None, 'capacity': 3, 'taken': 1, 'remaining': 2},
+        )
+        await sync_to_async(self.cancel)(booking)
+        self.assertEqual((await self.next_event(stream))['remaining'], 3)
+        await self.disconnect(stream)
+        self.assertEqual(get_broker().subscriber_count(), 0)
+
+    async def test_dated_bookings_report_their_occurrence(self):
+        stream = await self.open_stream()
+        monday = first_on_or_after(date.today() + timedelta(days=1), 1)
+        await sync_to_async(self.book)(self.session, monday)
+        event = await self.next_event(stream)
+        self.assertEqual((event['session_date'], event['taken']), (monday.isoformat(), 1))
+        await self.disconnect(stream)
+
+    async def test_stream_can_be_narrowed_to_sessions(self):
+        stream = await self.open_stream(f'?session={self.other.pk}')
+        await sync_to_async(self.book)(self.session)
+        await sync_to_async(self.book)(self.other)
+        self.assertEqual((await self.next_event(stream))['session'], self.other.pk)
+        await self.disconnect(stream)
+
+    async def test_invalid_session_filter(self):
+        request = AsyncRequestFactory().get('/fitness/seats/stream?session=yoga')
+        response = await SeatStreamView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(SEAT_EVENTS_HEARTBEAT=0.01)
+    async def test_idle_stream_sends_keepalives(self):
+        stream = await self.open_stream()
+        self.assertEqual(await anext(stream), b': keepalive\n\n')
+        await self.disconnect(stream)
+
+    async def test_no_seat_query_without_a_listener(self):
+        def count(session):
+            with CaptureQueriesContext(connection) as captured:
+                publish_seats(session.pk)
+            return len(captured)
+        count = sync_to_async(count)
+        self.assertEqual(await count(self.session), 0)
+        async with get_broker().subscribe({self.other.pk}) as queue:
+            self.assertEqual(await count(self.session), 0)
+            self.assertEqual(await count(self.other), 1)
+            self.assertEqual((await asyncio.wait_for(queue.get(), 1))['session'], self.other.pk)
+
+    async def test_broker_accepts_events_from_other_threads(self):
+        broker = InProcessBroker(maxsize=2)
+        async with broker.subscribe() as queue:
+            publisher = threading.Thread(target=lambda: [broker.publish(n) for n in range(3)])
+            publisher.start()
+            publisher.join()
+            await asyncio.sleep(0)
+            # The oldest event is dropped rather than blocking the publisher.
+            self.assertEqual([await queue.get(), await queue.get()], [1, 2])
+        self.assertEqual(broker.subscriber_count(), 0)
@@ -1,15 +1,34 @@
+from django.conf import settings
 from django.urls import path
+from omnifyFitness.async_views import AsyncClassTypesView, AsyncInstructorSessionsView, AsyncSessionListView, SeatStreamView
 from omnifyFitness.views import *
 
+if settings.ASYNC_READ_VIEWS:
+    class_types, session_list, instructor_sessions = AsyncClassTypesView, AsyncSessionListView, AsyncInstructorSessionsView
+else:
+    class_types, session_list, instructor_sessions = getClassTypes, SessionListView, InstructorBookingView
+
 urlpatterns = [
-    path('classTypes', getClassTypes.as_view()),
-    path('admin/session/create', SessionView.as_view()),
-    path('admin/session/update/<pk>', SessionView.as_view()),
-    path('admin/session/delete/<pk>', SessionView.as_view()),
-    path('admin/session', SessionListView.as_view()),
-    path('client/booking', BookingView.as_view()),
-    path('client/booking/<pk>', BookingView.as_view()),
-    path('instructor/booking/delete/<pk>', InstructorBookingView.as_view()),
-    path('instructor/booking', InstructorBookingView.as_view()),
+    path('classTypes', class_types.as_view(), name='class-types'),
+    path('admin/session/create', SessionView.as_view(), name='session-create'),
+    path('admin/session/import', SessionImportView.as_view(), name='session-import'),
+    path('admin/session/update/<pk>', SessionView.as_view(), name='session-update'),
+    path('admin/session/delete/<pk>', SessionView.as_view(), name='session-delete'),
+    path('admin/session', session_list.as_view(), name='session-list'),
+    path('occurrences', OccurrenceListView.as_view(), name='occurrences'),
+    path('calendar', CalendarLinkView.as_view(), name='calendar-link'),
+    path('calendar/<str:token>.ics', CalendarFeedView.as_view(), name='calendar-feed'),
+    path('client/booking', BookingView.as_view(), name='booking'),
+    path('client/booking/batch', BatchBookingView.as_view(), name='booking-batch'),
+    path('client/booking/<pk>', BookingView.as_view(), name='booking-detail'),
+    path('client/waitlist', WaitlistView.as_view(), name='waitlist'),
+    path('client/waitlist/<pk>', WaitlistView.as_view(), name='waitlist-detail'),
+    path('instructor/booking/delete/<pk>', InstructorBookingView.as_view(), name='instructor-session-delete'),
+    path('instructor/booking', instructor_sessions.as_view(), name='instructor-sessions'),
+    path('instructor/roster', InstructorRosterView.as_view(), name='instructor-roster'),
 ]
 
+if settings.ASYNC_READ_VIEWS:
+    # A held-open stream would pin a WSGI worker thread per client.
+    urlpatterns.append(path('seats/stream', SeatStreamView.as_view(), name='seat-stream'))
+
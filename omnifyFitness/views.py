@@ -1,20 +1,39 @@
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.db import transaction
 from omnifyFitness.models import *
 from omnifyFitness.serializers import *
+from omnifyFitness.booking import BATCH_BOOKED, BATCH_NOT_BOOKED, cancel_booking, promote_waitlist
+from omnifyFitness.catalog import catalog
+from omnifyFitness.conditional import etag_matches, not_modified
+from omnifyFitness.importer import import_sessions, rows_from_csv, rows_from_json
+from omnifyFitness.filters import filter_sessions, parse_flag
+from omnifyFitness.pagination import BookingPagination, SessionPagination
+from omnifyFitness import ical, schedule_cache
+from omnifyFitness.occurrences import dated_booking_counts, iter_occurrences, with_seat_counts
+from omnifyFitness.roster import iter_roster
+from omnifyFitness.streaming import json_array_stream
 from USER.models import *
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponse, StreamingHttpResponse
+from datetime import date, timedelta
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 
 # Create your views here.
 
 class getClassTypes(APIView):
+    # Public catalog; skipping cookie auth keeps a 304 free of user lookups.
+    authentication_classes = []
+
     def get(self, request):
-        classTypes = ClassType.objects.all()
-        serializer = ClassTypeSerializer(classTypes, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        etag = catalog.etag()
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return Response(catalog.rows(), status=status.HTTP_200_OK, headers={'ETag': etag})
 
 class SessionView(APIView):
     permission_classes = [IsAuthenticated]
@@ -50,7 +69,10 @@ class SessionView(APIView):
 
         serializer = RecurringSessionsSerializer(session, data=request.data, context={"request": request})
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                session = serializer.save()
+                # A capacity increase goes to the waitlist first.
+                promote_waitlist(session.pk)
             return Response({"message": "Schedule updated successfully."}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -66,16 +88,140 @@ class SessionView(APIView):
         schedule.delete()
         return Response({"message": "Schedule deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
+class SessionImportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.user.role != UserRole.ADMIN:
+            return Response({"error": "Only admin users can import schedules."}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            upload = request.FILES.get('file')
+            if upload is not None and upload.name.lower().endswith('.csv'):
+                rows = rows_from_csv(upload.read())
+            elif upload is not None:
+                rows = rows_from_json(upload.read())
+            else:
+                rows = rows_from_json(request.data)
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"error": f"Could not read import: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        if not rows:
+            return Response({"error": "No sessions to import."}, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = request.query_params.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        report, created = import_sessions(rows, dry_run=dry_run)
+        if any(entry['errors'] for entry in report):
+            return Response({"created": 0, "rows": report}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"created": created, "rows": report},
+            status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED,
+        )
+
 class SessionListView(APIView):
+    # Public timetable; without cookie auth a 304 never touches the database.
+    authentication_classes = []
+
     def get(self, request):
-        sessions = Sessions.objects.all()
-        serializer = RecurringSessionsSerializer(sessions, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        schedule_cache.normalize_query(request)
+        etag, key = schedule_cache.etag_and_key(request)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        body = schedule_cache.get_or_build(key, lambda: self.render_page(request))
+        return HttpResponse(body, content_type='application/json', headers={'ETag': etag})
+
+    def render_page(self, request):
+        sessions = filter_sessions(Sessions.objects.select_related('class_type'), request.query_params)
+        paginator = SessionPagination()
+        page = paginator.paginate_queryset(sessions, request, view=self)
+        serializer = RecurringSessionsSerializer(page, many=True)
+        return JSONRenderer().render(paginator.get_paginated_response(serializer.data).data)
     
 
+class OccurrenceListView(APIView):
+    # Dated occurrences of the weekly timetable with per-date seat counts.
+    authentication_classes = []
+    MAX_WINDOW_DAYS = 366
+
+    def get(self, request):
+        try:
+            start = date.fromisoformat(request.query_params['start']) if request.query_params.get('start') else date.today()
+            end = date.fromisoformat(request.query_params['end']) if request.query_params.get('end') else start + timedelta(days=6)
+        except ValueError:
+            return Response({"error": "start and end must be dates (YYYY-MM-DD)."}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start or (end - start).days >= self.MAX_WINDOW_DAYS:
+            return Response(
+                {"error": f"The window must run forwards and span at most {self.MAX_WINDOW_DAYS} days."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        sessions = list(filter_sessions(Sessions.objects.select_related('class_type'), request.query_params))
+        counts = dated_booking_counts(start, end, [s.id for s in sessions])
+        occurrences = with_seat_counts(iter_occurrences(sessions, start, end), counts)
+        if request.query_params.get('open') and parse_flag(request.query_params['open'], 'open'):
+            occurrences = (row for row in occurrences if row[2])
+        rows = (
+            {
+                "session": occurrence.session.id,
+                "class_type": occurrence.session.class_type.name,
+                "date": occurrence.date,
+                "starts_at": occurrence.starts_at,
+                "ends_at": occurrence.ends_at,
+                "instructor": occurrence.session.instructor_id,
+                "capacity": occurrence.session.capacity,
+                "booked": booked,
+                "remaining_seats": remaining,
+            }
+            for occurrence, booked, remaining in occurrences
+        )
+        return StreamingHttpResponse(json_array_stream(rows), content_type='application/json')
+
+
+class CalendarLinkView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        url = request.build_absolute_uri(f'/fitness/calendar/{ical.feed_token(request.user)}.ics')
+        return Response({"url": url}, status=status.HTTP_200_OK)
+
+
+class CalendarFeedView(APIView):
+    # Calendar apps poll with the signed token in the URL, not our cookies.
+    # The ETag comes from the cache, so a 304 costs no queries at all.
+    authentication_classes = []
+
+    def get(self, request, token):
+        user_id = ical.user_id_from_token(token)
+        if user_id is None:
+            return Response({"error": "Calendar not found."}, status=status.HTTP_404_NOT_FOUND)
+        stamp = ical.feed_stamp(user_id)
+        etag = ical.feed_etag(user_id, stamp)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        user = User.objects.filter(pk=user_id, is_active=True).only('id', 'role').first()
+        if user is None:
+            return Response({"error": "Calendar not found."}, status=status.HTTP_404_NOT_FOUND)
+        feed = ical.instructor_feed if user.role == UserRole.INSTRUCTOR else ical.member_feed
+        response = StreamingHttpResponse(feed(user, stamp), content_type='text/calendar; charset=utf-8')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
 class BookingView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        if request.user.role != UserRole.CLIENT:
+            return Response({"error": "Only client users have bookings."}, status=status.HTTP_403_FORBIDDEN)
+        bookings = Booking.objects.filter(user=request.user).select_related(
+            'class_session__class_type', 'class_session__instructor'
+        )
+        if request.query_params.get('upcoming') and parse_flag(request.query_params['upcoming'], 'upcoming'):
+            # Standing bookings recur every week, so they are always upcoming.
+            bookings = bookings.filter(Q(session_date__isnull=True) | Q(session_date__gte=date.today()))
+        paginator = BookingPagination()
+        page = paginator.paginate_queryset(bookings, request, view=self)
+        return paginator.get_paginated_response(MyBookingSerializer(page, many=True).data)
+
     def post(self, request):
         if request.user.role != UserRole.CLIENT:
             return Response({"error": "Only client users can book sessions."}, status=status.HTTP_403_FORBIDDEN)
@@ -83,15 +229,9 @@ class BookingView(APIView):
         serializer = BookingSerializer(data=request.data)
         if not serializer.is_valid():
             return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-        if Booking.objects.filter(user=user, class_session=serializer.validated_data['class_session']).exists():
-            return Response({"error": "You have already booked this session."}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            if serializer.is_valid():
-                with transaction.atomic():
-                    serializer.save(user=user)
-                return Response({"message": "Booking created successfully."}, status=status.HTTP_201_CREATED)
-            else:
-                return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+            serializer.save(user=user)
+            return Response({"message": "Booking created successfully."}, status=status.HTTP_201_CREATED)
         except serializers.ValidationError as e:
             return Response({'errors': e.detail}, status=status.HTTP_400_BAD_REQUEST)
     
@@ -99,9 +239,71 @@ class BookingView(APIView):
         if request.user.role != UserRole.CLIENT:
             return Response({"error": "Only client users can delete bookings."}, status=status.HTTP_403_FORBIDDEN)
         booking = get_object_or_404(Booking, pk=kwargs.get('pk'), user=request.user)
-        booking.delete()
+        cancel_booking(booking)
         return Response({"message": "Booking deleted successfully."}, status=status.HTTP_204_NO_CONTENT )
     
+class BatchBookingView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.user.role != UserRole.CLIENT:
+            return Response({"error": "Only client users can book sessions."}, status=status.HTTP_403_FORBIDDEN)
+        serializer = BatchBookingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = serializer.save(user=request.user)
+        except serializers.ValidationError as e:
+            return Response({'errors': e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        if any(result['status'] == BATCH_NOT_BOOKED for result in results):
+            return Response(
+                {'errors': "No sessions were booked because some could not be.", 'results': results},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if all(result['status'] == BATCH_BOOKED for result in results):
+            return Response({'results': results}, status=status.HTTP_201_CREATED)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+class WaitlistView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        if request.user.role != UserRole.CLIENT:
+            return Response({"error": "Only client users can join waitlists."}, status=status.HTTP_403_FORBIDDEN)
+        serializer = WaitlistSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            serializer.save(user=request.user)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except serializers.ValidationError as e:
+            return Response({'errors': e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+    def get(self, request):
+        if request.user.role != UserRole.CLIENT:
+            return Response({"error": "Only client users have waitlists."}, status=status.HTTP_403_FORBIDDEN)
+        # Positions for all of the client's entries in one query.
+        ahead = (
+            WaitlistEntry.objects.filter(class_session=OuterRef('class_session'), ticket__lt=OuterRef('ticket'))
+            .order_by()
+            .values('class_session')
+            .annotate(n=Count('id'))
+            .values('n')
+        )
+        entries = (
+            WaitlistEntry.objects.filter(user=request.user)
+            .annotate(position=Coalesce(Subquery(ahead), 0) + 1)
+            .order_by('joined_at')
+        )
+        return Response(WaitlistSerializer(entries, many=True).data, status=status.HTTP_200_OK)
+
+    def delete(self, request, **kwargs):
+        if request.user.role != UserRole.CLIENT:
+            return Response({"error": "Only client users can leave waitlists."}, status=status.HTTP_403_FORBIDDEN)
+        entry = get_object_or_404(WaitlistEntry, pk=kwargs.get('pk'), user=request.user)
+        entry.delete()
+        return Response({"message": "Left the waitlist."}, status=status.HTTP_204_NO_CONTENT)
+
 class InstructorBookingView(APIView):
     permission_classes = [IsAuthenticated]
     def delete(self, request, **kwargs):
@@ -114,6 +316,21 @@ class InstructorBookingView(APIView):
     def get(self, request):
         if request.user.role != UserRole.INSTRUCTOR:
             return Response({"error": "Only instructor access this view."}, status=status.HTTP_403_FORBIDDEN)
-        bookings = Sessions.objects.filter(instructor=request.user)
-        serializer = RecurringSessionsSerializer(bookings, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        bookings = filter_sessions(
+            Sessions.objects.filter(instructor=request.user).select_related('class_type'), request.query_params
+        )
+        paginator = SessionPagination()
+        page = paginator.paginate_queryset(bookings, request, view=self)
+        serializer = RecurringSessionsSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class InstructorRosterView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        if request.user.role != UserRole.INSTRUCTOR:
+            return Response({"error": "Only instructor access this view."}, status=status.HTTP_403_FORBIDDEN)
+        # Filters are applied (and rejected) here, before the response starts.
+        sessions = filter_sessions(Sessions.objects.filter(instructor=request.user), request.query_params)
+        return StreamingHttpResponse(json_array_stream(iter_roster(sessions)), content_type='application/json')